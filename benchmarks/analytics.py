@@ -0,0 +1,118 @@
+"""Micro-benchmark: vectorized sales analytics on a synthetic snapshot.
+
+    python -m benchmarks.analytics --items 10000000
+
+Builds a SalesSnapshot (services/sales_analytics.py) from random arrays. This
+stands in for loading the arrays from a database, which would need a 10M-item
+seed. It then times each /revenue/analytics/* report and an incremental upsert
+of changed rows. For comparison, "loop" runs the top-products group-by as a
+plain Python loop over the first --loop-items rows, which is what a per-row ORM
+implementation does, without the ORM overhead.
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+from services.sales_analytics import SalesSnapshot, _upsert, _with_order_dates
+
+
+def make_snapshot(items: int, customers: int, products: int, tiers: int, seed: int) -> SalesSnapshot:
+    rng = np.random.default_rng(seed)
+    order_count = max(1, items // 3)
+    start = np.datetime64("2022-01-01T00:00:00", "us")
+    orders = {
+        "order_id": np.arange(1, order_count + 1, dtype=np.int64),
+        "customer_id": rng.integers(1, customers + 1, order_count, dtype=np.int64),
+        # three years of orders, in id order like autoincrement inserts
+        "order_date": start + np.sort(rng.integers(0, 3 * 365 * 86400, order_count)).astype("timedelta64[s]"),
+        "total_amount": np.zeros(order_count),
+    }
+    item_columns = {
+        "order_item_id": np.arange(1, items + 1, dtype=np.int64),
+        "order_id": np.sort(rng.integers(1, order_count + 1, items, dtype=np.int64)),
+        "product_id": rng.zipf(1.3, items).clip(1, products).astype(np.int64),
+        "quantity": rng.integers(1, 6, items, dtype=np.int64),
+        "price_at_purchase": rng.integers(100, 10000, items) / 100.0,
+    }
+    orders["total_amount"] = np.bincount(item_columns["order_id"],
+                                         weights=item_columns["quantity"] * item_columns["price_at_purchase"],
+                                         minlength=order_count + 1)[orders["order_id"]]
+    loyalty = np.concatenate([[0], rng.integers(0, tiers + 1, customers)]).astype(np.int64)
+    return SalesSnapshot(orders, _with_order_dates(item_columns, orders), loyalty,
+                         {tier: f"Tier {tier}" for tier in range(1, tiers + 1)})
+
+
+def loop_top_products(snapshot: SalesSnapshot, rows: int, limit: int) -> list:
+    revenue = defaultdict(float)
+    product_ids = snapshot.items["product_id"][:rows].tolist()
+    quantities = snapshot.items["quantity"][:rows].tolist()
+    prices = snapshot.items["price_at_purchase"][:rows].tolist()
+    for product_id, quantity, price in zip(product_ids, quantities, prices):
+        revenue[product_id] += quantity * price
+    return sorted(revenue.items(), key=lambda pair: -pair[1])[:limit]
+
+
+def measure(func, repeat: int) -> dict:
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {"best_ms": round(timings[0] * 1000, 3), "median_ms": round(timings[len(timings) // 2] * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the vectorized analytics reports on synthetic data")
+    parser.add_argument("--items", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--tiers", type=int, default=4)
+    parser.add_argument("--changed", type=int, default=1000, help="rows upserted by the refresh benchmark")
+    parser.add_argument("--loop-items", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    snapshot = make_snapshot(args.items, args.customers, args.products, args.tiers, args.seed)
+    built = time.perf_counter() - started
+    year = (date(2023, 1, 1), date(2023, 12, 31))
+
+    items = snapshot.items
+    rng = np.random.default_rng(args.seed + 1)
+    changed_ids = np.sort(rng.choice(items["order_item_id"], args.changed, replace=False))
+    changed = {name: values[np.searchsorted(items["order_item_id"], changed_ids)] for name, values in items.items()}
+    changed["quantity"] = changed["quantity"] + 1
+    loop_rows = min(args.loop_items, args.items)
+
+    reports = {
+        "top_products": measure(lambda: snapshot.top_products(10), args.repeat),
+        "top_products_one_year": measure(lambda: snapshot.top_products(10, *year), args.repeat),
+        "basket_sizes": measure(lambda: snapshot.basket_sizes(), args.repeat),
+        "revenue_by_tier": measure(lambda: snapshot.revenue_by_tier(), args.repeat),
+        "refresh_upsert": measure(lambda: _upsert(items, "order_item_id", changed, np.empty(0, np.int64)),
+                                  args.repeat),
+    }
+    loop = measure(lambda: loop_top_products(snapshot, loop_rows, 10), 1)
+    vectorized = measure(lambda: SalesSnapshot({}, {name: values[:loop_rows] for name, values in items.items()},
+                                               snapshot.loyalty, snapshot.tiers).top_products(10), args.repeat)
+    print(json.dumps({
+        "orders": len(snapshot.orders["order_id"]),
+        "order_items": len(items["order_item_id"]),
+        "snapshot_mb": round(sum(values.nbytes for columns in (snapshot.orders, items)
+                                 for values in columns.values()) / 2 ** 20, 1),
+        "build_seconds": round(built, 3),
+        "reports": reports,
+        "top_products_vs_loop": {"rows": loop_rows, "loop": loop, "vectorized": vectorized,
+                                 "speedup": round(loop["median_ms"] / vectorized["median_ms"], 1)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
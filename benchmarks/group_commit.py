@@ -0,0 +1,119 @@
+"""Benchmark: checkout throughput with and without group commit.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --orders 10000
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.group_commit --threads 16 --duration 10 --window-ms 2
+
+Runs OrderService.create_order from --threads threads for --duration seconds,
+first committing each order on its own, then with the GroupCommitter at each
+--window-ms. Reports placed orders per second, database commits per second
+(counted on the engine) and checkout latency.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from typing import List
+
+from sqlalchemy import event, select
+
+from benchmarks.load import percentile
+from benchmarks.seed import CUSTOMER_ROLE_ID
+from config.database import SessionLocal, engine
+from config.migrations import create_schema
+from models.customers import Customer
+from models.products import Product
+from schemas.orders import OrderItemRequest, OrderRequest
+from services.group_commit import group_committer
+from services.order_service import OrderService
+
+
+def run(threads: int, duration: float, window_ms: float, customer_ids: List[int], product_ids: List[int],
+        seed: int) -> dict:
+    group_committer.window_ms = window_ms
+    commits = [0]
+    latencies: List[float] = []
+    failures = [0]
+    errors = set()
+    lock = threading.Lock()
+
+    def count_commit(conn):
+        with lock:
+            commits[0] += 1
+
+    def worker(index: int, deadline: float):
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            lines = rng.sample(product_ids, min(rng.randint(1, 4), len(product_ids)))
+            order = OrderRequest(items=[OrderItemRequest(product_id=product_id, quantity=1) for product_id in lines])
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                OrderService(db).create_order(order, rng.choice(customer_ids))
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    failures[0] += 1
+                    errors.add(str(e)[:200])
+            finally:
+                db.close()
+
+    event.listen(engine, "commit", count_commit)
+    try:
+        deadline = time.perf_counter() + duration
+        workers = [threading.Thread(target=worker, args=(index, deadline)) for index in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "commit", count_commit)
+
+    latencies.sort()
+    return {
+        "window_ms": window_ms,
+        "orders": len(latencies),
+        "failures": failures[0],
+        "errors": sorted(errors)[:3],
+        "orders_per_second": round(len(latencies) / elapsed, 2),
+        "commits_per_second": round(commits[0] / elapsed, 2),
+        "orders_per_commit": round(len(latencies) / commits[0], 2) if commits[0] else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-order commits with group commit")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--window-ms", type=float, nargs="+", default=[1.0, 2.0, 5.0])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # databases seeded before the outbox and invalidation tables existed lack them
+    create_schema(engine)
+    db = SessionLocal()
+    try:
+        customer_ids = list(db.scalars(select(Customer.customer_id).where(Customer.role_id == CUSTOMER_ROLE_ID)))
+        # plenty of stock, so failures are contention rather than sold-out products
+        product_ids = list(db.scalars(select(Product.product_id).where(Product.stock_quantity > 1000)))
+    finally:
+        db.close()
+    if not customer_ids or not product_ids:
+        raise SystemExit("seed the database first: python -m benchmarks.seed")
+
+    results = [run(args.threads, args.duration, 0, customer_ids, product_ids, args.seed)]
+    for window_ms in args.window_ms:
+        results.append(run(args.threads, args.duration, window_ms, customer_ids, product_ids, args.seed))
+    group_committer.window_ms = 0
+    print(json.dumps({"threads": args.threads, "duration_s": args.duration, "runs": results,
+                      "group_commit": group_committer.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""In-process load benchmark for the FastAPI app.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --orders 100000
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.load --duration 30 --concurrency 32 --output bench.json
+
+Drives main.app through httpx's ASGI transport (no sockets, no uvicorn) with a
+weighted mix of scenarios and writes throughput plus p50/p95/p99 latency per
+route as JSON, so two runs can be diffed between commits.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+
+from benchmarks.seed import ADMIN_EMAIL, BENCH_PASSWORD, CUSTOMER_ROLE_ID
+from config.database import SessionLocal
+from models.customers import Customer
+from models.products import Product
+
+# scenario name -> relative weight
+SCENARIOS = {
+    "login": 5,
+    "browse": 40,
+    "checkout": 15,
+    "order_history": 30,
+    "admin_revenue": 10,
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank percentile
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+    def report(self, duration: float) -> Dict:
+        routes = {}
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            routes[route] = {
+                "requests": len(values),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": round(len(values) / duration, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+        total = sum(route["requests"] for route in routes.values())
+        return {
+            "duration_s": round(duration, 3),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(total / duration, 2) if duration else 0.0,
+            "routes": routes,
+        }
+
+
+class Workload:
+    """One simulated client. Tokens and placed orders are shared between workers so
+    sessions are reused the way real clients reuse them."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, customer_emails: List[str],
+                 product_ids: List[int], rng: random.Random, tokens: Dict[str, str],
+                 order_ids: Dict[str, List[int]]):
+        self.client = client
+        self.recorder = recorder
+        self.customer_emails = customer_emails
+        self.product_ids = product_ids
+        self.rng = rng
+        self.tokens = tokens
+        self.order_ids = order_ids
+
+    async def call(self, route: str, method: str, url: str, token: Optional[str] = None, **kwargs) -> httpx.Response:
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=headers, **kwargs)
+        self.recorder.record(route, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    async def login(self, email: str) -> Optional[str]:
+        response = await self.call("POST /auth/login", "POST", "/auth/login",
+                                   data={"username": email, "password": BENCH_PASSWORD})
+        if response.status_code != 200:
+            return None
+        token = response.json()["access_token"]
+        self.tokens[email] = token
+        return token
+
+    async def token_for(self, email: str) -> Optional[str]:
+        return self.tokens.get(email) or await self.login(email)
+
+    async def scenario_login(self):
+        await self.login(self.rng.choice(self.customer_emails))
+
+    async def scenario_browse(self):
+        token = await self.token_for(ADMIN_EMAIL)
+        await self.call("GET /admin/products", "GET", "/admin/products", token)
+        for product_id in self.rng.sample(self.product_ids, min(3, len(self.product_ids))):
+            await self.call("GET /admin/products/{product_id}", "GET", f"/admin/products/{product_id}", token)
+
+    async def scenario_checkout(self):
+        email = self.rng.choice(self.customer_emails)
+        token = await self.token_for(email)
+        lines = self.rng.sample(self.product_ids, min(self.rng.randint(1, 4), len(self.product_ids)))
+        body = {"items": [{"product_id": product_id, "quantity": self.rng.randint(1, 3)} for product_id in lines]}
+        response = await self.call("POST /orders/", "POST", "/orders/", token, json=body)
+        if response.status_code == 201:
+            self.order_ids[email].append(response.json()["data"]["order_id"])
+
+    async def scenario_order_history(self):
+        email = self.rng.choice(self.customer_emails)
+        token = await self.token_for(email)
+        await self.call("GET /orders/", "GET", "/orders/", token)
+        if self.order_ids[email]:
+            order_id = self.rng.choice(self.order_ids[email])
+            await self.call("GET /orders/{order_id}", "GET", f"/orders/{order_id}", token)
+
+    async def scenario_admin_revenue(self):
+        token = await self.token_for(ADMIN_EMAIL)
+        year = self.rng.choice([None, 2023, 2024, 2025])
+        params = {"year": year} if year else {}
+        await self.call("GET /revenue/statistics/daily", "GET", "/revenue/statistics/daily", token)
+        await self.call("GET /revenue/statistics/monthly", "GET", "/revenue/statistics/monthly", token,
+                        params=params)
+        await self.call("GET /revenue/statistics/yearly", "GET", "/revenue/statistics/yearly", token,
+                        params=params)
+
+
+def load_fixtures(customer_sample: int, product_sample: int):
+    db = SessionLocal()
+    try:
+        emails = list(db.execute(
+            select(Customer.email).where(Customer.role_id == CUSTOMER_ROLE_ID)
+            .order_by(Customer.customer_id).limit(customer_sample)
+        ).scalars())
+        product_ids = list(db.execute(
+            select(Product.product_id).order_by(Product.product_id).limit(product_sample)
+        ).scalars())
+    finally:
+        db.close()
+    if not emails or not product_ids:
+        raise SystemExit("Database is empty, run `python -m benchmarks.seed` first")
+    return emails, product_ids
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(duration: float, concurrency: int, seed_value: int, customer_sample: int,
+              product_sample: int, warmup: float) -> Dict:
+    from main import app
+
+    emails, product_ids = load_fixtures(customer_sample, product_sample)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name] for name in names]
+
+    tokens: Dict[str, str] = {}
+    order_ids: Dict[str, List[int]] = defaultdict(list)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(worker_id: int, recorder: Recorder, deadline: float):
+            rng = random.Random(seed_value * 1000 + worker_id)
+            workload = Workload(client, recorder, emails, product_ids, rng, tokens, order_ids)
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(names, weights)[0]
+                await getattr(workload, f"scenario_{scenario}")()
+
+        if warmup > 0:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(worker(n, Recorder(), deadline) for n in range(concurrency)))
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker(n, recorder, deadline) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "duration_s": duration,
+        "concurrency": concurrency,
+        "seed": seed_value,
+        "scenarios": SCENARIOS,
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mixed-scenario load benchmark in-process")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, default=200, help="seeded customers used as sessions")
+    parser.add_argument("--products", type=int, default=500, help="seeded products used in baskets")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.duration, args.concurrency, args.seed, args.customers,
+                             args.products, args.warmup))
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Query-plan regression check: EXPLAIN every statement the app issues.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --orders 100000
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.query_plans --output plans.json
+
+Brings the schema up to date (check_schema), then drives main.app through
+httpx's ASGI transport with a request for every route (run_scenarios) and runs
+the background jobs' queries once (an outbox relay page, an invalidation poll,
+an archive pass that matches no orders). Every statement sent to the database
+is recorded with the parameters of its first execution and explained
+afterwards: EXPLAIN QUERY PLAN on sqlite, EXPLAIN on mysql.
+
+A statement that reads a whole table (sqlite `SCAN <table>`, mysql type ALL) is
+a regression unless the table is a small lookup table (SMALL_TABLES) or the
+scenario reads that table in full by design (EXPECTED_SCANS). The exit status
+is 1 when there is any, so the check can gate a CI job. The plans are written
+as JSON, so two runs can be diffed between commits.
+
+It writes to the database: a registered customer, a placed then deleted order,
+a created then retired product, and a password changed and changed back. Run it
+against a seeded copy, not production.
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy import event, select
+
+from benchmarks.load import git_revision
+from benchmarks.seed import ADMIN_EMAIL, BENCH_PASSWORD, CUSTOMER_ROLE_ID
+from config.database import Base, SessionLocal, engine
+from config.migrations import check_schema
+from models.customers import Customer
+from models.products import Product
+
+# read in full wherever they are read; a handful of rows each
+SMALL_TABLES = {"roles", "customer_loyalty", "schema_version"}
+
+# scenario -> tables it reads in full on purpose
+EXPECTED_SCANS: Dict[str, Set[str]] = {
+    # admin listings return every row
+    "GET /admin/products": {"products"},
+    "GET /admin/customers": {"customers"},
+    "GET /admin/orders": {"orders", "order_items"},
+    # the search index is built from the whole catalog
+    "GET /products/search": {"products"},
+    # all-time reports aggregate every order; the per-year ones use ix_orders_order_date
+    "GET /revenue/statistics/daily": {"orders"},
+    "GET /revenue/statistics/monthly": {"orders"},
+    "GET /revenue/statistics/yearly": {"orders"},
+    # the analytics snapshot is loaded once, then refreshed through the updated_at
+    # indexes; tiers are read by primary key for the customers who ordered
+    "GET /revenue/analytics/top-products": {"orders", "order_items"},
+}
+
+SCAN_SQLITE = re.compile(r"^SCAN (\w+)")
+ALIAS_SUFFIX = re.compile(r"_\d+$")
+
+
+class StatementLog:
+    """Distinct statements issued while a scenario runs, with the scenario that
+    issued each first and the parameters it first ran with."""
+
+    def __init__(self):
+        self.scenario: Optional[str] = None
+        self.statements: Dict[str, dict] = {}
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.scenario is None or not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            return
+        entry = self.statements.get(statement)
+        if entry is None:
+            if executemany:
+                parameters = parameters[0]
+            entry = self.statements[statement] = {"parameters": parameters, "scenarios": []}
+        if self.scenario not in entry["scenarios"]:
+            entry["scenarios"].append(self.scenario)
+
+
+def _table_name(name: str, tables: Set[str]) -> Optional[str]:
+    # orders_1 and the like are SQLAlchemy aliases of orders
+    for candidate in (name, ALIAS_SUFFIX.sub("", name)):
+        if candidate in tables:
+            return candidate
+    return None
+
+
+def explain(connection, statement: str, parameters) -> Tuple[List[str], Set[str]]:
+    """The plan as text lines and the tables it reads in full."""
+    tables = set(Base.metadata.tables)
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        plan = [row[3] for row in rows]
+        scanned = {_table_name(match.group(1), tables)
+                   for match in (SCAN_SQLITE.match(line) for line in plan) if match}
+    elif dialect == "mysql":
+        result = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        rows = [dict(zip(result.keys(), row)) for row in result]
+        plan = [f"{row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} "
+                f"{row.get('Extra') or ''}".rstrip() for row in rows]
+        scanned = {_table_name(row.get("table") or "", tables) for row in rows if row.get("type") == "ALL"}
+    else:
+        raise SystemExit(f"No plan reader for {dialect}; use sqlite or mysql")
+    return plan, scanned - {None}
+
+
+class Client:
+    def __init__(self, client: httpx.AsyncClient, log: StatementLog):
+        self.client = client
+        self.log = log
+        self.failures: List[str] = []
+
+    async def call(self, scenario: str, method: str, url: str, token: Optional[str] = None,
+                   **kwargs) -> httpx.Response:
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        self.log.scenario = scenario
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        finally:
+            self.log.scenario = None
+        if response.status_code >= 400:
+            self.failures.append(f"{scenario}: HTTP {response.status_code}")
+        return response
+
+    async def login(self, email: str, password: str = BENCH_PASSWORD) -> dict:
+        response = await self.call("POST /auth/login", "POST", "/auth/login",
+                                   data={"username": email, "password": password})
+        if response.status_code != 200:
+            raise SystemExit(f"Could not log in as {email}; seed the database with `python -m benchmarks.seed`")
+        return response.json()
+
+
+async def run_scenarios(client: Client, email: str, product_ids: List[int]):
+    tokens = await client.login(email)
+    token = tokens["access_token"]
+    refreshed = await client.call("POST /auth/refresh", "POST", "/auth/refresh",
+                                  json={"refresh_token": tokens["refresh_token"]})
+    if refreshed.status_code == 200:
+        token = refreshed.json()["access_token"]
+    stamp = int(time.time() * 1000)
+    await client.call("POST /auth/register", "POST", "/auth/register", json={
+        "name": "Plan Check", "email": f"plans-{stamp}@example.com", "password": BENCH_PASSWORD,
+        "phone_number": "0123456789", "address": "Plan Street", "role_id": CUSTOMER_ROLE_ID})
+
+    await client.call("GET /customers/", "GET", "/customers/", token)
+    await client.call("PUT /customers/", "PUT", "/customers/", token, json={"address": "Plan Street"})
+    for current, new in ((BENCH_PASSWORD, f"{BENCH_PASSWORD}-plans"), (f"{BENCH_PASSWORD}-plans", BENCH_PASSWORD)):
+        await client.call("PUT /customers/password", "PUT", "/customers/password", token,
+                          json={"password": current, "new_password": new})
+
+    ids = ",".join(str(product_id) for product_id in product_ids)
+    await client.call("GET /products/", "GET", "/products/", token, params={"ids": ids})
+    await client.call("GET /products/search", "GET", "/products/search", token,
+                      params={"q": "rose", "in_stock": True})
+
+    basket = {"items": [{"product_id": product_id, "quantity": 1} for product_id in product_ids]}
+    placed = await client.call("POST /orders/", "POST", "/orders/", token, json=basket)
+    await client.call("GET /orders/", "GET", "/orders/", token)
+    if placed.status_code == 201:
+        order_id = placed.json()["data"]["order_id"]
+        await client.call("GET /orders/?ids", "GET", "/orders/", token, params={"ids": str(order_id)})
+        await client.call("GET /orders/{order_id}", "GET", f"/orders/{order_id}", token)
+        await client.call("GET /orders/{order_id}?fields", "GET", f"/orders/{order_id}", token,
+                          params={"fields": "order_id,total_amount"})
+        basket["items"] = basket["items"][:1]
+        await client.call("PUT /orders/{order_id}", "PUT", f"/orders/{order_id}", token, json=basket)
+        await client.call("DELETE /orders/{order_id}", "DELETE", f"/orders/{order_id}", token)
+
+    admin = (await client.login(ADMIN_EMAIL))["access_token"]
+    created = await client.call("POST /admin/products", "POST", "/admin/products", admin, json={
+        "name": f"Plan Check {stamp}", "description": "query plan check", "price": 1.0, "stock_quantity": 1})
+    product_id = (created.json().get("data") or {}).get("product_id")
+    if product_id:
+        await client.call("GET /admin/products/{product_id}", "GET", f"/admin/products/{product_id}", admin)
+        await client.call("PUT /admin/products/{product_id}", "PUT", f"/admin/products/{product_id}", admin,
+                          json={"price": 2.0})
+        await client.call("DELETE /admin/products/{product_id}", "DELETE", f"/admin/products/{product_id}", admin)
+    for path in ("/admin/products", "/admin/customers", "/admin/orders", "/admin/changes"):
+        await client.call(f"GET {path}", "GET", path, admin)
+
+    year = datetime.utcnow().year
+    for report in ("daily", "monthly", "yearly"):
+        await client.call(f"GET /revenue/statistics/{report}", "GET", f"/revenue/statistics/{report}", admin)
+    await client.call("GET /revenue/statistics/daily?date", "GET", "/revenue/statistics/daily", admin,
+                      params={"date": f"{year}-01-15"})
+    for report in ("monthly", "yearly"):
+        await client.call(f"GET /revenue/statistics/{report}?year", "GET", f"/revenue/statistics/{report}",
+                          admin, params={"year": year})
+    for report in ("top-products", "basket-sizes", "loyalty-tiers"):
+        await client.call(f"GET /revenue/analytics/{report}", "GET", f"/revenue/analytics/{report}", admin)
+
+
+def run_background_jobs(log: StatementLog):
+    from services.invalidation import invalidation_bus
+    from services.order_archive import archive_orders
+    from services.outbox import read_events
+    from services.sales_analytics import SalesAnalytics
+
+    log.scenario = "invalidation poll"
+    invalidation_bus.poll()
+    db = SessionLocal()
+    try:
+        log.scenario = "outbox relay"
+        read_events(db, 0)
+        log.scenario = "order archive"
+        # nothing is that old, so only the chunk query runs
+        archive_orders(db, datetime(1970, 1, 1), directory=tempfile.mkdtemp())
+        # the reports above built the analytics snapshot; later requests only refresh it
+        analytics = SalesAnalytics(max_age=0)
+        log.scenario = None
+        analytics.snapshot(db)
+        log.scenario = "analytics refresh"
+        analytics.snapshot(db)
+    finally:
+        db.close()
+    log.scenario = None
+
+
+def load_fixtures() -> Tuple[str, List[int]]:
+    db = SessionLocal()
+    try:
+        email = db.execute(select(Customer.email).where(Customer.role_id == CUSTOMER_ROLE_ID)
+                           .order_by(Customer.customer_id).limit(1)).scalar()
+        product_ids = list(db.execute(select(Product.product_id).where(Product.stock_quantity > 10)
+                                      .order_by(Product.product_id).limit(3)).scalars())
+    finally:
+        db.close()
+    if email is None or not product_ids:
+        raise SystemExit("Database is empty, run `python -m benchmarks.seed` first")
+    return email, product_ids
+
+
+async def capture(log: StatementLog) -> List[str]:
+    from main import app, write_catalog_snapshot
+
+    email, product_ids = load_fixtures()
+    # what startup does before serving; the transport does not run the lifespan
+    write_catalog_snapshot()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plans") as http:
+        client = Client(http, log)
+        await run_scenarios(client, email, product_ids)
+    run_background_jobs(log)
+    return client.failures
+
+
+def check(log: StatementLog) -> Tuple[List[dict], int]:
+    plans = []
+    regressions = 0
+    with engine.connect() as connection:
+        for statement, entry in log.statements.items():
+            plan, scanned = explain(connection, statement, entry["parameters"])
+            expected = set(SMALL_TABLES)
+            for scenario in entry["scenarios"]:
+                expected |= EXPECTED_SCANS.get(scenario, set())
+            unexpected = sorted(scanned - expected)
+            regressions += bool(unexpected)
+            plans.append({"scenarios": entry["scenarios"], "statement": " ".join(statement.split()),
+                          "plan": plan, "full_scans": sorted(scanned), "unexpected_full_scans": unexpected})
+        connection.rollback()
+    return plans, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN every statement the app issues and flag full table scans")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    check_schema(engine)
+    log = StatementLog()
+    event.listen(engine, "before_cursor_execute", log.record)
+    try:
+        failures = asyncio.run(capture(log))
+    finally:
+        event.remove(engine, "before_cursor_execute", log.record)
+    plans, regressions = check(log)
+
+    report = {
+        "dialect": engine.dialect.name,
+        "git_revision": git_revision(),
+        "statements": len(plans),
+        "regressions": regressions,
+        "failed_requests": failures,
+        "plans": plans,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for entry in plans:
+        if entry["unexpected_full_scans"]:
+            print(f"Full scan of {', '.join(entry['unexpected_full_scans'])} in {', '.join(entry['scenarios'])}: "
+                  f"{entry['statement'][:200]}", file=sys.stderr)
+    if regressions or failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Synthetic data generator for benchmarks.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --customers 100000 --products 5000 --orders 1000000
+
+Rows are generated deterministically from --seed and written with Core bulk
+inserts in chunks, so a million orders load in seconds instead of going
+through the ORM unit of work one object at a time.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import bindparam, func, insert, select
+
+from config.auth import get_password_hash
+from config.database import Base, engine
+from config.migrations import create_schema
+from models.customer_loyalty import CustomerLoyalty
+from models.customers import Customer
+from models.order_items import OrderItem
+from models.orders import Order
+from models.products import Product
+from models.roles import Role
+
+BENCH_PASSWORD = "benchmark"
+ADMIN_EMAIL = "bench-admin@example.com"
+ADMIN_ROLE_ID = 1
+CUSTOMER_ROLE_ID = 2
+
+LOYALTY_TIERS = [
+    ("Bronze", 100, "Spent at least 100"),
+    ("Silver", 1000, "Spent at least 1,000"),
+    ("Gold", 5000, "Spent at least 5,000"),
+]
+
+FLOWERS = ["Rose", "Tulip", "Lily", "Orchid", "Peony", "Daisy", "Sunflower", "Carnation", "Iris", "Lavender",
+           "Hydrangea", "Gerbera", "Lotus", "Jasmine", "Magnolia", "Camellia"]
+STYLES = ["Bouquet", "Basket", "Vase", "Box", "Wreath", "Posy", "Garland", "Stem"]
+COLORS = ["Red", "White", "Pink", "Yellow", "Purple", "Orange", "Blue", "Mixed"]
+
+
+def customer_email(n: int) -> str:
+    return f"bench{n}@example.com"
+
+
+def _chunked_insert(conn, model, rows: Iterator[Dict], chunk_size: int) -> int:
+    count = 0
+    chunk: List[Dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            conn.execute(insert(model), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(model), chunk)
+        count += len(chunk)
+    return count
+
+
+def _next_id(conn, column) -> int:
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def seed(customers: int, products: int, orders: int, max_items: int = 5, years: int = 3,
+         seed_value: int = 42, chunk_size: int = 10000, reset: bool = False) -> Dict:
+    rng = random.Random(seed_value)
+    started = time.perf_counter()
+
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    create_schema(engine)
+
+    # bcrypt is deliberately slow; every seeded customer shares one hash
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    now = datetime.utcnow().replace(microsecond=0)
+    span_seconds = int(timedelta(days=365 * years).total_seconds())
+    counts = {}
+
+    with engine.begin() as conn:
+        existing_roles = set(conn.execute(select(Role.role_id)).scalars())
+        roles = [{"role_id": role_id, "role_name": name, "role_description": None}
+                 for role_id, name in ((ADMIN_ROLE_ID, "admin"), (CUSTOMER_ROLE_ID, "customer"))
+                 if role_id not in existing_roles]
+        if roles:
+            conn.execute(insert(Role), roles)
+
+        loyalty_ids = list(conn.execute(
+            select(CustomerLoyalty.loyalty_id).order_by(CustomerLoyalty.loyalty_points)).scalars())
+        if not loyalty_ids:
+            conn.execute(insert(CustomerLoyalty), [
+                {"status": status, "loyalty_points": points, "loyalty_description": description}
+                for status, points, description in LOYALTY_TIERS
+            ])
+            loyalty_ids = list(conn.execute(
+                select(CustomerLoyalty.loyalty_id).order_by(CustomerLoyalty.loyalty_points)).scalars())
+        tier_points = [points for _, points, _ in LOYALTY_TIERS][:len(loyalty_ids)]
+
+        first_customer = _next_id(conn, Customer.customer_id)
+        first_product = _next_id(conn, Product.product_id)
+        first_order = _next_id(conn, Order.order_id)
+        first_item = _next_id(conn, OrderItem.order_item_id)
+
+        if conn.execute(select(Customer.customer_id).where(Customer.email == ADMIN_EMAIL)).first() is None:
+            conn.execute(insert(Customer), [{
+                "customer_id": first_customer,
+                "name": "Benchmark Admin",
+                "email": ADMIN_EMAIL,
+                "hashed_password": hashed_password,
+                "phone_number": "0000000000",
+                "address": "",
+                "total_spent": 0.0,
+                "role_id": ADMIN_ROLE_ID,
+            }])
+            first_customer += 1
+
+        product_prices = [round(rng.uniform(5, 250), 2) for _ in range(products)]
+
+        def product_rows():
+            for n in range(products):
+                flower, style, color = rng.choice(FLOWERS), rng.choice(STYLES), rng.choice(COLORS)
+                yield {
+                    "product_id": first_product + n,
+                    "name": f"{color} {flower} {style} {n}",
+                    "description": f"A {color.lower()} {flower.lower()} {style.lower()} for every occasion",
+                    "price": product_prices[n],
+                    "stock_quantity": rng.randint(10 ** 6, 10 ** 7),
+                }
+
+        counts["products"] = _chunked_insert(conn, Product, product_rows(), chunk_size)
+
+        def customer_rows():
+            for n in range(customers):
+                yield {
+                    "customer_id": first_customer + n,
+                    "name": f"Customer {n}",
+                    "email": customer_email(first_customer + n),
+                    "hashed_password": hashed_password,
+                    "phone_number": f"09{n:08d}",
+                    "address": f"{n} Flower Street",
+                    "loyalty_id": None,
+                    "total_spent": 0.0,
+                    "role_id": CUSTOMER_ROLE_ID,
+                }
+
+        counts["customers"] = _chunked_insert(conn, Customer, customer_rows(), chunk_size)
+
+        # total_spent and loyalty are accumulated while generating orders and written back at the end
+        spent = [0.0] * customers
+        order_chunk: List[Dict] = []
+        item_chunk: List[Dict] = []
+        counts["orders"] = counts["order_items"] = 0
+        item_id = first_item
+
+        for n in range(orders):
+            order_id = first_order + n
+            customer = rng.randrange(customers)
+            total = 0.0
+            for product in rng.sample(range(products), min(rng.randint(1, max_items), products)):
+                quantity = rng.randint(1, 4)
+                price = product_prices[product]
+                total += price * quantity
+                item_chunk.append({
+                    "order_item_id": item_id,
+                    "order_id": order_id,
+                    "product_id": first_product + product,
+                    "quantity": quantity,
+                    "price_at_purchase": price,
+                })
+                item_id += 1
+            spent[customer] += total
+            order_chunk.append({
+                "order_id": order_id,
+                "customer_id": first_customer + customer,
+                "order_date": now - timedelta(seconds=rng.randrange(span_seconds)),
+                "total_amount": round(total, 2),
+            })
+            if len(order_chunk) >= chunk_size or n == orders - 1:
+                conn.execute(insert(Order), order_chunk)
+                conn.execute(insert(OrderItem), item_chunk)
+                counts["orders"] += len(order_chunk)
+                counts["order_items"] += len(item_chunk)
+                order_chunk, item_chunk = [], []
+
+        def loyalty_for(total: float):
+            loyalty_id = None
+            for tier_id, points in zip(loyalty_ids, tier_points):
+                if total >= points:
+                    loyalty_id = tier_id
+            return loyalty_id
+
+        customer_table = Customer.__table__
+        updates = [{"b_customer_id": first_customer + n, "b_total_spent": round(total, 2),
+                    "b_loyalty_id": loyalty_for(total)}
+                   for n, total in enumerate(spent) if total]
+        if updates:
+            statement = customer_table.update().where(
+                customer_table.c.customer_id == bindparam("b_customer_id")
+            ).values(total_spent=bindparam("b_total_spent"), loyalty_id=bindparam("b_loyalty_id"))
+            for start in range(0, len(updates), chunk_size):
+                conn.execute(statement, updates[start:start + chunk_size])
+
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the configured database with synthetic shop data")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--max-items", type=int, default=5, help="maximum lines per order")
+    parser.add_argument("--years", type=int, default=3, help="spread order dates over this many years")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    args = parser.parse_args()
+
+    counts = seed(args.customers, args.products, args.orders, args.max_items, args.years,
+                  args.seed, args.chunk_size, args.reset)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == "__main__":
+    main()
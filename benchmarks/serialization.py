@@ -0,0 +1,115 @@
+"""Micro-benchmark: old vs fast order response path on a 1k-order payload.
+
+    python -m benchmarks.serialization --orders 1000 --items 3
+
+"old" is what routers/orders.py used to do: build OrderResponse/OrderItemResponse
+models, wrap them in BaseResponse, then let FastAPI validate against
+response_model, run jsonable_encoder and render with JSONResponse. "fast" builds
+the envelope dicts once and renders them with FastJSONResponse.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models.customer_loyalty import CustomerLoyalty  # noqa: F401 - every model must be imported
+from models.customers import Customer  # noqa: F401   before the mappers configure
+from models.order_items import OrderItem
+from models.orders import Order
+from models.products import Product  # noqa: F401
+from models.roles import Role  # noqa: F401
+from schemas.base_response import BaseResponse
+from schemas.fast_response import FastJSONResponse, envelope
+from schemas.orders import OrderItemResponse, OrderResponse
+from schemas.serializers import orders_to_dicts
+
+
+def make_orders(count: int, items_per_order: int) -> List[Order]:
+    started = datetime(2024, 1, 1)
+    orders = []
+    item_id = 1
+    for n in range(1, count + 1):
+        items = []
+        for line in range(items_per_order):
+            items.append(OrderItem(order_item_id=item_id, order_id=n, product_id=line + 1,
+                                   quantity=line + 1, price_at_purchase=9.99 + line))
+            item_id += 1
+        orders.append(Order(order_id=n, customer_id=n % 97 + 1, order_date=started + timedelta(minutes=n),
+                            total_amount=sum(i.quantity * i.price_at_purchase for i in items), items=items))
+    return orders
+
+
+response_field = create_model_field(name="Response", type_=BaseResponse[List[OrderResponse]], mode="serialization")
+
+
+def old_path(orders: List[Order]) -> bytes:
+    response = BaseResponse(
+        message="Orders retrieved successfully",
+        status="success",
+        data=[OrderResponse(
+            order_id=order.order_id,
+            customer_id=order.customer_id,
+            total_amount=order.total_amount,
+            order_date=order.order_date,
+            items=[OrderItemResponse(
+                order_item_id=item.order_item_id,
+                order_id=item.order_id,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price_at_purchase=item.price_at_purchase
+            ) for item in order.items]
+        ) for order in orders]
+    )
+    content = asyncio.run(serialize_response(field=response_field, response_content=response, is_coroutine=False))
+    return JSONResponse(content).body
+
+
+def fast_path(orders: List[Order]) -> bytes:
+    return FastJSONResponse(envelope("Orders retrieved successfully", "success", orders_to_dicts(orders))).body
+
+
+def measure(func, orders, repeat: int) -> dict:
+    func(orders)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func(orders)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "best_ms": round(timings[0] * 1000, 3),
+        "median_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "bytes": len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare old and fast order response serialization")
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=3, help="items per order")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders, args.items)
+    if json.loads(old_path(orders)) != json.loads(fast_path(orders)):
+        raise SystemExit("old and fast paths produced different payloads")
+
+    old = measure(old_path, orders, args.repeat)
+    fast = measure(fast_path, orders, args.repeat)
+    print(json.dumps({
+        "orders": args.orders,
+        "items_per_order": args.items,
+        "old": old,
+        "fast": fast,
+        "speedup": round(old["median_ms"] / fast["median_ms"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
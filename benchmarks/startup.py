@@ -0,0 +1,95 @@
+"""Benchmark: worker startup, from interpreter launch to the first answered request.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.startup --workers 4 --repeat 3
+
+Starts --workers uvicorn processes at the same moment, as `uvicorn --workers N`
+or a deploy does, and polls each one's GET / until it answers. For each worker it
+reports how long the interpreter spent importing main and how long until the
+first request was answered, which includes the lifespan startup.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+
+from benchmarks.load import percentile
+
+# run inside each worker: time the import of main, then serve it
+WORKER = """
+import sys, time
+started = time.perf_counter()
+import main
+print(f"imported {time.perf_counter() - started:.6f}", flush=True)
+import uvicorn
+uvicorn.run(main.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_workers(count: int, timeout: float) -> List[dict]:
+    ports = [free_port() for _ in range(count)]
+    launched = time.perf_counter()
+    processes = [subprocess.Popen([sys.executable, "-c", WORKER, str(port)], stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, text=True, env=os.environ.copy())
+                 for port in ports]
+    pending = dict(zip(ports, processes))
+    first_response = {}
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while pending and time.perf_counter() - launched < timeout:
+                for port in list(pending):
+                    try:
+                        if client.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                            first_response[port] = time.perf_counter() - launched
+                            del pending[port]
+                    except httpx.TransportError:
+                        pass
+                time.sleep(0.005)
+    finally:
+        for process in processes:
+            process.terminate()
+    results = []
+    for port, process in zip(ports, processes):
+        output, _ = process.communicate(timeout=10)
+        imported = next((float(line.split()[1]) for line in output.splitlines() if line.startswith("imported ")),
+                        None)
+        results.append({"import_s": imported, "first_request_s": first_response.get(port)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time worker import and first request")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    runs = [start_workers(args.workers, args.timeout) for _ in range(args.repeat)]
+    workers = [worker for run in runs for worker in run]
+    imports = sorted(worker["import_s"] for worker in workers if worker["import_s"] is not None)
+    firsts = sorted(worker["first_request_s"] for worker in workers if worker["first_request_s"] is not None)
+    print(json.dumps({
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "failed": len(workers) - len(firsts),
+        "import_p50_s": round(percentile(imports, 0.50), 3),
+        "import_max_s": round(imports[-1], 3) if imports else None,
+        "first_request_p50_s": round(percentile(firsts, 0.50), 3),
+        "first_request_max_s": round(firsts[-1], 3) if firsts else None,
+        "runs": runs,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
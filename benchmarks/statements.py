@@ -0,0 +1,114 @@
+"""Micro-benchmark: legacy Query lookups against the module-level select() statements.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --orders 10000
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.statements --repeat 2000
+
+Times the hot-path lookups (the authenticated customer, a login, one order with
+its items, the stock of a basket's products) written the old way, as a
+db.query(...) chain built on every call, and the way the services now run them,
+as statements built once at import with bindparam() placeholders. Each call
+runs in a fresh session, as a request does, so the identity map never answers
+for the database. The database work is the same on both sides; the difference
+is what SQLAlchemy spends building the statement and looking up its compiled
+form.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only, selectinload
+
+from config.auth import CUSTOMER_BY_ID
+from config.database import SessionLocal
+from models.customers import Customer
+from models.orders import Order
+from models.products import Product
+from services.authentication_service import LOGIN_BY_EMAIL
+from services.order_service import PRODUCT_STOCK, customer_order_statement
+
+
+def measure(lookup, args, repeat: int) -> dict:
+    timings = []
+    for index in range(repeat):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            lookup(db, *args[index % len(args)])
+            timings.append(time.perf_counter() - started)
+        finally:
+            db.close()
+    timings.sort()
+    return {"best_us": round(timings[0] * 1e6, 1), "median_us": round(statistics.median(timings) * 1e6, 1)}
+
+
+LOOKUPS = {
+    "customer_by_id": (
+        lambda db, customer_id, email, order_id, product_ids:
+            db.query(Customer).filter(Customer.customer_id == customer_id).first(),
+        lambda db, customer_id, email, order_id, product_ids:
+            db.execute(CUSTOMER_BY_ID, {"customer_id": customer_id}).scalar_one_or_none(),
+    ),
+    "login_by_email": (
+        lambda db, customer_id, email, order_id, product_ids:
+            db.query(Customer).filter(Customer.email == email).first(),
+        lambda db, customer_id, email, order_id, product_ids:
+            db.execute(LOGIN_BY_EMAIL, {"email": email}).first(),
+    ),
+    "order_with_items": (
+        lambda db, customer_id, email, order_id, product_ids:
+            db.query(Order).options(selectinload(Order.items)).filter(
+                Order.order_id == order_id, Order.customer_id == customer_id).first(),
+        lambda db, customer_id, email, order_id, product_ids:
+            db.scalars(customer_order_statement(None), {"order_id": order_id, "customer_id": customer_id}).first(),
+    ),
+    "product_stock": (
+        lambda db, customer_id, email, order_id, product_ids:
+            db.query(Product).options(load_only(Product.product_id, Product.stock_quantity)).filter(
+                Product.product_id.in_(product_ids)).all(),
+        lambda db, customer_id, email, order_id, product_ids:
+            db.scalars(PRODUCT_STOCK, {"product_ids": product_ids}).all(),
+    ),
+}
+
+
+def sample_args(count: int, seed: int) -> list:
+    db = SessionLocal()
+    try:
+        if not db.execute(select(func.count()).select_from(Order)).scalar():
+            raise SystemExit("No orders; seed the database first with python -m benchmarks.seed")
+        orders = db.execute(select(Order.order_id, Order.customer_id, Customer.email)
+                            .join(Customer, Customer.customer_id == Order.customer_id)
+                            .order_by(func.random()).limit(count)).all()
+        product_ids = db.scalars(select(Product.product_id)).all()
+    finally:
+        db.close()
+    rng = random.Random(seed)
+    return [(customer_id, email, order_id, rng.sample(product_ids, min(3, len(product_ids))))
+            for order_id, customer_id, email in orders]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time legacy Query lookups against cached select() statements")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--sample", type=int, default=200, help="distinct orders and customers to look up")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    calls = sample_args(args.sample, args.seed)
+    results = {}
+    for name, (legacy, cached) in LOOKUPS.items():
+        # warm both compiled caches first
+        measure(legacy, calls, 10)
+        measure(cached, calls, 10)
+        legacy_timing = measure(legacy, calls, args.repeat)
+        cached_timing = measure(cached, calls, args.repeat)
+        results[name] = {"legacy_query": legacy_timing, "cached_select": cached_timing,
+                         "speedup": round(legacy_timing["median_us"] / cached_timing["median_us"], 2)}
+    print(json.dumps({"repeat": args.repeat, "lookups": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
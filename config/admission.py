@@ -0,0 +1,230 @@
+"""Admission control: per route class concurrency limits and load shedding.
+
+Every request belongs to a route class (ROUTE_CLASSES, matched by path prefix).
+Each class admits at most `limit` requests at a time. A request over the limit
+waits up to the class's queue timeout for a slot, then gets a 503 with
+Retry-After. Requests that hold a slot for a long time (event streams) or must
+answer during an overload (/admin/metrics) are exempt.
+
+Limits adapt to latency, in the style of a gradient limiter. A long moving
+average of each class's latency is its no-queueing reference. When the short
+average climbs above ADMISSION_LATENCY_TOLERANCE times that reference, the
+limit shrinks in proportion; while latency holds, it grows by about sqrt(limit).
+A slow database therefore cuts concurrency before the connection pool becomes a
+queue that clients time out in.
+
+Work is shed by priority before the pool runs dry. The pool saturation is the
+larger of checked-out connections over pool capacity and waiting requests over
+ADMISSION_MAX_QUEUE. A class is refused outright once that reaches its
+`shed_at`: admin and reporting go first, then browsing. Checkout and auth only
+ever wait on their own limits.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2"))
+# waiting requests, over all classes, that count as a saturated server
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "200"))
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    prefixes: Tuple[str, ...]
+    initial_limit: int
+    max_limit: int
+    queue_timeout: float
+    # pool saturation (0-1) from which this class is shed without queueing; None never
+    shed_at: Optional[float]
+
+
+# Most important first. Paths outside every class (the root, docs) are not limited.
+ROUTE_CLASSES: List[RouteClass] = [
+    RouteClass("checkout", ("/orders", "/customers"), 32, 256, 2.0, None),
+    RouteClass("auth", ("/auth",), 16, 64, 1.0, None),
+    RouteClass("browse", ("/products",), 32, 256, 0.5, 0.9),
+    RouteClass("admin", ("/admin", "/revenue"), 8, 64, 0.5, 0.7),
+]
+# long-lived streams would hold a slot for their whole life
+EXEMPT_PREFIXES = ("/events", "/admin/metrics", "/docs", "/redoc", "/openapi.json")
+
+
+class AdaptiveLimit:
+    """Concurrency limit of one route class, adjusted after every response."""
+
+    def __init__(self, route_class: RouteClass, tolerance: float = ADMISSION_LATENCY_TOLERANCE):
+        self.route_class = route_class
+        self.tolerance = tolerance
+        self.limit = float(route_class.initial_limit)
+        self.long_latency: Optional[float] = None
+        self.short_latency: Optional[float] = None
+
+    def update(self, latency: float, in_flight: int):
+        if self.long_latency is None:
+            self.long_latency = self.short_latency = latency
+            return
+        self.short_latency += (latency - self.short_latency) * 0.1
+        self.long_latency += (latency - self.long_latency) * 0.002
+        if self.long_latency > 2 * self.short_latency:
+            # load has dropped; let the reference come back down faster
+            self.long_latency *= 0.95
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_latency / self.short_latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        if target > self.limit and in_flight < self.limit / 2:
+            # an idle limit says nothing about what the database can take
+            return
+        self.limit = min(float(self.route_class.max_limit), max(1.0, self.limit * 0.8 + target * 0.2))
+
+
+class _ClassState:
+    def __init__(self, route_class: RouteClass):
+        self.route_class = route_class
+        self.limiter = AdaptiveLimit(route_class)
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed_queue = 0
+        self.shed_saturated = 0
+
+    def has_slot(self) -> bool:
+        return self.in_flight < int(self.limiter.limit)
+
+
+def pool_saturation(engine, queued: int) -> float:
+    pool = engine.pool
+    # StaticPool (in-memory sqlite) keeps no count
+    if not hasattr(pool, "checkedout"):
+        return queued / ADMISSION_MAX_QUEUE
+    capacity = pool.size() + max(0, getattr(pool, "_max_overflow", 0))
+    return max(pool.checkedout() / capacity if capacity > 0 else 0.0, queued / ADMISSION_MAX_QUEUE)
+
+
+class AdmissionController:
+    """Slot bookkeeping for the middleware. All of it runs on the event loop, so
+    it needs no locks."""
+
+    def __init__(self, route_classes: List[RouteClass] = ROUTE_CLASSES, engine=None):
+        self.classes: Dict[str, _ClassState] = {route_class.name: _ClassState(route_class)
+                                                for route_class in route_classes}
+        self._engine = engine
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from config.database import engine
+
+            self._engine = engine
+        return self._engine
+
+    def classify(self, path: str) -> Optional[_ClassState]:
+        if path.startswith(EXEMPT_PREFIXES):
+            return None
+        for state in self.classes.values():
+            if path.startswith(state.route_class.prefixes):
+                return state
+        return None
+
+    def queued(self) -> int:
+        return sum(len(state.waiters) for state in self.classes.values())
+
+    async def acquire(self, state: _ClassState) -> bool:
+        shed_at = state.route_class.shed_at
+        if shed_at is not None and pool_saturation(self.engine, self.queued()) >= shed_at:
+            state.shed_saturated += 1
+            return False
+        if state.has_slot() and not state.waiters:
+            state.in_flight += 1
+            state.admitted += 1
+            return True
+        if state.route_class.queue_timeout <= 0:
+            state.shed_queue += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, state.route_class.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # the client went away; hand on a slot that was granted meanwhile
+            if waiter.done() and not waiter.cancelled():
+                state.in_flight -= 1
+                self._wake(state)
+            raise
+        finally:
+            if waiter in state.waiters:
+                state.waiters.remove(waiter)
+        # _wake() counts the slot when it grants it, possibly just as the wait timed out
+        if not waiter.done() or waiter.cancelled():
+            state.shed_queue += 1
+            return False
+        state.admitted += 1
+        return True
+
+    def release(self, state: _ClassState, latency: float):
+        state.limiter.update(latency, state.in_flight)
+        state.in_flight -= 1
+        self._wake(state)
+
+    @staticmethod
+    def _wake(state: _ClassState):
+        while state.waiters and state.has_slot():
+            waiter = state.waiters.popleft()
+            if not waiter.done():
+                state.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "limit": int(state.limiter.limit),
+                "in_flight": state.in_flight,
+                "queued": len(state.waiters),
+                "admitted": state.admitted,
+                "shed_queue": state.shed_queue,
+                "shed_saturated": state.shed_saturated,
+                "latency_ms": round((state.limiter.short_latency or 0.0) * 1000, 3),
+                "reference_latency_ms": round((state.limiter.long_latency or 0.0) * 1000, 3),
+            }
+            for name, state in self.classes.items()
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """Admits each request through its route class or answers 503 straight away.
+    Add it last so it runs before every other middleware."""
+
+    def __init__(self, app, controller: AdmissionController = admission_controller,
+                 enabled: bool = ADMISSION_CONTROL):
+        self.app = app
+        self.controller = controller
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        state = self.controller.classify(scope["path"]) if scope["type"] == "http" and self.enabled else None
+        if state is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(state):
+            response = JSONResponse({"detail": "Server is busy, try again later"}, status_code=503,
+                                    headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(state, time.perf_counter() - started)
@@ -3,11 +3,12 @@ from datetime import timedelta, datetime
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from jose import JWTError, jwt
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
 from config.database import get_db
+from config.passwords import password_context
 from models.customers import Customer
 
 SECRET_KEY = os.getenv("PRIVATE_KEY")
@@ -17,9 +18,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 if not SECRET_KEY or not ALGORITHM:
     raise RuntimeError("SECRET_KEY or ALGORITHM is not set in environment variables")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Hot-path statements are built once at import; only their bound parameters change
+# between calls, so nothing is rebuilt per request and the compiled cache always hits.
+CUSTOMER_BY_ID = select(Customer).where(Customer.customer_id == bindparam("customer_id"))
+
 
 def create_access_token(email: str, customer_id: int, role_id: int, expires_delta: timedelta):
     to_encode = {"sub": email, "id": customer_id, "role": role_id}
@@ -29,16 +33,20 @@ def create_access_token(email: str, customer_id: int, role_id: int, expires_delt
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    """Claims of a valid access token; raises JWTError otherwise."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
 
 async def get_current_customer(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         customer_id: int = payload.get("id")
 
         if customer_id is None:
             raise HTTPException(status_code=401, detail="Could not validate credentials")
 
-        customer = db.query(Customer).filter(Customer.customer_id == customer_id).first()
+        customer = db.execute(CUSTOMER_BY_ID, {"customer_id": customer_id}).scalar_one_or_none()
 
         if customer is None:
             raise HTTPException(status_code=401, detail="Customer not found")
@@ -56,8 +64,8 @@ async def get_current_customer(token: str = Depends(oauth2_scheme), db: Session
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(plain_password: str) -> str:
-    return pwd_context.hash(plain_password)
\ No newline at end of file
+    return password_context.hash(plain_password)
\ No newline at end of file
@@ -0,0 +1,52 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple, Union
+
+from sqlalchemy import Date, cast, extract, func
+
+
+def day_bucket(column, dialect_name: str):
+    """Calendar day of a DATETIME column, for grouping and comparisons."""
+    if dialect_name in ("sqlite", "mysql"):
+        # both have date(); sqlite has no DATE type, so there it yields 'YYYY-MM-DD'
+        # text, which sorts and compares correctly
+        return func.date(column)
+    return cast(column, Date)
+
+
+def year_bucket(column):
+    # extract() compiles to EXTRACT on MySQL/PostgreSQL and strftime() on sqlite
+    return extract("year", column)
+
+
+def month_bucket(column):
+    return extract("month", column)
+
+
+def as_date(value: Union[date, datetime, str, None]) -> Optional[date]:
+    """Normalizes a day_bucket() result, which sqlite returns as text."""
+    if value is None or type(value) is date:
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def day_range(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def year_range(year: int) -> Tuple[datetime, datetime]:
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def in_range(column, bounds: Tuple[datetime, datetime]):
+    """Half-open range predicate; unlike filtering on date()/extract() it can use an index on column."""
+    start, end = bounds
+    return (column >= start) & (column < end)
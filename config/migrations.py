@@ -0,0 +1,236 @@
+"""Versioned schema changes.
+
+The app no longer runs create_all() when it starts: startup only compares the
+version recorded in schema_version with LATEST_VERSION (check_schema). So every
+schema change, a new table included, goes here as the next numbered migration.
+New databases get create_all() and then every migration, from
+
+    python -m config.migrations
+
+or from startup itself while SCHEMA_AUTO_MIGRATE is on.
+
+Each migration must be safe on a database that create_all() has just built with
+the current models (it checks before altering). Applied versions are recorded in
+schema_version.
+"""
+import importlib
+import os
+import pkgutil
+import time
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from config.database import Base, engine
+
+# bring an empty or older database up to date at startup instead of refusing to start
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "1") == "1"
+SCHEMA_MIGRATION_WAIT = 30
+
+schema_version = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow, nullable=False),
+)
+
+
+def _add_column(connection: Connection, table: str, column: str, ddl: str) -> bool:
+    columns = {info["name"] for info in inspect(connection).get_columns(table)}
+    if column in columns:
+        return False
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return True
+
+
+def _create_index(connection: Connection, table: str, name: str, columns: str):
+    existing = inspect(connection).get_indexes(table)
+    # mysql already indexes every foreign key column on its own; do not add a twin
+    if any(index["name"] == name or index["column_names"] == [column.strip() for column in columns.split(",")]
+           for index in existing):
+        return
+    connection.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+
+
+def _add_updated_at(connection: Connection):
+    for table, backfill in (("orders", "order_date"), ("order_items", "CURRENT_TIMESTAMP"),
+                            ("products", "CURRENT_TIMESTAMP")):
+        # nullable in the DDL so existing rows can be backfilled on every dialect
+        if _add_column(connection, table, "updated_at", "DATETIME NULL"):
+            connection.execute(text(f"UPDATE {table} SET updated_at = {backfill}"))
+        _create_index(connection, table, f"ix_{table}_updated_at", "updated_at")
+
+
+def _soft_delete_products(connection: Connection):
+    _add_column(connection, "products", "deleted_at", "DATETIME NULL")
+    # sqlite cannot alter a foreign key; there delete_order's bulk DELETE of the
+    # items is what keeps order deletion from loading them
+    if connection.dialect.name != "mysql":
+        return
+    for foreign_key in inspect(connection).get_foreign_keys("order_items"):
+        if foreign_key["referred_table"] != "orders":
+            continue
+        if (foreign_key.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+            return
+        connection.execute(text(f"ALTER TABLE order_items DROP FOREIGN KEY {foreign_key['name']}"))
+        connection.execute(text(f"ALTER TABLE order_items ADD CONSTRAINT {foreign_key['name']} "
+                                "FOREIGN KEY (order_id) REFERENCES orders (order_id) ON DELETE CASCADE"))
+
+
+def _create_refresh_tokens(connection: Connection):
+    from models.refresh_tokens import RefreshToken
+
+    RefreshToken.__table__.create(connection, checkfirst=True)
+
+
+def _add_order_indexes(connection: Connection):
+    _create_index(connection, "orders", "ix_orders_customer_id_order_date", "customer_id, order_date")
+    _create_index(connection, "orders", "ix_orders_order_date", "order_date")
+    _create_index(connection, "order_items", "ix_order_items_order_id", "order_id")
+
+
+def _sqlite_autoincrement(connection: Connection, table: Table):
+    """Rebuilds a sqlite table whose integer key lacks AUTOINCREMENT, so ids of
+    purged rows are never handed out again. mysql (8+) and postgres never reuse them."""
+    if connection.dialect.name != "sqlite":
+        return
+    ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                             {"name": table.name}).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return
+    old = f"_{table.name}_old"
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    for index in table.indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    table.create(connection)
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    connection.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}"))
+    connection.execute(text(f"DROP TABLE {old}"))
+
+
+def _cache_invalidation_ids(connection: Connection):
+    from models.cache_invalidations import CacheInvalidation
+
+    _sqlite_autoincrement(connection, CacheInvalidation.__table__)
+
+
+def _outbox_event_ids(connection: Connection):
+    from models.outbox_events import OutboxEvent
+
+    _sqlite_autoincrement(connection, OutboxEvent.__table__)
+
+
+def _customers_updated_at(connection: Connection):
+    if _add_column(connection, "customers", "updated_at", "DATETIME NULL"):
+        connection.execute(text("UPDATE customers SET updated_at = CURRENT_TIMESTAMP"))
+    _create_index(connection, "customers", "ix_customers_updated_at", "updated_at")
+
+
+def _create_table_versions(connection: Connection):
+    from models.table_versions import VERSIONED_ENTITIES, TableVersion
+
+    TableVersion.__table__.create(connection, checkfirst=True)
+    seeded = set(connection.execute(select(TableVersion.entity)).scalars())
+    missing = [{"entity": entity, "version": 0} for entity in VERSIONED_ENTITIES if entity not in seeded]
+    if missing:
+        connection.execute(TableVersion.__table__.insert(), missing)
+    # list ETags used to read the newest cache_invalidations id per entity
+    if any(index["name"] == "ix_cache_invalidations_entity_id"
+           for index in inspect(connection).get_indexes("cache_invalidations")):
+        on_table = " ON cache_invalidations" if connection.dialect.name == "mysql" else ""
+        connection.execute(text(f"DROP INDEX ix_cache_invalidations_entity_id{on_table}"))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "updated_at on orders, order_items and products", _add_updated_at),
+    (2, "soft-deleted products, ON DELETE CASCADE for order items", _soft_delete_products),
+    (3, "refresh_tokens table", _create_refresh_tokens),
+    (4, "indexes on orders (customer_id, order_date), orders (order_date) and order_items (order_id)",
+     _add_order_indexes),
+    (5, "cache_invalidations ids never reused on sqlite", _cache_invalidation_ids),
+    (6, "outbox_events ids never reused on sqlite", _outbox_event_ids),
+    (7, "updated_at on customers", _customers_updated_at),
+    (8, "table_versions counters for list ETags", _create_table_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(connection: Connection) -> int:
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def migrate(engine: Engine) -> int:
+    """Applies pending migrations in order, each in its own transaction, and
+    returns the resulting schema version."""
+    schema_version.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        version = current_version(connection)
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            with engine.begin() as connection:
+                apply(connection)
+                connection.execute(schema_version.insert().values(version=number, description=description))
+            print(f"Applied schema migration {number}: {description}")
+        except IntegrityError:
+            # another worker recorded it first
+            pass
+        version = number
+    return version
+
+
+def import_models():
+    """Registers every model in models/ on Base.metadata, which create_all() needs."""
+    import models
+
+    for module in pkgutil.iter_modules(models.__path__):
+        importlib.import_module(f"models.{module.name}")
+
+
+def create_schema(engine: Engine) -> int:
+    """create_all() for every model, then the pending migrations; returns the schema version."""
+    import_models()
+    Base.metadata.create_all(bind=engine)
+    return migrate(engine)
+
+
+def check_schema(engine: Engine) -> int:
+    """The startup check: a single SELECT of the recorded version. An empty or older
+    database is migrated when SCHEMA_AUTO_MIGRATE is on; otherwise startup fails."""
+    try:
+        with engine.connect() as connection:
+            version = current_version(connection)
+    except DBAPIError:
+        # no schema_version table yet (or no database, which create_schema reports)
+        version = 0
+    if version == LATEST_VERSION:
+        return version
+    if version > LATEST_VERSION:
+        print(f"Database schema version {version} is newer than this code's {LATEST_VERSION}")
+        return version
+    if not SCHEMA_AUTO_MIGRATE:
+        raise RuntimeError(f"Database schema is at version {version}, expected {LATEST_VERSION}; "
+                           f"run `python -m config.migrations`")
+    try:
+        # an existing schema only needs its migrations, which create their own new tables
+        return migrate(engine) if version else create_schema(engine)
+    except DBAPIError:
+        # workers starting together race to migrate; the losers wait for the winner to finish
+        deadline = time.monotonic() + SCHEMA_MIGRATION_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.5)
+            with engine.connect() as connection:
+                version = current_version(connection)
+            if version >= LATEST_VERSION:
+                return version
+        raise
+
+
+if __name__ == "__main__":
+    print(f"Schema version {create_schema(engine)}")
@@ -0,0 +1,185 @@
+"""The one password context every hash and check goes through.
+
+Its bcrypt cost (log2 rounds) is BCRYPT_ROUNDS when set. Otherwise, with
+BCRYPT_TARGET_MS set, startup calibrates it to the cost whose verify takes
+closest to that many milliseconds on this machine, never below
+BCRYPT_MIN_ROUNDS. One worker measures while holding a lock on the host and
+writes the result to BCRYPT_CALIBRATION_PATH; the others wait for it and pick
+the same cost instead of measuring again. Workers timing bcrypt side by side
+would each see a slower, loaded machine, and with different costs they would
+keep rehashing each other's hashes. Without either setting, passlib's default
+cost of 12 applies.
+
+    python -m config.passwords --target-ms 250
+
+measures the same way from the command line, prints the cost and stores it.
+
+Hashes at another cost still verify. After a successful login, rehash_later
+rehashes such a hash at the current cost on a background thread, so changing
+the cost moves active accounts over without a password reset.
+"""
+import argparse
+import fcntl
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS") or 0)
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS") or 0)
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = 16
+BCRYPT_CALIBRATION_PATH = os.getenv("BCRYPT_CALIBRATION_PATH") or "/tmp/flowershop-bcrypt-rounds"
+# logins that find a stale hash while this many rehashes are queued leave it for their next login
+REHASH_QUEUE_LIMIT = 100
+
+password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-rehash")
+_rehash_pending: Set[int] = set()
+_rehash_lock = threading.Lock()
+rehashed = 0
+
+
+def current_rounds() -> int:
+    return password_context.handler("bcrypt").default_rounds
+
+
+def set_rounds(rounds: int):
+    password_context.update(bcrypt__rounds=rounds)
+
+
+def measure_verify(rounds: int, samples: int = 3) -> float:
+    """Median seconds one bcrypt verify takes at this cost."""
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    hashed = context.hash("calibration")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("calibration", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, min_rounds: int = BCRYPT_MIN_ROUNDS) -> int:
+    """The cost whose verify time is closest to target_ms. Each extra round
+    doubles the work, so one cheap probe predicts the answer; its neighbours are
+    then measured to absorb the probe's noise."""
+    probe = 8
+    predicted = probe + round(math.log2(target_ms / (measure_verify(probe) * 1000)))
+    predicted = min(max(predicted, min_rounds), BCRYPT_MAX_ROUNDS)
+    best, best_error = predicted, None
+    for rounds in (predicted - 1, predicted, predicted + 1):
+        if not min_rounds <= rounds <= BCRYPT_MAX_ROUNDS:
+            continue
+        error = abs(math.log2(measure_verify(rounds) * 1000 / target_ms))
+        if best_error is None or error < best_error:
+            best, best_error = rounds, error
+    return best
+
+
+def _read_calibration(target_ms: float, min_rounds: int) -> Optional[int]:
+    try:
+        with open(BCRYPT_CALIBRATION_PATH) as f:
+            target, floor, rounds = f.read().split()
+    except (OSError, ValueError):
+        return None
+    if float(target) != target_ms or int(floor) != min_rounds:
+        return None
+    return int(rounds)
+
+
+def _write_calibration(target_ms: float, min_rounds: int, rounds: int):
+    temporary = f"{BCRYPT_CALIBRATION_PATH}.{os.getpid()}"
+    with open(temporary, "w") as f:
+        f.write(f"{target_ms} {min_rounds} {rounds}\n")
+    os.replace(temporary, BCRYPT_CALIBRATION_PATH)
+
+
+def configure_password_hashing() -> int:
+    """Applies BCRYPT_ROUNDS, or the host's calibration for BCRYPT_TARGET_MS
+    (measuring it if no worker has yet), and returns the cost in use."""
+    if BCRYPT_ROUNDS:
+        set_rounds(BCRYPT_ROUNDS)
+    elif BCRYPT_TARGET_MS:
+        rounds = _read_calibration(BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS)
+        if rounds is None:
+            with open(f"{BCRYPT_CALIBRATION_PATH}.lock", "w") as lock:
+                # the first worker measures; the rest block here, then read its result
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                rounds = _read_calibration(BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS)
+                if rounds is None:
+                    rounds = calibrate(BCRYPT_TARGET_MS)
+                    _write_calibration(BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS, rounds)
+                    print(f"Calibrated bcrypt cost {rounds} for a {BCRYPT_TARGET_MS:g} ms verify")
+        set_rounds(rounds)
+    return current_rounds()
+
+
+def _rehash(customer_id: int, password: str, old_hash: str):
+    global rehashed
+    from sqlalchemy import update
+
+    from config.database import SessionLocal
+    from models.customers import Customer
+
+    try:
+        new_hash = password_context.hash(password)
+        db = SessionLocal()
+        try:
+            # only if the password has not been changed since the login read it
+            updated = db.execute(update(Customer)
+                                 .where(Customer.customer_id == customer_id, Customer.hashed_password == old_hash)
+                                 .values(hashed_password=new_hash)).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if updated:
+            with _rehash_lock:
+                rehashed += 1
+    except Exception as e:
+        print(f"Could not rehash password of customer {customer_id}: {e}")
+    finally:
+        with _rehash_lock:
+            _rehash_pending.discard(customer_id)
+
+
+def rehash_later(customer_id: int, password: str, hashed_password: str) -> bool:
+    """Queues a rehash at the current cost if hashed_password was made at another
+    one. Call it only after the password has verified."""
+    if not password_context.needs_update(hashed_password):
+        return False
+    with _rehash_lock:
+        if customer_id in _rehash_pending or len(_rehash_pending) >= REHASH_QUEUE_LIMIT:
+            return False
+        _rehash_pending.add(customer_id)
+    _rehash_executor.submit(_rehash, customer_id, password, hashed_password)
+    return True
+
+
+def password_stats() -> dict:
+    with _rehash_lock:
+        return {"bcrypt_rounds": current_rounds(), "rehash_pending": len(_rehash_pending), "rehashed": rehashed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the bcrypt cost to a target verify time")
+    parser.add_argument("--target-ms", type=float, default=BCRYPT_TARGET_MS or 250.0)
+    parser.add_argument("--min-rounds", type=int, default=BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--no-write", action="store_true", help=f"do not store it in {BCRYPT_CALIBRATION_PATH}")
+    args = parser.parse_args()
+
+    rounds = calibrate(args.target_ms, args.min_rounds)
+    if not args.no_write:
+        _write_calibration(args.target_ms, args.min_rounds, rounds)
+    print(f"BCRYPT_ROUNDS={rounds}  # verify {measure_verify(rounds) * 1000:.1f} ms, "
+          f"target {args.target_ms:g} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# off: no tracking, warn: log violations, raise: fail the request (tests / staging)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").strip().lower() or "off"
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_statements: int
+    forbid_lazy: Tuple[str, ...] = ()
+
+
+# Statement budgets for every route, keyed by (method, route path), sized for test fixtures
+# with baskets of up to five lines. Lazy loads on the relationships listed in forbid_lazy
+# are N+1 regressions and fail the budget outright.
+# List endpoints spend one statement on their ETag version (see table_version), and
+# every write that publishes an invalidation one on bumping its entities' counters.
+ROUTE_BUDGETS: Dict[Tuple[str, str], Budget] = {
+    ("GET", "/"): Budget(0),
+
+    ("POST", "/auth/register"): Budget(3),
+    # login stores a refresh token (and purges expired ones at most hourly)
+    ("POST", "/auth/login"): Budget(3),
+    # one joined lookup and the in-place rotation
+    ("POST", "/auth/refresh"): Budget(2),
+
+    ("GET", "/customers/"): Budget(2, forbid_lazy=("Customer.loyalty",)),
+    ("PUT", "/customers/"): Budget(6, forbid_lazy=("Customer.loyalty",)),
+    # also revokes the customer's refresh tokens
+    ("PUT", "/customers/password"): Budget(3),
+
+    ("POST", "/orders/"): Budget(15, forbid_lazy=("Product.items",)),
+    ("GET", "/orders/"): Budget(4, forbid_lazy=("Order.items",)),
+    ("GET", "/orders/{order_id}"): Budget(3, forbid_lazy=("Order.items",)),
+    # set-based edit, constant in basket size: locks, item diff, one stock UPDATE,
+    # bulk item update/insert/delete, tombstones, outbox and invalidation inserts
+    ("PUT", "/orders/{order_id}"): Budget(16, forbid_lazy=("Product.items",)),
+    # items go in one bulk DELETE (tombstoned by INSERT ... SELECT), never loaded
+    ("DELETE", "/orders/{order_id}"): Budget(10),
+
+    # product writes log one cache invalidation and one outbox insert, and bump the product counter
+    ("POST", "/admin/products"): Budget(6),
+    ("GET", "/admin/products"): Budget(2, forbid_lazy=("Product.items",)),
+    ("GET", "/admin/products/{product_id}"): Budget(2, forbid_lazy=("Product.items",)),
+    # a stock change also records the new level
+    ("PUT", "/admin/products/{product_id}"): Budget(7, forbid_lazy=("Product.items",)),
+    # soft delete: one UPDATE; order items are untouched
+    ("DELETE", "/admin/products/{product_id}"): Budget(6),
+    ("GET", "/admin/customers"): Budget(4, forbid_lazy=("Customer.loyalty",)),
+    ("GET", "/admin/orders"): Budget(4, forbid_lazy=("Order.items",)),
+    ("GET", "/admin/changes"): Budget(5),  # one keyset query per source
+    ("GET", "/admin/metrics"): Budget(1),
+
+    ("GET", "/products/"): Budget(2, forbid_lazy=("Product.items",)),
+    ("GET", "/products/search"): Budget(1),  # only a cold index reads the products table
+
+    ("GET", "/revenue/statistics/daily"): Budget(2),
+    ("GET", "/revenue/statistics/monthly"): Budget(2),
+    ("GET", "/revenue/statistics/yearly"): Budget(2),
+    # a stale analytics snapshot is rebuilt inside the request: watermarks, orders,
+    # items, tiers and customers (an incremental refresh needs one fewer)
+    ("GET", "/revenue/analytics/top-products"): Budget(7),
+    ("GET", "/revenue/analytics/basket-sizes"): Budget(6),
+    ("GET", "/revenue/analytics/loyalty-tiers"): Budget(6),
+}
+
+
+@dataclass
+class QueryTracker:
+    budget: Budget
+    label: str = "block"
+    statements: List[str] = field(default_factory=list)
+    lazy_loads: List[str] = field(default_factory=list)
+
+    def violations(self) -> List[str]:
+        problems = []
+        if len(self.statements) > self.budget.max_statements:
+            problems.append(
+                f"{self.label}: {len(self.statements)} statements issued, budget is {self.budget.max_statements}"
+            )
+        for relationship in sorted(set(self.lazy_loads)):
+            if relationship in self.budget.forbid_lazy:
+                problems.append(f"{self.label}: lazy load of {relationship}")
+        return problems
+
+    def check(self):
+        problems = self.violations()
+        if problems:
+            raise QueryBudgetExceeded("; ".join(problems))
+
+
+_active_trackers: ContextVar[Tuple[QueryTracker, ...]] = ContextVar("query_budget_trackers", default=())
+_listeners_installed = False
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for tracker in _active_trackers.get():
+        tracker.statements.append(statement)
+
+
+def _record_lazy_load(orm_execute_state):
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    trackers = _active_trackers.get()
+    if not trackers:
+        return
+    prop = getattr(orm_execute_state.loader_strategy_path, "prop", None)
+    if prop is None:
+        return
+    for tracker in trackers:
+        tracker.lazy_loads.append(str(prop))
+
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _count_statement)
+    event.listen(Session, "do_orm_execute", _record_lazy_load)
+    _listeners_installed = True
+
+
+@contextmanager
+def query_budget(max_statements: int, forbid_lazy: Iterable[str] = (), label: str = "block"):
+    """Fail with QueryBudgetExceeded when the block issues more than max_statements
+    statements or lazy loads one of the relationships in forbid_lazy ("Order.items")."""
+    _install_listeners()
+    tracker = QueryTracker(Budget(max_statements, tuple(forbid_lazy)), label)
+    token = _active_trackers.set(_active_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _active_trackers.reset(token)
+    tracker.check()
+
+
+class QueryBudgetMiddleware:
+    """Checks every request against ROUTE_BUDGETS. A no-op unless QUERY_BUDGET_MODE is warn or raise."""
+
+    def __init__(self, app, budgets: Optional[Dict[Tuple[str, str], Budget]] = None):
+        self.app = app
+        self.budgets = ROUTE_BUDGETS if budgets is None else budgets
+
+    async def __call__(self, scope, receive, send):
+        mode = QUERY_BUDGET_MODE
+        if scope["type"] != "http" or mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        _install_listeners()
+        tracker = QueryTracker(Budget(0), f"{scope['method']} {scope['path']}")
+        token = _active_trackers.set(_active_trackers.get() + (tracker,))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active_trackers.reset(token)
+
+        route = scope.get("route")
+        if route is None:
+            return
+        key = (scope["method"], route.path)
+        budget = self.budgets.get(key)
+        if budget is None:
+            problems = [f"{key[0]} {key[1]}: no query budget declared"]
+        else:
+            tracker.budget = budget
+            tracker.label = f"{key[0]} {key[1]}"
+            problems = tracker.violations()
+
+        if not problems:
+            return
+        if mode == "raise":
+            raise QueryBudgetExceeded("; ".join(problems))
+        for problem in problems:
+            logger.warning("Query budget exceeded: %s", problem)
+
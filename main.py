@@ -1,28 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from routers.auth import router as auth_router
 from routers.orders import router as order_router
 from routers.customers import router as customer_router
 from routers.admin import router as admin_router
+from routers.products import router as product_router
 from routers.revenuedate import router as revenue_router
-from config.database import Base, engine
+from routers.events import router as events_router
+from config.database import SessionLocal, engine, warm_pool
+from config.admission import AdmissionControlMiddleware
+from config.compression import CompressionMiddleware
+from config.migrations import check_schema
+from config.passwords import configure_password_hashing
+from config.query_budget import QueryBudgetMiddleware
 from models.customers import Customer  # Import models
 from models.roles import Role          # Import Role model
 from models.customer_loyalty import CustomerLoyalty  # Import other models if needed
 from models.orders import Order
 from models.order_items import OrderItem
 from models.products import Product
+from models.cache_invalidations import CacheInvalidation
+from models.outbox_events import OutboxEvent
+from models.tombstones import Tombstone
+from models.refresh_tokens import RefreshToken
+from models.table_versions import TableVersion
+from services.invalidation import invalidation_bus
+from services.outbox import outbox_relay
+from services.catalog_snapshot import CATALOG_SNAPSHOT_REFRESH, catalog_snapshot
+from services.search_index import product_index
+
+
+def build_search_index():
+    db = SessionLocal()
+    try:
+        product_index.build_from_db(db)
+    finally:
+        db.close()
+
+
+def write_catalog_snapshot():
+    if not catalog_snapshot.enabled:
+        return
+    db = SessionLocal()
+    try:
+        # the first worker to start publishes it; the others map that file
+        catalog_snapshot.ensure_fresh(db, max_age=CATALOG_SNAPSHOT_REFRESH)
+    finally:
+        db.close()
+
+
+def calibrate_password_hashing():
+    print(f"Hashing passwords with bcrypt cost {configure_password_hashing()}")
+
+
+# independent of each other, so they run side by side; a failure only costs its warm start
+WARMUP = {
+    "build product search index": build_search_index,
+    "write catalog snapshot": write_catalog_snapshot,
+    "warm the connection pool": lambda: warm_pool(engine),
+}
+
+
+def startup():
+    started = time.perf_counter()
+    version = check_schema(engine)
+    # alone and first: bcrypt timed next to the warmup threads would pick too low a cost
+    try:
+        calibrate_password_hashing()
+    except Exception as e:
+        print(f"Could not calibrate password hashing at startup: {e}")
+    with ThreadPoolExecutor(max_workers=len(WARMUP), thread_name_prefix="warmup") as executor:
+        tasks = {name: executor.submit(task) for name, task in WARMUP.items()}
+    for name, task in tasks.items():
+        try:
+            task.result()
+        except Exception as e:
+            # search builds the index on first use instead, and so on
+            print(f"Could not {name} at startup: {e}")
+    invalidation_bus.start()
+    outbox_relay.start()
+    print(f"Started in {time.perf_counter() - started:.3f}s at schema version {version}")
+
+
+def shutdown():
+    invalidation_bus.stop()
+    outbox_relay.stop()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # importing this module touches no database; everything that does happens here
+    startup()
+    try:
+        yield
+    finally:
+        shutdown()
 
-# Ensure all models are imported before calling this line
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(CompressionMiddleware)
+# outermost, so shed requests cost nothing else
+app.add_middleware(AdmissionControlMiddleware)
 
 # Include your authentication router
 app.include_router(auth_router)
 app.include_router(order_router)
 app.include_router(customer_router)
 app.include_router(admin_router)
+app.include_router(product_router)
 app.include_router(revenue_router)
+app.include_router(events_router)
 
 
 @app.get("/")
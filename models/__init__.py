@@ -0,0 +1,12 @@
+# Importing any model imports them all, so relationship() names resolve and
+# module-level select() statements can be built as soon as one model is imported.
+from models.roles import Role
+from models.customer_loyalty import CustomerLoyalty
+from models.customers import Customer
+from models.products import Product
+from models.orders import Order
+from models.order_items import OrderItem
+from models.cache_invalidations import CacheInvalidation
+from models.outbox_events import OutboxEvent
+from models.tombstones import Tombstone
+from models.refresh_tokens import RefreshToken
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from config.database import Base
+
+class CacheInvalidation(Base):
+    __tablename__ = 'cache_invalidations'
+    # the autoincrement id doubles as the event version that pollers resume from
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(50), nullable=False)
+    key = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # without sqlite_autoincrement sqlite hands the ids of purged rows out again and
+    # pollers resuming from an id skip the new ones
+    __table_args__ = {'sqlite_autoincrement': True}
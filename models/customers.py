@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -13,6 +15,7 @@ class Customer(Base):
     loyalty_id = Column(Integer, ForeignKey('customer_loyalty.loyalty_id'), nullable=True)
     total_spent = Column(Float, default=0.0)
     role_id = Column(Integer, ForeignKey('roles.role_id'), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     role = relationship("Role", back_populates="customers")
     orders = relationship("Order", back_populates="customer", cascade="all, delete-orphan")
@@ -6,10 +6,11 @@ from config.database import Base
 class OrderItem(Base):
     __tablename__ = 'order_items'
     order_item_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    order_id = Column(Integer, ForeignKey('orders.order_id'), nullable=False)
+    order_id = Column(Integer, ForeignKey('orders.order_id', ondelete='CASCADE'), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey('products.product_id'), nullable=False)
     quantity = Column(Integer, nullable=False)
     price_at_purchase = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="items")
\ No newline at end of file
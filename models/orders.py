@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from config.database import Base
@@ -7,8 +7,14 @@ class Order(Base):
     __tablename__ = 'orders'
     order_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     customer_id = Column(Integer, ForeignKey('customers.customer_id'), nullable=False)
-    order_date = Column(DateTime, default=datetime.utcnow, nullable=False)
+    order_date = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     total_amount = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+    # a customer's order history, by date
+    __table_args__ = (Index('ix_orders_customer_id_order_date', 'customer_id', 'order_date'),)
 
     customer = relationship("Customer", back_populates="orders")
-    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
\ No newline at end of file
+    # passive_deletes: deleting an order does not load its items; the database
+    # cascade (or OrderService.delete_order's bulk DELETE) removes them
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
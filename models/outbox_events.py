@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from config.database import Base
+
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+    # the autoincrement id is the offset subscribers resume from
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    topic = Column(String(50), nullable=False)
+    event_type = Column(String(50), nullable=False)
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # without it sqlite hands the ids of purged events out again, and a resumed offset
+    # would point at different events
+    __table_args__ = {'sqlite_autoincrement': True}
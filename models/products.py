@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, event
+from sqlalchemy.orm import Session, relationship, with_loader_criteria
+from datetime import datetime
 from config.database import Base
 
 class Product(Base):
@@ -9,5 +10,22 @@ class Product(Base):
     description = Column(String(255), nullable=True)
     price = Column(Float, nullable=False)
     stock_quantity = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+    # products are retired, never deleted: order items keep referencing them
+    deleted_at = Column(DateTime, nullable=True)
 
-    items = relationship("OrderItem", back_populates="product", cascade="all, delete-orphan")
+    # passive_deletes="all": never load a product's sales history to delete or
+    # detach it; the order_items foreign key rejects hard deletes instead
+    items = relationship("OrderItem", back_populates="product", passive_deletes="all")
+
+
+# ORM selects, updates and deletes skip retired products unless executed with
+# execution_options(include_deleted=True). Relationship and column loads are
+# exempt, so an order item still resolves the product it was sold as.
+@event.listens_for(Session, "do_orm_execute")
+def _skip_deleted_products(execute_state):
+    if (execute_state.is_column_load or execute_state.is_relationship_load
+            or execute_state.execution_options.get("include_deleted", False)):
+        return
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(Product, Product.deleted_at.is_(None), include_aliases=True))
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.types import BINARY
+from config.database import Base
+
+class RefreshToken(Base):
+    __tablename__ = 'refresh_tokens'
+    # sha256 of the token; the token itself is only ever held by the client
+    token_hash = Column(BINARY(32), primary_key=True)
+    customer_id = Column(Integer, ForeignKey('customers.customer_id', ondelete='CASCADE'), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
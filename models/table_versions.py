@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, String
+from config.database import Base
+
+# entities whose list ETags read a counter (see services.invalidation.table_version)
+VERSIONED_ENTITIES = ("customer", "order", "product")
+
+class TableVersion(Base):
+    __tablename__ = 'table_versions'
+    # bumped in every transaction that publishes an invalidation for the entity
+    entity = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
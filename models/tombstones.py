@@ -0,0 +1,59 @@
+from typing import Iterable
+from sqlalchemy import Column, Integer, String, DateTime, event, insert, literal, select
+from sqlalchemy.orm import Session, object_session
+from datetime import datetime
+from config.database import Base
+from models.order_items import OrderItem
+from models.orders import Order
+from models.products import Product
+
+class Tombstone(Base):
+    __tablename__ = 'tombstones'
+    tombstone_id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(50), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# Every ORM delete of an order, order item or product (cascades included) leaves a
+# tombstone so the change feed can report it; they are written once per flush.
+TOMBSTONED = {Order: "order", OrderItem: "order_item", Product: "product"}
+
+
+def _collect_tombstone(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault("tombstones", []).append({
+        "entity": TOMBSTONED[mapper.class_],
+        "entity_id": mapper.primary_key_from_instance(target)[0],
+        "deleted_at": datetime.utcnow(),
+    })
+
+
+for _entity in TOMBSTONED:
+    event.listen(_entity, "after_delete", _collect_tombstone)
+
+
+@event.listens_for(Session, "after_flush")
+def _write_tombstones(session, flush_context):
+    rows = session.info.pop("tombstones", None)
+    if rows:
+        session.connection().execute(insert(Tombstone), rows)
+
+
+def write_tombstones(session: Session, entity: str, entity_ids: Iterable[int]):
+    """Tombstones for rows removed by a Core/bulk DELETE, which the mapper events above never see."""
+    deleted_at = datetime.utcnow()
+    rows = [{"entity": entity, "entity_id": entity_id, "deleted_at": deleted_at} for entity_id in entity_ids]
+    if rows:
+        session.execute(insert(Tombstone), rows)
+
+
+def write_tombstones_where(session: Session, entity: str, id_column, *criteria):
+    """INSERT ... SELECT tombstones for the rows a bulk DELETE with the same criteria
+    is about to remove, without fetching their ids first."""
+    session.execute(insert(Tombstone).from_select(
+        ["entity", "entity_id", "deleted_at"],
+        select(literal(entity, String), id_column, literal(datetime.utcnow(), DateTime)).where(*criteria)
+    ))
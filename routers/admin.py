@@ -1,5 +1,5 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
@@ -8,9 +8,19 @@ from schemas.customers import CustomerResponse
 from schemas.orders import OrderResponse
 from schemas.products import ProductRequest, ProductResponse, ProductUpdateRequest
 from services.admin_service import AdminService
+from services.change_feed import MAX_CHANGES, ChangeFeedService
+from config.admission import admission_controller
 from config.auth import get_current_customer
 from config.database import get_db
+from config.passwords import password_stats
 from schemas.base_response import BaseResponse
+from schemas.fast_response import FastJSONResponse, envelope, etag_matches, not_modified, weak_etag
+from schemas.serializers import orders_to_dicts
+from schemas.projection import parse_fields, project
+from services.group_commit import group_committer
+from services.outbox import outbox_broker
+from services.rate_limit import auth_limiter
+from services.single_flight import single_flight_stats
 
 router = APIRouter(
     prefix='/admin',
@@ -41,13 +51,18 @@ async def create_product(
 @router.get("/products/{product_id}", status_code=status.HTTP_200_OK, response_model=BaseResponse[ProductResponse])
 async def get_product(
     product_id: int,
+    fields: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_customer)
 ):
     admin_required(current_user)
     service = AdminService(db)
     try:
-        product = service.get_product(product_id)
+        selected = parse_fields(fields, ProductResponse)
+        product = service.get_product(product_id, selected)
+        if selected is not None:
+            return FastJSONResponse(envelope("Product retrieved successfully", "success",
+                                             project(ProductResponse, selected, product)))
         return BaseResponse(message="Product retrieved successfully", status="success", data=product)
     except ValueError as e:
         return BaseResponse(message=str(e), status="error", data={})
@@ -91,43 +106,97 @@ async def delete_product(
         return BaseResponse(message="Internal Server Error", status="error", data={})
 
 @router.get("/products", status_code=status.HTTP_200_OK, response_model=BaseResponse[List[ProductResponse]])
-async def get_all_products(
+def get_all_products(
+    fields: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_customer)
 ):
     admin_required(current_user)
     service = AdminService(db)
     try:
-        products = service.get_all_products()
-        return BaseResponse(message="Products retrieved successfully", status="success", data=products)
+        selected = parse_fields(fields, ProductResponse)
+        products = service.get_all_products(selected)
+        if selected is not None:
+            products = project(ProductResponse, selected, products, many=True)
+        return FastJSONResponse(envelope("Products retrieved successfully", "success", products))
+    except ValueError as e:
+        return BaseResponse(message=str(e), status="error", data=[])
     except Exception as e:
         print(f"Unexpected error during retrieval of all products: {e}")
         return BaseResponse(message="Internal Server Error", status="error", data=[])
 
 @router.get("/customers", status_code=status.HTTP_200_OK, response_model=BaseResponse[List[CustomerResponse]])
 async def get_all_customers(
+    response: Response,
+    fields: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_customer)
 ):
     admin_required(current_user)
     service = AdminService(db)
     try:
-        customers = service.get_all_customers()
+        selected = parse_fields(fields, CustomerResponse)
+        etag = weak_etag("admin-customers", selected, *service.customers_version())
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        customers = service.get_all_customers(selected)
+        if selected is not None:
+            return FastJSONResponse(envelope("Customers retrieved successfully", "success",
+                                             project(CustomerResponse, selected, customers, many=True)),
+                                    headers={"ETag": etag})
+        response.headers["ETag"] = etag
         return BaseResponse(message="Customers retrieved successfully", status="success", data=customers)
+    except ValueError as e:
+        return BaseResponse(message=str(e), status="error", data=[])
     except Exception as e:
         print(f"Unexpected error during retrieval of all customers: {e}")
         return BaseResponse(message="Internal Server Error", status="error", data=[])
 
 @router.get("/orders", status_code=status.HTTP_200_OK, response_model=BaseResponse[List[OrderResponse]])
 async def get_all_orders(
+    fields: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_customer)
 ):
     admin_required(current_user)
     service = AdminService(db)
     try:
-        orders = service.get_all_orders()
-        return BaseResponse(message="Orders retrieved successfully", status="success", data=orders)
+        selected = parse_fields(fields, OrderResponse)
+        etag = weak_etag("admin-orders", selected, *service.orders_version())
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        orders = service.get_all_orders(selected)
+        return FastJSONResponse(envelope("Orders retrieved successfully", "success",
+                                         orders_to_dicts(orders, selected)), headers={"ETag": etag})
+    except ValueError as e:
+        return BaseResponse(message=str(e), status="error", data=[])
     except Exception as e:
         print(f"Unexpected error during retrieval of all orders: {e}")
         return BaseResponse(message="Internal Server Error", status="error", data=[])
+
+@router.get("/changes", status_code=status.HTTP_200_OK, response_model=BaseResponse[Dict[str, Any]])
+def get_changes(
+    since: Optional[str] = Query(None, description="`next` from the previous page; omit to start from the beginning"),
+    limit: int = Query(500, ge=1, le=MAX_CHANGES),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_customer)
+):
+    admin_required(current_user)
+    service = ChangeFeedService(db)
+    try:
+        return FastJSONResponse(envelope("Changes retrieved successfully", "success",
+                                         service.get_changes(since, limit)))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/metrics", status_code=status.HTTP_200_OK, response_model=BaseResponse[Dict[str, Any]])
+def get_metrics(
+    current_user: dict = Depends(get_current_customer)
+):
+    admin_required(current_user)
+    return BaseResponse(message="Metrics retrieved successfully", status="success",
+                        data={"single_flight": single_flight_stats(), "events": outbox_broker.stats(),
+                              "group_commit": group_committer.stats(), "auth_limiter": auth_limiter.stats(),
+                              "passwords": password_stats(), "admission": admission_controller.stats()})
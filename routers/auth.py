@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from starlette import status
 from fastapi.security import OAuth2PasswordRequestForm
-from schemas.auth import Token, CustomerRequest
+from schemas.auth import Token, CustomerRequest, RefreshRequest
 from services.authentication_service import AuthenticationService, get_authen_service
+from services.rate_limit import auth_limiter, client_ip
 from config.database import get_db
 
 router = APIRouter(
@@ -12,12 +13,16 @@ router = APIRouter(
     tags=['auth']
 )
 
+# password endpoints are plain def: bcrypt would otherwise block the event loop
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register(create_customer_request: CustomerRequest,
-                   authen_service: AuthenticationService = Depends(get_authen_service),
-                   db: Session = Depends(get_db)):
+def register(request: Request,
+             create_customer_request: CustomerRequest,
+             authen_service: AuthenticationService = Depends(get_authen_service),
+             db: Session = Depends(get_db)):
     try:
-        response = authen_service.register_customer(db, create_customer_request)
+        auth_limiter.check(client_ip(request), create_customer_request.email)
+        with auth_limiter.hashing():
+            response = authen_service.register_customer(db, create_customer_request)
         return response
     except HTTPException as e:
         raise e
@@ -26,11 +31,29 @@ async def register(create_customer_request: CustomerRequest,
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.post("/login", response_model=Token)
-async def login(login_data: OAuth2PasswordRequestForm = Depends(),
-                 authen_service: AuthenticationService = Depends(get_authen_service),
-                 db: Session = Depends(get_db)):
+def login(request: Request,
+          login_data: OAuth2PasswordRequestForm = Depends(),
+          authen_service: AuthenticationService = Depends(get_authen_service),
+          db: Session = Depends(get_db)):
     try:
-        response = authen_service.authenticate_customer(db, login_data.username, login_data.password)
+        auth_limiter.check(client_ip(request), login_data.username)
+        with auth_limiter.hashing():
+            response = authen_service.authenticate_customer(db, login_data.username, login_data.password)
+        if response is None:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        return response
+    except HTTPException as e:
+        raise e
+    except Exception:
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/refresh", response_model=Token)
+def refresh(refresh_request: RefreshRequest,
+            authen_service: AuthenticationService = Depends(get_authen_service),
+            db: Session = Depends(get_db)):
+    try:
+        response = authen_service.refresh_access_token(db, refresh_request.refresh_token)
         if response is None:
             raise HTTPException(status_code=401, detail="Could not validate credentials")
         return response
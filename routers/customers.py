@@ -1,5 +1,5 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from models.customers import Customer
@@ -8,6 +8,8 @@ from services.customer_service import CustomerService
 from config.auth import get_current_customer
 from config.database import get_db
 from schemas.base_response import BaseResponse
+from schemas.fast_response import FastJSONResponse, envelope
+from schemas.projection import parse_fields, project
 
 router = APIRouter(
     prefix='/customers',
@@ -20,14 +22,19 @@ customer_dependency = Annotated[Customer, Depends(get_current_customer)]
 @router.get('/', response_model=BaseResponse[CustomerResponse], status_code=status.HTTP_200_OK)
 async def get_customer(
         customer: customer_dependency,
-        db: db_dependency
+        db: db_dependency,
+        fields: Optional[str] = Query(None)
 ):
     if customer is None:
         return BaseResponse(message='Authentication Failed', status='error', data={})
 
     service = CustomerService(db)
     try:
-        customer_data = service.get_customer(customer.customer_id)
+        selected = parse_fields(fields, CustomerResponse)
+        customer_data = service.get_customer(customer.customer_id, selected)
+        if selected is not None:
+            return FastJSONResponse(envelope('Customer retrieved successfully', 'success',
+                                             project(CustomerResponse, selected, customer_data)))
         return BaseResponse(message='Customer retrieved successfully', status='success', data=customer_data)
     except ValueError as e:
         return BaseResponse(message=str(e), status='error', data={})
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError
+
+from config.auth import decode_access_token
+from config.database import SessionLocal
+from services.outbox import OUTBOX_SETTLE_SECONDS, TOPICS, StreamEvent, outbox_broker, read_events
+
+router = APIRouter(
+    prefix='/events',
+    tags=['events']
+)
+
+# 1013 "try again later": the subscriber fell behind and should reconnect with ?after=<last offset>
+CLOSE_TRY_AGAIN = 1013
+
+
+def _is_admin(token: Optional[str]) -> bool:
+    if not token:
+        return False
+    try:
+        return decode_access_token(token).get("role") == 1
+    except JWTError:
+        return False
+
+
+def _replay(after: int, topics: Optional[Set[str]]) -> List[StreamEvent]:
+    db = SessionLocal()
+    try:
+        return read_events(db, after, topics=topics)
+    finally:
+        db.close()
+
+
+@router.websocket("/ws")
+async def stream_events(
+    websocket: WebSocket,
+    after: Optional[int] = Query(None, ge=0, description="Resume after this offset; omit for new events only"),
+    topics: Optional[str] = Query(None, description="Comma-separated: order, stock"),
+    token: Optional[str] = Query(None)
+):
+    """Streams order and stock events as JSON text frames carrying an `offset`.
+
+    Browsers cannot set headers on a WebSocket, so the admin access token may be
+    passed as ?token=. Reconnect with ?after=<last offset seen> to resume.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if token is None and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not _is_admin(token):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    selected = {topic.strip() for topic in topics.split(",") if topic.strip()} if topics else None
+    if selected and not selected <= set(TOPICS):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"topics must be among {', '.join(TOPICS)}")
+        return
+
+    await websocket.accept()
+    # subscribe before reading the backlog so nothing committed in between is missed
+    subscription = outbox_broker.subscribe(selected, asyncio.get_running_loop())
+    subscribed_offset = outbox_broker.last_offset
+    # backlog events that may also arrive live: newer than the subscription, or a late
+    # commit below it that the relay has yet to publish
+    replayed: Set[int] = set()
+    try:
+        if after is not None:
+            last_offset = after
+            late_horizon = datetime.utcnow() - timedelta(seconds=OUTBOX_SETTLE_SECONDS)
+            backlog = outbox_broker.recent_after(after, selected)
+            while backlog is None or backlog:
+                if backlog is None:
+                    backlog = await run_in_threadpool(_replay, last_offset, selected)
+                    if not backlog:
+                        break
+                for stream_event in backlog:
+                    await websocket.send_text(stream_event.to_json())
+                    last_offset = max(last_offset, stream_event.event_id)
+                    if stream_event.event_id > subscribed_offset or stream_event.created_at >= late_horizon:
+                        replayed.add(stream_event.event_id)
+                backlog = outbox_broker.recent_after(last_offset, selected)
+
+        while True:
+            stream_event = await subscription.queue.get()
+            if subscription.overflowed:
+                await websocket.close(code=CLOSE_TRY_AGAIN)
+                return
+            # the relay publishes each event once, so only the backlog can repeat one
+            if stream_event.event_id in replayed:
+                replayed.discard(stream_event.event_id)
+                continue
+            await websocket.send_text(stream_event.to_json())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        outbox_broker.unsubscribe(subscription)
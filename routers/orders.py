@@ -1,10 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from config.auth import get_current_customer
 from config.database import get_db
-from schemas.orders import OrderRequest, OrderResponse, OrderItemResponse, OrderUpdate
+from schemas.orders import OrderRequest, OrderResponse, OrderUpdate
+from schemas.fast_response import FastJSONResponse, envelope, etag_matches, not_modified, weak_etag
+from schemas.serializers import order_to_dict, orders_to_dicts
+from schemas.projection import parse_fields
+from services.loader import parse_id_list
 from services.order_service import OrderService
 from schemas.base_response import BaseResponse
 
@@ -22,23 +26,9 @@ def create_order(
     order_service = OrderService(db)
     try:
         new_order = order_service.create_order(order, user.customer_id)
-        return BaseResponse(
-            message="Order created successfully",
-            status="success",
-            data=OrderResponse(
-                order_id=new_order.order_id,
-                customer_id=new_order.customer_id,
-                total_amount=new_order.total_amount,
-                order_date=new_order.order_date,
-                items=[OrderItemResponse(
-                    order_item_id=item.order_item_id,
-                    order_id=item.order_id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=item.price_at_purchase
-                ) for item in new_order.items]
-            )
-        )
+        return FastJSONResponse(envelope(
+            "Order created successfully", "success", order_to_dict(new_order)
+        ), status_code=status.HTTP_201_CREATED)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -54,29 +44,17 @@ def create_order(
 @router.get("/{order_id}", status_code=status.HTTP_200_OK, response_model=BaseResponse[OrderResponse])
 def get_order(
     order_id: int,
+    fields: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_customer)
 ):
     order_service = OrderService(db)
     try:
-        order = order_service.get_order(order_id, user.customer_id)
-        return BaseResponse(
-            message="Order retrieved successfully",
-            status="success",
-            data=OrderResponse(
-                order_id=order.order_id,
-                customer_id=order.customer_id,
-                total_amount=order.total_amount,
-                order_date=order.order_date,
-                items=[OrderItemResponse(
-                    order_item_id=item.order_item_id,
-                    order_id=item.order_id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=item.price_at_purchase
-                ) for item in order.items]
-            )
-        )
+        selected = parse_fields(fields, OrderResponse)
+        order = order_service.get_order(order_id, user.customer_id, selected)
+        return FastJSONResponse(envelope(
+            "Order retrieved successfully", "success", order_to_dict(order, fields=selected)
+        ))
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -99,23 +77,9 @@ def update_order(
     order_service = OrderService(db)
     try:
         updated_order = order_service.update_order(order_id, order, user.customer_id)
-        return BaseResponse(
-            message="Order updated successfully",
-            status="success",
-            data=OrderResponse(
-                order_id=updated_order.order_id,
-                customer_id=updated_order.customer_id,
-                total_amount=updated_order.total_amount,
-                order_date=updated_order.order_date,
-                items=[OrderItemResponse(
-                    order_item_id=item.order_item_id,
-                    order_id=item.order_id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=item.price_at_purchase
-                ) for item in updated_order.items]
-            )
-        )
+        return FastJSONResponse(envelope(
+            "Order updated successfully", "success", order_to_dict(updated_order)
+        ))
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -156,28 +120,30 @@ def delete_order(
 
 @router.get("/", status_code=status.HTTP_200_OK, response_model=BaseResponse[List[OrderResponse]])
 def get_all_orders(
+    ids: Optional[str] = Query(None, description="Only these order ids, e.g. 1,2,3"),
+    fields: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_customer)
 ):
     order_service = OrderService(db)
     try:
-        orders = order_service.get_all_orders(user.customer_id)
-        return BaseResponse(
-            message="Orders retrieved successfully",
-            status="success",
-            data=[OrderResponse(
-                order_id=order.order_id,
-                customer_id=order.customer_id,
-                total_amount=order.total_amount,
-                order_date=order.order_date,
-                items=[OrderItemResponse(
-                    order_item_id=item.order_item_id,
-                    order_id=item.order_id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=item.price_at_purchase
-                ) for item in order.items]
-            ) for order in orders]
+        selected = parse_fields(fields, OrderResponse)
+        etag = None
+        if ids is not None:
+            orders = order_service.get_orders(parse_id_list(ids), user.customer_id)
+        else:
+            etag = weak_etag("orders", user.customer_id, selected, *order_service.orders_version(user.customer_id))
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            orders = order_service.get_all_orders(user.customer_id, selected)
+        return FastJSONResponse(envelope(
+            "Orders retrieved successfully", "success", orders_to_dicts(orders, selected)
+        ), headers={"ETag": etag} if etag else None)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,71 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from config.auth import get_current_customer
+from config.database import get_db
+from schemas.base_response import BaseResponse
+from schemas.fast_response import FastJSONResponse, envelope
+from schemas.products import ProductResponse
+from schemas.projection import parse_fields, project
+from schemas.serializers import product_to_dict
+from services.loader import parse_id_list
+from services.product_service import ProductService
+
+router = APIRouter(
+    prefix='/products',
+    tags=['products']
+)
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=BaseResponse[List[ProductResponse]])
+def get_products(
+    ids: str = Query(..., description="Comma-separated product ids, e.g. 1,2,3"),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    user: dict = Depends(get_current_customer)
+):
+    service = ProductService(db)
+    try:
+        selected = parse_fields(fields, ProductResponse)
+        products = service.get_products(parse_id_list(ids))
+        data = [product_to_dict(product) for product in products] if selected is None \
+            else project(ProductResponse, selected, products, many=True)
+        return FastJSONResponse(envelope("Products retrieved successfully", "success", data))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving products: " + str(e)
+        )
+
+
+@router.get("/search", status_code=status.HTTP_200_OK, response_model=BaseResponse[List[ProductResponse]])
+def search_products(
+    q: Optional[str] = Query(None, description="Words or word prefixes in the name or description"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = Query(None),
+    sort: str = Query("relevance", description="relevance, price_asc, price_desc or name"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    service = ProductService(db)
+    try:
+        products = service.search_products(q, min_price, max_price, in_stock, sort, limit, offset)
+        return FastJSONResponse(envelope("Products retrieved successfully", "success",
+                                         [product.to_dict() for product in products]))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error searching products: " + str(e)
+        )
@@ -1,8 +1,9 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import date
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from schemas.revenues import DailyRevenueResponse, MonthlyRevenueResponse, YearlyRevenueResponse
+from schemas.revenues import (BasketSizeResponse, DailyRevenueResponse, LoyaltyTierRevenueResponse, MonthlyRevenueResponse,
+                              TopProductResponse, YearlyRevenueResponse)
 from schemas.base_response import BaseResponse
 from services.revenue_service import RevenueService
 from config.auth import get_current_customer
@@ -16,6 +17,12 @@ router = APIRouter(
 db_dependency = Depends(get_db)
 customer_dependency = Depends(get_current_customer)
 
+def analytics_service(db: Session):
+    # numpy and the snapshot code load with the first analytics request instead of with the app
+    from services.sales_analytics import AnalyticsService
+
+    return AnalyticsService(db)
+
 def admin_required(current_user: dict):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="You do not have sufficient permissions")
@@ -86,3 +93,74 @@ def get_yearly_revenue(
             status="error",
             data={}
         )
+
+@router.get("/analytics/top-products", response_model=BaseResponse[List[TopProductResponse]])
+def get_top_products(
+    limit: int = Query(10, ge=1, le=1000),
+    by: Literal["revenue", "units"] = Query("revenue"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None, description="Inclusive"),
+    db: Session = db_dependency,
+    current_user: dict = customer_dependency
+):
+    admin_required(current_user)
+    service = analytics_service(db)
+    try:
+        top_products = service.get_top_products(limit, start, end, by)
+        return BaseResponse(
+            message="Top products retrieved successfully",
+            status="success",
+            data=top_products
+        )
+    except Exception as e:
+        return BaseResponse(
+            message=f"Error retrieving top products: {str(e)}",
+            status="error",
+            data={}
+        )
+
+@router.get("/analytics/basket-sizes", response_model=BaseResponse[BasketSizeResponse])
+def get_basket_sizes(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None, description="Inclusive"),
+    db: Session = db_dependency,
+    current_user: dict = customer_dependency
+):
+    admin_required(current_user)
+    service = analytics_service(db)
+    try:
+        basket_sizes = service.get_basket_sizes(start, end)
+        return BaseResponse(
+            message="Basket size distribution retrieved successfully",
+            status="success",
+            data=basket_sizes
+        )
+    except Exception as e:
+        return BaseResponse(
+            message=f"Error retrieving basket sizes: {str(e)}",
+            status="error",
+            data={}
+        )
+
+@router.get("/analytics/loyalty-tiers", response_model=BaseResponse[List[LoyaltyTierRevenueResponse]])
+def get_revenue_by_loyalty_tier(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None, description="Inclusive"),
+    db: Session = db_dependency,
+    current_user: dict = customer_dependency
+):
+    admin_required(current_user)
+    service = analytics_service(db)
+    try:
+        tiers = service.get_revenue_by_tier(start, end)
+        return BaseResponse(
+            message="Revenue by loyalty tier retrieved successfully",
+            status="success",
+            data=tiers
+        )
+    except Exception as e:
+        return BaseResponse(
+            message=f"Error retrieving revenue by loyalty tier: {str(e)}",
+            status="error",
+            data={}
+        )
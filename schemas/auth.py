@@ -28,6 +28,10 @@ class CustomerRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1)
 
 class TokenData(BaseModel):
     email: Optional[str] = None
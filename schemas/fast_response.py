@@ -0,0 +1,54 @@
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by orjson (or pydantic-core when orjson is not installed).
+
+    Returning it from a handler skips FastAPI's response_model validation and
+    jsonable_encoder pass, so content must already be plain dicts/lists built by
+    the serializers in schemas/serializers.py. Keep response_model on the route for
+    the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return to_json(content)
+
+
+def envelope(message: str, status: str, data: Any) -> dict:
+    """Plain-dict equivalent of BaseResponse."""
+    return {"message": message, "status": status, "data": data}
+
+
+def weak_etag(*parts: Any) -> str:
+    """Weak ETag over what identifies a list's state (see table_version, plus the
+    fields), so it is computed before the list is loaded rather than from the body."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
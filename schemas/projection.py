@@ -0,0 +1,55 @@
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from sqlalchemy.orm import load_only
+
+# Sparse fieldsets: `?fields=product_id,name,price` selects a subset of a response
+# model's fields. Only the matching columns are fetched and only they are serialized.
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Validates a comma-separated field list against model. Returns the fields in the
+    model's declaration order (so equivalent lists share a cache entry) or None for all."""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def projected_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    definitions = {name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    return create_model(
+        f"{model.__name__}[{','.join(fields)}]",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=256)
+def _projection_adapter(model: Type[BaseModel], fields: Tuple[str, ...], many: bool) -> TypeAdapter:
+    projected = projected_model(model, fields)
+    return TypeAdapter(List[projected] if many else projected)
+
+
+def project(model: Type[BaseModel], fields: Tuple[str, ...], data: Any, many: bool = False):
+    """Validates ORM objects or dicts through the cached projected model and returns
+    JSON-ready python data containing only the requested fields."""
+    adapter = _projection_adapter(model, fields, many)
+    return adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json")
+
+
+def load_only_columns(entity, fields: Optional[Tuple[str, ...]], *always: str):
+    """load_only() option for the requested fields that are plain columns of entity,
+    plus any columns in always. None when every column should be loaded."""
+    if fields is None:
+        return None
+    columns = entity.__table__.columns
+    names = [name for name in (*always, *fields) if name in columns]
+    return load_only(*(getattr(entity, name) for name in dict.fromkeys(names)))
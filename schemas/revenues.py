@@ -17,3 +17,30 @@ class MonthlyRevenueResponse(BaseModel):
 class YearlyRevenueResponse(BaseModel):
     year: int
     total_revenue: float
+
+class TopProductResponse(BaseModel):
+    product_id: int
+    name: Optional[str] = None
+    revenue: float
+    units: int
+    order_lines: int
+
+class BasketSizeBucket(BaseModel):
+    units: int
+    orders: int
+
+class BasketSizeResponse(BaseModel):
+    orders: int
+    mean_units: float
+    median_units: float
+    p90_units: float
+    mean_lines: float
+    distribution: List[BasketSizeBucket]
+
+class LoyaltyTierRevenueResponse(BaseModel):
+    loyalty_id: Optional[int] = None
+    status: Optional[str] = None
+    orders: int
+    customers: int
+    revenue: float
+    average_order_value: float
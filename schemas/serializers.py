@@ -0,0 +1,52 @@
+from typing import Iterable, List, Optional, Tuple
+
+# Build response payloads straight from ORM objects or result rows, once. The keys
+# mirror ProductResponse, OrderItemResponse and OrderResponse in schemas/.
+
+
+def product_to_dict(product) -> dict:
+    return {
+        "product_id": product.product_id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "stock_quantity": product.stock_quantity,
+    }
+
+
+def order_item_to_dict(item) -> dict:
+    return {
+        "order_item_id": item.order_item_id,
+        "order_id": item.order_id,
+        "product_id": item.product_id,
+        "quantity": item.quantity,
+        "price_at_purchase": item.price_at_purchase,
+    }
+
+
+def order_to_dict(order, items=None, fields: Optional[Tuple[str, ...]] = None) -> dict:
+    if fields is not None:
+        return _project_order(order, items, fields)
+    return {
+        "order_id": order.order_id,
+        "customer_id": order.customer_id,
+        "total_amount": order.total_amount,
+        "order_date": order.order_date,
+        "items": [order_item_to_dict(item) for item in (order.items if items is None else items)],
+    }
+
+
+def _project_order(order, items, fields: Tuple[str, ...]) -> dict:
+    # only touches the requested attributes, so unloaded columns and items stay unloaded
+    data = {}
+    for name in fields:
+        if name == "items":
+            data["items"] = [order_item_to_dict(item) for item in (order.items if items is None else items)]
+        else:
+            data[name] = getattr(order, name)
+    return data
+
+
+def orders_to_dicts(orders: Iterable, fields: Optional[Tuple[str, ...]] = None) -> List[dict]:
+    return [order_to_dict(order, fields=fields) for order in orders]
+
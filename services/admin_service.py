@@ -1,13 +1,24 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.orm import Session, selectinload
 
 from models.customer_loyalty import CustomerLoyalty
 from models.customers import Customer
 from models.orders import Order
 from models.products import Product
+from models.tombstones import write_tombstones
 from schemas.customers import CustomerResponse
 from schemas.orders import OrderResponse
 from schemas.products import ProductRequest, ProductResponse, ProductUpdateRequest
+from schemas.projection import load_only_columns
+from schemas.serializers import product_to_dict
+from services.catalog_snapshot import catalog_snapshot
+from services.invalidation import invalidation_bus, table_version
+from services.loader import get_loader
+from services.outbox import record, record_stock
+from services.search_index import product_index
+from services.single_flight import single_flight
 
 
 class AdminService:
@@ -18,21 +29,34 @@ class AdminService:
         db_product = Product(**product.dict())
         try:
             self.db.add(db_product)
+            self.db.flush()
+            invalidation_bus.publish(self.db, "product", [db_product.product_id])
+            record_stock(self.db, {db_product.product_id: db_product.stock_quantity})
             self.db.commit()
             self.db.refresh(db_product)
+            product_index.upsert(db_product)
+            catalog_snapshot.products_changed([db_product.product_id])
             return db_product
         except Exception as e:
             self.db.rollback()
             raise ValueError(f"Error creating product: {str(e)}")
 
-    def get_product(self, product_id: int) -> ProductResponse:
-        db_product = self.db.query(Product).filter(Product.product_id == product_id).first()
+    def _product_query(self, fields: Optional[Tuple[str, ...]] = None):
+        query = self.db.query(Product)
+        columns = load_only_columns(Product, fields, "product_id")
+        return query if columns is None else query.options(columns)
+
+    def get_product(self, product_id: int, fields: Optional[Tuple[str, ...]] = None) -> ProductResponse:
+        if fields is None:
+            db_product = get_loader(self.db, Product).load(product_id)
+        else:
+            db_product = self._product_query(fields).filter(Product.product_id == product_id).first()
         if db_product is None:
             raise ValueError("Product not found")
         return db_product
 
     def update_product(self, product_id: int, product_update: ProductUpdateRequest) -> ProductResponse:
-        db_product = self.db.query(Product).filter(Product.product_id == product_id).first()
+        db_product = get_loader(self.db, Product).load(product_id)
         if db_product is None:
             raise ValueError("Product not found")
 
@@ -40,30 +64,50 @@ class AdminService:
             if value is not None:
                 setattr(db_product, key, value)
 
+        if product_update.stock_quantity is not None:
+            record_stock(self.db, {product_id: db_product.stock_quantity})
+        invalidation_bus.publish(self.db, "product", [product_id])
         self.db.commit()
         self.db.refresh(db_product)
+        product_index.upsert(db_product)
+        catalog_snapshot.products_changed([product_id])
         return db_product
 
     def delete_product(self, product_id: int):
-        db_product = self.db.query(Product).filter(Product.product_id == product_id).first()
-        if db_product is None:
+        """Retires a product; its order items keep pointing at it."""
+        retired = self.db.execute(
+            update(Product).where(Product.product_id == product_id).values(deleted_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not retired:
             raise ValueError("Product not found")
-        self.db.delete(db_product)
+        write_tombstones(self.db, "product", [product_id])
+        record(self.db, "stock", "stock.deleted", product_id, {"product_id": product_id})
+        invalidation_bus.publish(self.db, "product", [product_id])
         self.db.commit()
+        product_index.remove(product_id)
+        catalog_snapshot.products_changed([product_id])
+
+    @single_flight(version=lambda: invalidation_bus.version("product"))
+    def get_all_products(self, fields: Optional[Tuple[str, ...]] = None) -> List[dict]:
+        # plain dicts, since coalesced callers share the result across sessions
+        products = self._product_query(fields).all()
+        if fields is None:
+            return [product_to_dict(product) for product in products]
+        return [{name: getattr(product, name) for name in fields} for product in products]
+
+    def customers_version(self) -> tuple:
+        return table_version(self.db, "customer", Customer.customer_id)
 
-    def get_all_products(self) -> List[ProductResponse]:
-        return self.db.query(Product).all()
+    def get_all_customers(self, fields: Optional[Tuple[str, ...]] = None) -> List[CustomerResponse]:
+        if fields is not None:
+            return self._get_customer_fields(fields)
 
-    def get_all_customers(self) -> List[CustomerResponse]:
-        customers = self.db.query(Customer).all()
+        customers = self.db.query(Customer).options(selectinload(Customer.loyalty)).all()
         customer_responses = []
 
         for customer in customers:
-            loyal_name = None
-            if customer.loyalty_id:
-                loyalty = self.db.query(CustomerLoyalty).filter(CustomerLoyalty.loyalty_id == customer.loyalty_id).first()
-                if loyalty:
-                    loyal_name = loyalty.status
+            loyal_name = customer.loyalty.status if customer.loyalty else None
 
             customer_responses.append(CustomerResponse(
                 customer_id=customer.customer_id,
@@ -76,5 +120,27 @@ class AdminService:
 
         return customer_responses
 
-    def get_all_orders(self) -> List[OrderResponse]:
-        return self.db.query(Order).all()
+    def _get_customer_fields(self, fields: Tuple[str, ...]) -> List[dict]:
+        wants_loyalty = "loyal_name" in fields
+        query = self.db.query(Customer).options(
+            load_only_columns(Customer, fields, "customer_id", *(("loyalty_id",) if wants_loyalty else ())))
+        if wants_loyalty:
+            query = query.options(selectinload(Customer.loyalty))
+
+        customer_values = []
+        for customer in query.all():
+            values = {name: getattr(customer, name) for name in fields if name != "loyal_name"}
+            if wants_loyalty:
+                values["loyal_name"] = customer.loyalty.status if customer.loyalty else None
+            customer_values.append(values)
+        return customer_values
+
+    def orders_version(self) -> tuple:
+        return table_version(self.db, "order", Order.order_id)
+
+    def get_all_orders(self, fields: Optional[Tuple[str, ...]] = None) -> List[OrderResponse]:
+        query = self.db.query(Order)
+        if fields is None or "items" in fields:
+            query = query.options(selectinload(Order.items))
+        columns = load_only_columns(Order, fields, "order_id")
+        return (query if columns is None else query.options(columns)).all()
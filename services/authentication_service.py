@@ -1,14 +1,66 @@
+import hashlib
 import os
+import secrets
+import time
 from datetime import timedelta, datetime
-from passlib.context import CryptContext
+from typing import Optional
 from jose import JWTError, jwt
+from sqlalchemy import bindparam, delete, insert, select, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
-from config.auth import create_access_token, pwd_context, ACCESS_TOKEN_EXPIRE_MINUTES
+from config.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from config.passwords import password_context, rehash_later
 from models.customers import Customer
+from models.refresh_tokens import RefreshToken
 from schemas.auth import CustomerRequest, Token
 
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# expired refresh tokens are deleted by the first login after this many seconds
+REFRESH_TOKEN_PURGE_INTERVAL = int(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL", "3600"))
+
+_last_purge: Optional[float] = None
+
+# built once; see CUSTOMER_BY_ID in config/auth.py
+LOGIN_BY_EMAIL = select(Customer.customer_id, Customer.hashed_password, Customer.role_id).where(
+    Customer.email == bindparam("email"))
+EMAIL_TAKEN = select(Customer.customer_id).where(Customer.email == bindparam("email"))
+INSERT_REFRESH_TOKEN = insert(RefreshToken)
+REFRESH_TOKEN_OWNER = (
+    select(Customer.customer_id, Customer.email, Customer.role_id)
+    .join(RefreshToken, RefreshToken.customer_id == Customer.customer_id)
+    .where(RefreshToken.token_hash == bindparam("old_hash"), RefreshToken.expires_at > bindparam("now"))
+)
+ROTATE_REFRESH_TOKEN = (
+    update(RefreshToken)
+    .where(RefreshToken.token_hash == bindparam("old_hash"), RefreshToken.expires_at > bindparam("now"))
+    .values(token_hash=bindparam("new_hash"), expires_at=bindparam("new_expires_at"))
+)
+
+
+def hash_refresh_token(token: str) -> bytes:
+    # tokens are 256 random bits, so a fast hash is as safe to store as bcrypt would be
+    return hashlib.sha256(token.encode()).digest()
+
+
+def new_refresh_token():
+    """A fresh token for the client, with its hash and expiry for the refresh_tokens row."""
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token), datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def purge_expired_refresh_tokens(db: Session):
+    global _last_purge
+    if _last_purge is not None and time.monotonic() - _last_purge < REFRESH_TOKEN_PURGE_INTERVAL:
+        return
+    _last_purge = time.monotonic()
+    db.execute(delete(RefreshToken).where(RefreshToken.expires_at < datetime.utcnow()))
+
+
+def revoke_refresh_tokens(db: Session, customer_id: int):
+    """Signs the customer out everywhere once their access tokens expire (e.g. after a password change)."""
+    db.execute(delete(RefreshToken).where(RefreshToken.customer_id == customer_id))
+
 def get_authen_service():
     try:
         auth_service = AuthenticationService()
@@ -19,16 +71,17 @@ def get_authen_service():
 class AuthenticationService:
     def authenticate_customer(self, db: Session, email: str, password: str):
         print(f"Attempting to authenticate customer with email: {email}")
-        customer = db.query(Customer).filter(Customer.email == email).first()
+        # the columns a login needs as a row, not a Customer in the identity map
+        customer = db.execute(LOGIN_BY_EMAIL, {"email": email}).first()
         if not customer:
             print("Customer not found.")
-        elif not pwd_context.verify(password, customer.hashed_password):
+            return None
+        if not password_context.verify(password, customer.hashed_password):
             print("Password mismatch.")
-        else:
-            print("Customer authenticated successfully.")
-
-        if not customer or not pwd_context.verify(password, customer.hashed_password):
             return None
+        print("Customer authenticated successfully.")
+        # a hash from before a bcrypt cost change is redone off the request path
+        rehash_later(customer.customer_id, password, customer.hashed_password)
 
         access_token = create_access_token(
             email=email,
@@ -36,16 +89,53 @@ class AuthenticationService:
             role_id=customer.role_id,
             expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
-        return {"access_token": access_token, "token_type": "bearer"}
+        refresh_token, token_hash, expires_at = new_refresh_token()
+        try:
+            purge_expired_refresh_tokens(db)
+            db.execute(INSERT_REFRESH_TOKEN,
+                       {"token_hash": token_hash, "customer_id": customer.customer_id, "expires_at": expires_at})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+    def refresh_access_token(self, db: Session, refresh_token: str):
+        """Exchanges a refresh token for a new access token and a new refresh token.
+        The old refresh token stops working; no password hashing is involved."""
+        token_hash = hash_refresh_token(refresh_token)
+        now = datetime.utcnow()
+        row = db.execute(REFRESH_TOKEN_OWNER, {"old_hash": token_hash, "now": now}).first()
+        if row is None:
+            return None
+
+        # rotate in place; of two concurrent refreshes with the same token only one matches
+        new_token, new_hash, expires_at = new_refresh_token()
+        try:
+            rotated = db.execute(ROTATE_REFRESH_TOKEN, {"old_hash": token_hash, "now": now, "new_hash": new_hash,
+                                                        "new_expires_at": expires_at}).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if rotated != 1:
+            return None
+
+        access_token = create_access_token(
+            email=row.email,
+            customer_id=row.customer_id,
+            role_id=row.role_id,
+            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+        return {"access_token": access_token, "token_type": "bearer", "refresh_token": new_token}
 
     def register_customer(self, db: Session, create_customer_request: CustomerRequest):
         """Register a new customer."""
         try:
-            existing_customer = db.query(Customer).filter(Customer.email == create_customer_request.email).first()
-            if existing_customer:
+            if db.execute(EMAIL_TAKEN, {"email": create_customer_request.email}).first():
                 raise HTTPException(status_code=400, detail="Email already registered")
 
-            hashed_password = pwd_context.hash(create_customer_request.password)
+            hashed_password = password_context.hash(create_customer_request.password)
 
             new_customer = Customer(
                 name=create_customer_request.name,
@@ -0,0 +1,310 @@
+"""Memory-mapped, read-only product catalog shared by every worker on a host.
+
+Layout (little endian):
+
+    header   magic "FSCAT001", generation u64, count u64, string count u64, blob size u64
+    ids      int64[count], sorted
+    prices   float64[count]
+    stock    int64[count]
+    names    uint32[count]   index into the string table
+    descs    uint32[count]   index into the string table, NO_STRING for NULL
+    offsets  uint32[string count + 1]
+    blob     utf-8 bytes of the interned strings
+
+A new generation is written to a temporary file and renamed over the old one, so
+readers see either the old or the new file, never a partial one. Writers, threads
+and processes alike, take an exclusive lock on the snapshot's .lock file, read
+the database and replace the file while holding it; the generation is the time
+that read started, and a file never replaces one of a newer generation. Each worker maps
+the file once per generation; the pages live in the OS page cache and are shared,
+so 16 workers cost one copy of the catalog instead of 16.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from models.products import Product
+
+# e.g. /dev/shm/flowershop-catalog.bin; unset disables the snapshot
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH") or None
+# product writes and checkouts reach the snapshot within this many seconds
+CATALOG_SNAPSHOT_REFRESH = float(os.getenv("CATALOG_SNAPSHOT_REFRESH", "2"))
+
+MAGIC = b"FSCAT001"
+HEADER = struct.Struct("<8sQQQQ")
+NO_STRING = 0xFFFFFFFF
+
+PRODUCT_ROWS = select(Product.product_id, Product.name, Product.description, Product.price, Product.stock_quantity)
+CHANGED_PRODUCT_ROWS = PRODUCT_ROWS.where(Product.product_id.in_(bindparam("product_ids", expanding=True)))
+
+
+class ProductRecord(NamedTuple):
+    product_id: int
+    name: str
+    description: Optional[str]
+    price: float
+    stock_quantity: int
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+@contextmanager
+def snapshot_lock(path: str):
+    """Exclusive across the host's threads and processes: each takes its own open file."""
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def read_generation(path: str) -> Optional[int]:
+    try:
+        with open(path, "rb") as f:
+            magic, generation, *_ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return generation if magic == MAGIC else None
+
+
+def write_snapshot(path: str, rows: Iterable, generation: int) -> int:
+    """Writes rows of (product_id, name, description, price, stock_quantity), read from
+    the database at generation (time.time_ns()), as the snapshot at path, unless the
+    file on disk is already newer. Returns the generation on disk. The caller holds
+    snapshot_lock(path)."""
+    current = read_generation(path)
+    if current is not None and current >= generation:
+        return current
+    rows = sorted(rows, key=lambda row: row[0])
+
+    strings: Dict[str, int] = {}
+    blob = bytearray()
+    offsets = [0]
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(offsets) - 1
+            blob.extend(value.encode("utf-8"))
+            offsets.append(len(blob))
+        return index
+
+    count = len(rows)
+    names = [intern(row[1]) for row in rows]
+    descriptions = [intern(row[2]) for row in rows]
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, generation, count, len(strings), len(blob)))
+            f.write(struct.pack(f"<{count}q", *(row[0] for row in rows)))
+            f.write(struct.pack(f"<{count}d", *(row[3] for row in rows)))
+            f.write(struct.pack(f"<{count}q", *(row[4] for row in rows)))
+            f.write(struct.pack(f"<{count}I", *names))
+            f.write(struct.pack(f"<{count}I", *descriptions))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return generation
+
+
+class CatalogSnapshot:
+    """Read-only view over one generation of the snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        magic, self.generation, count, string_count, blob_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+
+        view = memoryview(self._map)
+        offset = HEADER.size
+
+        def section(size: int, fmt: str):
+            nonlocal offset
+            part = view[offset:offset + size]
+            offset += size
+            return part.cast(fmt)
+
+        self.ids = section(8 * count, "q")
+        self.prices = section(8 * count, "d")
+        self.stock = section(8 * count, "q")
+        self._names = section(4 * count, "I")
+        self._descriptions = section(4 * count, "I")
+        self._offsets = section(4 * (string_count + 1), "I")
+        self._blob = view[offset:offset + blob_size]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _index(self, product_id: int) -> int:
+        index = bisect_left(self.ids, product_id)
+        if index < len(self.ids) and self.ids[index] == product_id:
+            return index
+        return -1
+
+    def _string(self, ref: int) -> Optional[str]:
+        if ref == NO_STRING:
+            return None
+        return bytes(self._blob[self._offsets[ref]:self._offsets[ref + 1]]).decode("utf-8")
+
+    def price(self, product_id: int) -> Optional[float]:
+        index = self._index(product_id)
+        return None if index < 0 else self.prices[index]
+
+    def _record(self, index: int) -> ProductRecord:
+        return ProductRecord(self.ids[index], self._string(self._names[index]),
+                             self._string(self._descriptions[index]), self.prices[index], self.stock[index])
+
+    def get(self, product_id: int) -> Optional[ProductRecord]:
+        index = self._index(product_id)
+        return None if index < 0 else self._record(index)
+
+    def get_many(self, product_ids: Iterable[int]) -> List[ProductRecord]:
+        records = (self.get(product_id) for product_id in product_ids)
+        return [record for record in records if record is not None]
+
+    def records(self) -> Iterator[ProductRecord]:
+        return (self._record(index) for index in range(len(self.ids)))
+
+
+class CatalogSnapshotStore:
+    """Per-worker handle on the shared snapshot file; disabled when path is None.
+
+    Product writes and checkouts only note which products changed. A background
+    refresh, at most every `refresh` seconds, re-reads those products by id and
+    writes them into a new generation with the rest of the catalog copied from the
+    file, so no request reads the whole catalog or rewrites the file."""
+
+    def __init__(self, path: Optional[str], refresh: float = CATALOG_SNAPSHOT_REFRESH):
+        self.path = path
+        self.refresh = refresh
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._changed: Set[int] = set()
+        self._refreshing = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The newest generation on disk, remapped only when the file was replaced."""
+        if self.path is None:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                    # the previous map is released once no request still reads from it
+                    snapshot = self._snapshot = CatalogSnapshot(self.path)
+        return snapshot
+
+    def _rebuild(self, db: Session) -> int:
+        """Writes the whole catalog; the caller holds snapshot_lock."""
+        # taken before the read, so a slower writer that read earlier cannot win
+        generation = time.time_ns()
+        return write_snapshot(self.path, db.execute(PRODUCT_ROWS).all(), generation)
+
+    def refresh_from_db(self, db: Session) -> Optional[int]:
+        if self.path is None:
+            return None
+        with snapshot_lock(self.path):
+            return self._rebuild(db)
+
+    def ensure_fresh(self, db: Session, max_age: float):
+        """Writes a new generation when the file is missing or older than max_age
+        seconds; workers starting together rebuild it once."""
+        if self.path is None:
+            return
+        with snapshot_lock(self.path):
+            try:
+                age = time.time() - os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                age = None
+            if age is None or age > max_age:
+                self._rebuild(db)
+
+    def apply_changes(self, db: Session, product_ids: Iterable[int]) -> Optional[int]:
+        """Re-reads only product_ids and writes a generation with the rest of the
+        catalog taken from the file; a missing file is rebuilt in full. Retired
+        products drop out, since the read skips them."""
+        if self.path is None:
+            return None
+        product_ids = set(product_ids)
+        with snapshot_lock(self.path):
+            try:
+                base = CatalogSnapshot(self.path)
+            except (FileNotFoundError, ValueError):
+                return self._rebuild(db)
+            generation = time.time_ns()
+            rows = {record.product_id: record for record in base.records()
+                    if record.product_id not in product_ids}
+            if product_ids:
+                rows.update((row.product_id, row) for row in db.execute(
+                    CHANGED_PRODUCT_ROWS, {"product_ids": list(product_ids)}))
+            return write_snapshot(self.path, rows.values(), generation)
+
+    def products_changed(self, product_ids: Iterable[int]):
+        """Notes products whose committed write the snapshot must pick up; a
+        background refresh writes them within `refresh` seconds."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._changed.update(product_ids)
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def _refresh_in_background(self):
+        from config.database import SessionLocal
+
+        # the changes of the next few seconds go into the same generation
+        time.sleep(self.refresh)
+        with self._lock:
+            product_ids, self._changed = self._changed, set()
+            self._refreshing = False
+        db = SessionLocal()
+        try:
+            self.apply_changes(db, product_ids)
+        except Exception as e:
+            print(f"Catalog snapshot refresh failed: {e}")
+            # every worker reads the database until a refresh rebuilds the file
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Catalog snapshot could not be removed: {e}")
+        finally:
+            db.close()
+
+
+catalog_snapshot = CatalogSnapshotStore(CATALOG_SNAPSHOT_PATH)
@@ -0,0 +1,102 @@
+import base64
+import heapq
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_, select, true
+from sqlalchemy.orm import Session
+
+from models.order_items import OrderItem
+from models.orders import Order
+from models.products import Product
+from models.tombstones import Tombstone
+
+# Rows younger than this are held back: a transaction that started earlier can still
+# commit an updated_at below a watermark the client has already moved past.
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "5"))
+MAX_CHANGES = 5000
+
+# source name -> (changed_at column, keyset id column, entity, data columns); source
+# names are part of the keyset, so changes with equal timestamps page deterministically
+SOURCES = {
+    "delete": (Tombstone.deleted_at, Tombstone.tombstone_id, None,
+               (Tombstone.entity, Tombstone.entity_id)),
+    "order": (Order.updated_at, Order.order_id, "order",
+              (Order.order_id, Order.customer_id, Order.order_date, Order.total_amount)),
+    "order_item": (OrderItem.updated_at, OrderItem.order_item_id, "order_item",
+                   (OrderItem.order_item_id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity,
+                    OrderItem.price_at_purchase)),
+    "product": (Product.updated_at, Product.product_id, "product",
+                (Product.product_id, Product.name, Product.description, Product.price, Product.stock_quantity)),
+}
+
+Watermark = Tuple[datetime, str, int]
+
+
+def encode_watermark(watermark: Watermark) -> str:
+    changed_at, source, key = watermark
+    raw = json.dumps([changed_at.isoformat(), source, key], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_watermark(value: str) -> Watermark:
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        changed_at, source, key = json.loads(raw)
+        watermark = (datetime.fromisoformat(changed_at), str(source), int(key))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid watermark")
+    if watermark[1] not in SOURCES:
+        raise ValueError("Invalid watermark")
+    return watermark
+
+
+def _after(changed_at, key, source: str, since: Optional[Watermark]):
+    """Keyset predicate for (changed_at, source, key) > since within one source."""
+    if since is None:
+        return true()
+    since_at, since_source, since_key = since
+    if source > since_source:
+        return changed_at >= since_at
+    if source < since_source:
+        return changed_at > since_at
+    return or_(changed_at > since_at, and_(changed_at == since_at, key > since_key))
+
+
+class ChangeFeedService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_changes(self, since: Optional[str], limit: int) -> dict:
+        """Inserts, updates and deletes of orders, order items and products after the
+        since watermark, oldest first; pass `next` back as since for the next page."""
+        watermark = decode_watermark(since) if since else None
+        horizon = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+
+        streams = []
+        for source, (changed_at, key, entity, columns) in SOURCES.items():
+            rows = self.db.execute(
+                select(changed_at.label("changed_at"), key.label("change_key"), *columns)
+                .where(changed_at < horizon, _after(changed_at, key, source, watermark))
+                .order_by(changed_at, key)
+                .limit(limit + 1)
+            ).all()
+            streams.append([(row[0], source, row[1], entity, row) for row in rows])
+
+        merged = list(heapq.merge(*streams, key=lambda change: change[:3]))
+        page = merged[:limit]
+        changes = [self._change(*change) for change in page]
+        last = page[-1][:3] if page else watermark
+        return {
+            "changes": changes,
+            "next": encode_watermark(last) if last else since,
+            "has_more": len(merged) > limit,
+        }
+
+    def _change(self, changed_at: datetime, source: str, key: int, entity: Optional[str], row) -> dict:
+        if entity is None:
+            return {"entity": row.entity, "op": "delete", "id": row.entity_id, "changed_at": changed_at, "data": None}
+        data = {name: value for name, value in row._mapping.items() if name not in ("changed_at", "change_key")}
+        return {"entity": entity, "op": "upsert", "id": key, "changed_at": changed_at, "data": data}
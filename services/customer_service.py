@@ -1,27 +1,35 @@
+from typing import Optional, Tuple
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from config.passwords import password_context
 from models.customer_loyalty import CustomerLoyalty
 from models.customers import Customer
 from schemas.customers import CustomerUpdateRequest, CustomerVerification
+from services.authentication_service import revoke_refresh_tokens
+from services.invalidation import invalidation_bus
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+# built once; see CUSTOMER_BY_ID in config/auth.py
+LOYALTY_STATUS = select(CustomerLoyalty.status).where(CustomerLoyalty.loyalty_id == bindparam("loyalty_id"))
 
 
 class CustomerService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_customer(self, customer_id: int):
-        customer_model = self.db.query(Customer).filter(Customer.customer_id == customer_id).first()
+    def get_customer(self, customer_id: int, fields: Optional[Tuple[str, ...]] = None):
+        # authentication has already loaded the whole row into the identity map, so a
+        # narrower SELECT for `fields` would only be an extra round trip
+        customer_model = self.db.get(Customer, customer_id)
         if not customer_model:
             raise ValueError("Customer not found")
 
-        loyal_name = None
-        if customer_model.loyalty_id:
-            loyalty_model = self.db.query(CustomerLoyalty).filter(
-                CustomerLoyalty.loyalty_id == customer_model.loyalty_id).first()
-            if loyalty_model:
-                loyal_name = loyalty_model.status
+        if fields is not None:
+            values = {name: getattr(customer_model, name) for name in fields if name != "loyal_name"}
+            if "loyal_name" in fields:
+                values["loyal_name"] = self._loyal_name(customer_model.loyalty_id)
+            return values
+
+        loyal_name = self._loyal_name(customer_model.loyalty_id)
 
         return {
             "customer_id": customer_model.customer_id,
@@ -33,8 +41,13 @@ class CustomerService:
             "loyal_name": loyal_name
         }
 
+    def _loyal_name(self, loyalty_id: Optional[int]) -> Optional[str]:
+        if not loyalty_id:
+            return None
+        return self.db.execute(LOYALTY_STATUS, {"loyalty_id": loyalty_id}).scalar()
+
     def update_customer(self, customer_id: int, customer_update: CustomerUpdateRequest):
-        customer_model = self.db.query(Customer).filter(Customer.customer_id == customer_id).first()
+        customer_model = self.db.get(Customer, customer_id)
         if not customer_model:
             raise ValueError("Customer not found")
 
@@ -47,13 +60,11 @@ class CustomerService:
         if customer_update.address:
             customer_model.address = customer_update.address
 
-        if customer_model.loyalty_id:
-            loyalty_model = self.db.query(CustomerLoyalty).filter(
-                CustomerLoyalty.loyalty_id == customer_model.loyalty_id).first()
-            loyal_name = loyalty_model.status if loyalty_model else None
+        loyal_name = self._loyal_name(customer_model.loyalty_id)
 
         try:
             self.db.add(customer_model)
+            invalidation_bus.publish(self.db, "customer", [customer_id])
             self.db.commit()
             return {
                 "customer_id": customer_model.customer_id,
@@ -69,18 +80,19 @@ class CustomerService:
             raise e
 
     def change_password(self, customer_id: int, verification: CustomerVerification):
-        customer_model = self.db.query(Customer).filter(Customer.customer_id == customer_id).first()
+        customer_model = self.db.get(Customer, customer_id)
         if not customer_model:
             raise ValueError("Customer not found")
 
-        if not bcrypt_context.verify(verification.password, customer_model.hashed_password):
+        if not password_context.verify(verification.password, customer_model.hashed_password):
             raise ValueError("Incorrect password")
 
-        hashed_new_password = bcrypt_context.hash(verification.new_password)
+        hashed_new_password = password_context.hash(verification.new_password)
         customer_model.hashed_password = hashed_new_password
 
         try:
             self.db.add(customer_model)
+            revoke_refresh_tokens(self.db, customer_id)
             self.db.commit()
         except Exception as e:
             self.db.rollback()
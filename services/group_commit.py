@@ -0,0 +1,166 @@
+"""Group commit for checkouts.
+
+With GROUP_COMMIT_WINDOW_MS > 0, OrderService.create_order hands its work to the
+GroupCommitter instead of committing on its own. The first checkout to arrive
+leads a batch. It waits up to the window, or until GROUP_COMMIT_MAX_BATCH
+checkouts have joined. Then it runs each checkout of the batch in its own
+SAVEPOINT of one session and commits once for all of them, so the batch pays a
+single commit, fsync and lock round trip. A checkout that fails rolls back only
+its savepoint, and every caller still gets its own result or exception back
+synchronously.
+
+Each checkout runs in a copy of its caller's context, so per-request query
+budgets still see its statements.
+"""
+import contextvars
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "32"))
+
+
+class _Member:
+    __slots__ = ("work", "context", "done", "result", "error")
+
+    def __init__(self, work: Callable[[Session], Any]):
+        self.work = work
+        self.context = contextvars.copy_context()
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _Batch:
+    __slots__ = ("members", "full")
+
+    def __init__(self):
+        self.members: List[_Member] = []
+        self.full = threading.Event()
+
+
+class GroupCommitter:
+    """Gathers concurrent units of work into one transaction with a savepoint each.
+    Callers block a thread while their batch runs, so only use it from sync
+    (threadpool) endpoints."""
+
+    def __init__(self, session_factory: Optional[Callable[..., Session]] = None,
+                 window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self._session_factory = session_factory
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._batch: Optional[_Batch] = None
+        self.batches = 0
+        self.units = 0
+        self.failed_units = 0
+        self.failed_batches = 0
+        self.largest_batch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+
+    def submit(self, work: Callable[[Session], Any]) -> Any:
+        """Runs work(session) inside the next group transaction and returns its result
+        once that transaction has committed; raises its exception (or the commit's)."""
+        member = _Member(work)
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            batch.members.append(member)
+            if len(batch.members) >= self.max_batch:
+                # closed: the next checkout starts a new batch
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window_ms / 1000)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._run(batch.members)
+        else:
+            member.done.wait()
+
+        if member.error is not None:
+            raise member.error
+        return member.result
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from config.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        # results are handed to other threads after the session closes, so they
+        # must not be expired by the commit
+        return self._session_factory(expire_on_commit=False)
+
+    def _run(self, members: List[_Member]):
+        db = self._session()
+        committed: List[_Member] = []
+        try:
+            if db.get_bind().dialect.name == "sqlite":
+                # pysqlite only opens a transaction before DML, which would turn the
+                # first SAVEPOINT into the outer transaction and its RELEASE into a commit
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for member in members:
+                if member.context.run(self._attempt, db, member):
+                    committed.append(member)
+            if committed:
+                db.commit()
+            else:
+                db.rollback()
+        except BaseException as e:
+            db.rollback()
+            for member in committed:
+                member.result, member.error = None, e
+            with self._lock:
+                self.failed_batches += 1
+        finally:
+            db.close()
+            with self._lock:
+                self.batches += 1
+                self.units += len(members)
+                self.failed_units += sum(1 for member in members if member.error is not None)
+                self.largest_batch = max(self.largest_batch, len(members))
+            for member in members:
+                member.done.set()
+
+    @staticmethod
+    def _attempt(db: Session, member: _Member) -> bool:
+        # session.info queues (outbox rows, invalidations, tombstones) are only
+        # dropped by a full rollback, so trim what a failed savepoint appended
+        marks: Dict[str, int] = {key: len(value) for key, value in db.info.items() if isinstance(value, list)}
+        try:
+            with db.begin_nested():
+                member.result = member.work(db)
+            return True
+        except Exception as e:
+            member.error = e
+            for key, value in db.info.items():
+                if isinstance(value, list):
+                    del value[marks.get(key, 0):]
+            db.info.pop("batch_loaders", None)
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "window_ms": self.window_ms,
+                "batches": self.batches,
+                "units": self.units,
+                "failed_units": self.failed_units,
+                "failed_batches": self.failed_batches,
+                "largest_batch": self.largest_batch,
+                "average_batch": round(self.units / self.batches, 2) if self.batches else 0.0,
+            }
+
+
+group_committer = GroupCommitter()
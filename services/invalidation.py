@@ -0,0 +1,289 @@
+"""Cross-worker cache invalidation.
+
+A write publishes `(entity, key)` pairs on its session; once the session commits,
+the local worker applies them straight away and the transport carries them to the
+other workers, whose poller applies them within INVALIDATION_INTERVAL seconds.
+A key of None invalidates the whole entity.
+
+Transports:
+    db     rows in cache_invalidations, written in the same transaction as the
+           change itself; the row id is the version (default)
+    unix   datagrams to every worker socket in INVALIDATION_SOCKET_DIR (single host)
+    off    the writing worker only (single worker deployments)
+"""
+import json
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, delete, event, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from models.cache_invalidations import CacheInvalidation
+from models.table_versions import TableVersion
+
+INVALIDATION_TRANSPORT = os.getenv("INVALIDATION_TRANSPORT", "db").strip().lower() or "db"
+INVALIDATION_INTERVAL = float(os.getenv("INVALIDATION_INTERVAL", "1"))
+INVALIDATION_SOCKET_DIR = os.getenv("INVALIDATION_SOCKET_DIR") or "/tmp/flowershop-invalidation"
+# seconds cache_invalidations rows are kept before pollers purge them
+INVALIDATION_RETENTION = int(os.getenv("INVALIDATION_RETENTION", "3600"))
+# Rows this young are read again on every poll: ids are taken when a transaction
+# inserts its row, so one can commit below an id the poller has already passed.
+INVALIDATION_SETTLE_SECONDS = float(os.getenv("INVALIDATION_SETTLE_SECONDS", "5"))
+
+
+class InvalidationEvent(NamedTuple):
+    entity: str
+    key: Optional[str]
+    version: int
+
+
+class DatabaseTransport:
+    """Appends events to cache_invalidations inside the writer's transaction and
+    polls the table for rows past the highest id seen, plus every row created
+    within the last `settle` seconds. Rows already delivered are skipped by id, so
+    a transaction that commits after a higher id is still delivered, as long as it
+    commits within `settle` seconds of writing its row (the row is written just
+    before COMMIT)."""
+
+    def __init__(self, session_factory, retention: int = INVALIDATION_RETENTION,
+                 settle: float = INVALIDATION_SETTLE_SECONDS):
+        self.session_factory = session_factory
+        self.retention = retention
+        self.settle = settle
+        self._last_id: Optional[int] = None
+        # id -> created_at of rows delivered that are still inside the settle window
+        self._seen: Dict[int, datetime] = {}
+        self._last_purge = time.monotonic()
+
+    def stage(self, db: Session, pairs: List[tuple]):
+        db.execute(insert(CacheInvalidation), [{"entity": entity, "key": key} for entity, key in pairs])
+
+    def send(self, pairs: List[tuple]):
+        pass
+
+    def receive(self) -> List[InvalidationEvent]:
+        db = self.session_factory()
+        try:
+            horizon = datetime.utcnow() - timedelta(seconds=self.settle)
+            if self._last_id is None:
+                # start from the current tail; anything committed is already in the database
+                # we load from, so only rows that commit late into the window are news
+                self._last_id = db.execute(select(func.max(CacheInvalidation.id))).scalar() or 0
+                self._seen = dict(db.execute(select(CacheInvalidation.id, CacheInvalidation.created_at)
+                                             .where(CacheInvalidation.created_at >= horizon)).all())
+                return []
+            rows = db.execute(
+                select(CacheInvalidation.id, CacheInvalidation.entity, CacheInvalidation.key,
+                       CacheInvalidation.created_at)
+                .where(or_(CacheInvalidation.id > self._last_id, CacheInvalidation.created_at >= horizon))
+                .order_by(CacheInvalidation.id)
+            ).all()
+            rows = [row for row in rows if row.id not in self._seen]
+            if rows:
+                self._last_id = max(self._last_id, rows[-1].id)
+            self._seen.update((row.id, row.created_at) for row in rows)
+            # rows older than the window are not read again, so their ids can be forgotten
+            self._seen = {row_id: created_at for row_id, created_at in self._seen.items() if created_at >= horizon}
+            if time.monotonic() - self._last_purge > self.retention / 10:
+                self._last_purge = time.monotonic()
+                cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+                db.execute(delete(CacheInvalidation).where(CacheInvalidation.created_at < cutoff))
+                db.commit()
+            return [InvalidationEvent(row.entity, row.key, row.id) for row in rows]
+        finally:
+            db.close()
+
+    def close(self):
+        pass
+
+
+class UnixSocketTransport:
+    """Each worker binds a datagram socket in one directory and sends every event
+    to all the other sockets there; versions are nanosecond timestamps."""
+
+    def __init__(self, directory: str = INVALIDATION_SOCKET_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        self._socket.setblocking(False)
+
+    def stage(self, db: Session, pairs: List[tuple]):
+        pass
+
+    def send(self, pairs: List[tuple]):
+        version = time.time_ns()
+        payload = json.dumps([[entity, key, version] for entity, key in pairs]).encode("utf-8")
+        for name in os.listdir(self.directory):
+            peer = os.path.join(self.directory, name)
+            if peer == self.path or not name.endswith(".sock"):
+                continue
+            try:
+                self._socket.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # the worker behind it has exited
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                # its queue is full; it will catch up when it next reloads
+                pass
+
+    def receive(self) -> List[InvalidationEvent]:
+        events = []
+        while True:
+            try:
+                payload = self._socket.recv(65536)
+            except BlockingIOError:
+                return events
+            events.extend(InvalidationEvent(*event) for event in json.loads(payload))
+
+    def close(self):
+        self._socket.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+Handler = Callable[[List[InvalidationEvent]], None]
+
+
+BUMP_TABLE_VERSIONS = (
+    update(TableVersion)
+    .where(TableVersion.entity.in_(bindparam("entities", expanding=True)))
+    .values(version=TableVersion.version + 1)
+    .execution_options(synchronize_session=False)
+)
+
+
+def table_version(db: Session, entity: str, key_column, *criteria) -> tuple:
+    """(max key of the rows matching criteria, entity's write counter) as one query,
+    for weak ETags. The counter is bumped inside every transaction that publishes
+    an invalidation for entity, whatever the transport, so every worker agrees on
+    it and it never goes back; the max key catches inserts that publish nothing."""
+    counter = select(TableVersion.version).where(TableVersion.entity == entity).scalar_subquery()
+    return tuple(db.execute(select(func.max(key_column), counter).where(*criteria)).one())
+
+
+class InvalidationBus:
+    def __init__(self, transport, interval: float = INVALIDATION_INTERVAL):
+        self.transport = transport
+        self.interval = interval
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def subscribe(self, entity: str, handler: Handler):
+        """handler receives every event for entity delivered in one poll or commit."""
+        self._handlers[entity].append(handler)
+
+    def version(self, entity: str) -> int:
+        """Bumped every time this worker applies an invalidation for entity."""
+        return self._versions[entity]
+
+    def publish(self, db: Session, entity: str, keys: Iterable = (None,)):
+        """Queues invalidations; they are written with the session's next commit."""
+        pairs = [(entity, None if key is None else str(key)) for key in keys]
+        if pairs:
+            db.info.setdefault("invalidations", []).extend(pairs)
+
+    def apply(self, events: List[InvalidationEvent]):
+        by_entity: Dict[str, List[InvalidationEvent]] = defaultdict(list)
+        for invalidation in events:
+            by_entity[invalidation.entity].append(invalidation)
+        for entity, entity_events in by_entity.items():
+            self._versions[entity] += 1
+            for handler in self._handlers.get(entity, ()):
+                try:
+                    handler(entity_events)
+                except Exception as e:
+                    print(f"Invalidation handler for {entity} failed: {e}")
+
+    def poll(self):
+        if self.transport is None:
+            return
+        events = self.transport.receive()
+        if events:
+            self.apply(events)
+
+    def start(self):
+        if self.transport is None or self._thread is not None:
+            return
+        # the first poll only finds where the transport currently ends
+        self.poll()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.interval * 2)
+        self._thread = None
+        self.transport.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Invalidation poll failed: {e}")
+
+    def _committing(self, session: Session):
+        pairs = session.info.get("invalidations")
+        if not pairs:
+            return
+        session.execute(BUMP_TABLE_VERSIONS, {"entities": sorted({entity for entity, _ in pairs})})
+        if self.transport is not None:
+            # everything published in this transaction goes out as one statement
+            self.transport.stage(session, pairs)
+
+    def _committed(self, session: Session):
+        pairs = session.info.pop("invalidations", None)
+        if not pairs:
+            return
+        if self.transport is not None:
+            self.transport.send(pairs)
+        # the writing worker does not wait for its own poll; version 0 marks a local echo
+        self.apply([InvalidationEvent(entity, key, 0) for entity, key in pairs])
+
+
+def create_transport(name: str = INVALIDATION_TRANSPORT):
+    if name == "db":
+        from config.database import SessionLocal
+        return DatabaseTransport(SessionLocal)
+    if name == "unix":
+        return UnixSocketTransport()
+    if name == "off":
+        return None
+    raise ValueError(f"INVALIDATION_TRANSPORT must be db, unix or off, not {name!r}")
+
+
+invalidation_bus = InvalidationBus(create_transport())
+
+
+@event.listens_for(Session, "before_commit")
+def _stage_committing(session):
+    invalidation_bus._committing(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    invalidation_bus._committed(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_uncommitted(session):
+    session.info.pop("invalidations", None)
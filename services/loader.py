@@ -0,0 +1,80 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.orm import Session
+
+MAX_BATCH_IDS = 100
+
+
+class BatchLoader:
+    """Request-scoped cache of one entity's rows by id.
+
+    load_many() fetches every id it has not seen yet in a single `IN (...)` query,
+    and results (including misses) are cached for the rest of the request, so
+    repeated lookups of the same id cost nothing.
+    """
+
+    def __init__(self, db: Session, entity, key_column, options: Iterable = ()):
+        self.db = db
+        self.entity = entity
+        self.key_column = key_column
+        self.key_name = key_column.key
+        self.options = tuple(options)
+        # one IN (...) statement per loader; the expanding parameter takes any number of ids
+        self._statement = select(entity).options(*self.options).where(
+            key_column.in_(bindparam("keys", expanding=True)))
+        self._cache: Dict[Any, Any] = {}
+
+    def load(self, key: Any) -> Optional[Any]:
+        return self.load_many((key,)).get(key)
+
+    def load_many(self, ids: Iterable[Any]) -> Dict[Any, Any]:
+        """Returns {id: row} for the ids that exist, in the order they were requested."""
+        ids = list(dict.fromkeys(ids))
+        missing = [key for key in ids if key not in self._cache]
+        if missing:
+            for row in self.db.scalars(self._statement, {"keys": missing}):
+                self._cache[getattr(row, self.key_name)] = row
+            for key in missing:
+                self._cache.setdefault(key, None)
+        return {key: self._cache[key] for key in ids if self._cache[key] is not None}
+
+    def clear(self):
+        self._cache.clear()
+
+
+def get_loader(db: Session, entity, key_column=None, options: Iterable = ()) -> BatchLoader:
+    """The loader for entity, key_column and options in this session. Sessions are per
+    request (see get_db), so loaders are too; they are dropped whenever the session
+    commits or rolls back. Loader options compare by identity, so callers share a
+    loader by passing the same module-level tuple (see ORDER_ITEMS_LOADED)."""
+    if key_column is None:
+        key_column = entity.__mapper__.primary_key[0]
+    options = tuple(options)
+    loaders = db.info.setdefault("batch_loaders", {})
+    # a loader's rows carry its options; one keyed on the entity alone would hand
+    # them to a caller that asked for others
+    cache_key = (entity, key_column.key, options)
+    loader = loaders.get(cache_key)
+    if loader is None:
+        loader = loaders[cache_key] = BatchLoader(db, entity, key_column, options)
+    return loader
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _drop_loaders(session):
+    session.info.pop("batch_loaders", None)
+
+
+def parse_id_list(ids: str, limit: int = MAX_BATCH_IDS) -> List[int]:
+    """Parses `1,2,3` into unique ids in request order."""
+    try:
+        parsed = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    if not parsed:
+        raise ValueError("ids must not be empty")
+    if len(parsed) > limit:
+        raise ValueError(f"At most {limit} ids can be requested at once")
+    return parsed
@@ -0,0 +1,270 @@
+"""Cold order archival.
+
+    python -m services.order_archive --years 2
+
+Orders placed before the cutoff are moved, with their items, into one partition
+file per calendar month under ORDER_ARCHIVE_DIR. Each partition is written once,
+and its orders are then deleted from the database in chunks. A partition is a
+zip (deflate) of raw little-endian column arrays plus manifest.json, which
+carries the partition's revenue per day so RevenueService can add archived
+months without opening the arrays.
+
+Archived orders are no longer visible to OrderService (they read as not found)
+and are not reported as deletes by the change feed. Rerunning after a crash is
+safe: orders already present in a partition are skipped when it is rewritten.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.orm import Session
+
+from models.order_items import OrderItem
+from models.orders import Order
+from services.invalidation import invalidation_bus
+
+ORDER_ARCHIVE_DIR = os.getenv("ORDER_ARCHIVE_DIR") or "archive/orders"
+ARCHIVE_FORMAT_VERSION = 1
+
+ORDER_COLUMNS = (("order_id", "q"), ("customer_id", "q"), ("order_date", "q"), ("total_amount", "d"))
+ITEM_COLUMNS = (("order_item_id", "q"), ("order_id", "q"), ("product_id", "q"), ("quantity", "q"),
+                ("price_at_purchase", "d"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_micros(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _pack(values, typecode: str) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data: bytes, typecode: str) -> array:
+    unpacked = array(typecode)
+    unpacked.frombytes(data)
+    if sys.byteorder != "little":
+        unpacked.byteswap()
+    return unpacked
+
+
+class Partition:
+    """Columns of one month of archived orders and items."""
+
+    def __init__(self, year: int, month: int):
+        self.year = year
+        self.month = month
+        self.orders: Dict[str, list] = {name: [] for name, _ in ORDER_COLUMNS}
+        self.items: Dict[str, list] = {name: [] for name, _ in ITEM_COLUMNS}
+
+    @property
+    def name(self) -> str:
+        return f"orders-{self.year:04d}-{self.month:02d}.zip"
+
+    def add_order(self, order_id: int, customer_id: int, order_date: datetime, total_amount: float):
+        self.orders["order_id"].append(order_id)
+        self.orders["customer_id"].append(customer_id)
+        self.orders["order_date"].append(_to_micros(order_date))
+        self.orders["total_amount"].append(total_amount)
+
+    def add_item(self, row):
+        for name, _ in ITEM_COLUMNS:
+            self.items[name].append(getattr(row, name))
+
+    def daily_revenue(self) -> Dict[str, float]:
+        totals: Dict[str, float] = defaultdict(float)
+        for micros, amount in zip(self.orders["order_date"], self.orders["total_amount"]):
+            totals[_from_micros(micros).date().isoformat()] += amount
+        return dict(sorted(totals.items()))
+
+    def write(self, directory: str):
+        path = os.path.join(directory, self.name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        manifest = {
+            "format": ARCHIVE_FORMAT_VERSION,
+            "year": self.year,
+            "month": self.month,
+            "orders": len(self.orders["order_id"]),
+            "order_items": len(self.items["order_item_id"]),
+            "total_revenue": sum(self.orders["total_amount"]),
+            "daily_revenue": self.daily_revenue(),
+            "columns": {
+                "orders": {name: typecode for name, typecode in ORDER_COLUMNS},
+                "order_items": {name: typecode for name, typecode in ITEM_COLUMNS},
+            },
+        }
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+            for name, typecode in ORDER_COLUMNS:
+                archive.writestr(f"orders/{name}", _pack(self.orders[name], typecode))
+            for name, typecode in ITEM_COLUMNS:
+                archive.writestr(f"order_items/{name}", _pack(self.items[name], typecode))
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path: str) -> "Partition":
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read("manifest.json"))
+            partition = cls(manifest["year"], manifest["month"])
+            for name, typecode in ORDER_COLUMNS:
+                partition.orders[name] = _unpack(archive.read(f"orders/{name}"), typecode).tolist()
+            for name, typecode in ITEM_COLUMNS:
+                partition.items[name] = _unpack(archive.read(f"order_items/{name}"), typecode).tolist()
+        return partition
+
+
+class OrderArchive:
+    """Read side: partition manifests, reloaded whenever the directory changes."""
+
+    def __init__(self, directory: str = ORDER_ARCHIVE_DIR):
+        self.directory = directory
+        self._stamp: Optional[int] = None
+        self._manifests: List[dict] = []
+
+    def manifests(self) -> List[dict]:
+        try:
+            stamp = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if stamp != self._stamp:
+            manifests = []
+            for name in sorted(os.listdir(self.directory)):
+                if name.startswith("orders-") and name.endswith(".zip"):
+                    with zipfile.ZipFile(os.path.join(self.directory, name)) as archive:
+                        manifests.append(json.loads(archive.read("manifest.json")))
+            self._manifests, self._stamp = manifests, stamp
+        return self._manifests
+
+    def daily_totals(self) -> Dict[date, float]:
+        return {date.fromisoformat(day): total
+                for manifest in self.manifests() for day, total in manifest["daily_revenue"].items()}
+
+    def monthly_totals(self) -> Dict[Tuple[int, int], float]:
+        return {(manifest["year"], manifest["month"]): manifest["total_revenue"] for manifest in self.manifests()}
+
+    def yearly_totals(self) -> Dict[int, float]:
+        totals: Dict[int, float] = defaultdict(float)
+        for manifest in self.manifests():
+            totals[manifest["year"]] += manifest["total_revenue"]
+        return dict(totals)
+
+
+order_archive = OrderArchive()
+
+
+def _open_partition(directory: str, year: int, month: int) -> Partition:
+    path = os.path.join(directory, f"orders-{year:04d}-{month:02d}.zip")
+    return Partition.read(path) if os.path.exists(path) else Partition(year, month)
+
+
+def _close_partition(db: Session, partition: Partition, order_ids: List[int], directory: str, chunk_size: int):
+    """Writes the month's partition, then deletes its orders from the database."""
+    partition.write(directory)
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[start:start + chunk_size]
+        db.execute(delete(OrderItem).where(OrderItem.order_id.in_(chunk)))
+        db.execute(delete(Order).where(Order.order_id.in_(chunk)))
+        invalidation_bus.publish(db, "order")
+        db.commit()
+
+
+def archive_orders(db: Session, cutoff: datetime, directory: str = ORDER_ARCHIVE_DIR,
+                   chunk_size: int = 5000) -> dict:
+    """Moves orders dated before cutoff into month partitions. Orders are read oldest
+    first, chunk by chunk, and gathered per month; each partition is written once,
+    after the month's last order is read, and only then are its rows deleted."""
+    os.makedirs(directory, exist_ok=True)
+    counts = {"orders": 0, "order_items": 0, "partitions": set()}
+    partition: Optional[Partition] = None
+    archived: Set[int] = set()
+    month_order_ids: List[int] = []
+    after: Optional[Tuple[datetime, int]] = None
+    while True:
+        # rows stay until their whole month is on disk, so chunks page by keyset
+        query = (select(Order.order_id, Order.customer_id, Order.order_date, Order.total_amount)
+                 .where(Order.order_date < cutoff))
+        if after is not None:
+            query = query.where(or_(Order.order_date > after[0],
+                                    and_(Order.order_date == after[0], Order.order_id > after[1])))
+        orders = db.execute(query.order_by(Order.order_date, Order.order_id).limit(chunk_size)).all()
+        if not orders:
+            break
+        after = (orders[-1].order_date, orders[-1].order_id)
+        items_of: Dict[int, list] = defaultdict(list)
+        for item in db.execute(
+            select(*(getattr(OrderItem, name) for name, _ in ITEM_COLUMNS))
+            .where(OrderItem.order_id.in_([row.order_id for row in orders]))
+        ):
+            items_of[item.order_id].append(item)
+
+        for row in orders:
+            key = (row.order_date.year, row.order_date.month)
+            if partition is None or (partition.year, partition.month) != key:
+                if partition is not None:
+                    _close_partition(db, partition, month_order_ids, directory, chunk_size)
+                    counts["partitions"].add(partition.name)
+                partition = _open_partition(directory, *key)
+                # a rerun after a crash skips the orders a partition already holds
+                archived = set(partition.orders["order_id"])
+                month_order_ids = []
+            month_order_ids.append(row.order_id)
+            if row.order_id not in archived:
+                partition.add_order(row.order_id, row.customer_id, row.order_date, row.total_amount)
+                for item in items_of[row.order_id]:
+                    partition.add_item(item)
+            counts["orders"] += 1
+            counts["order_items"] += len(items_of[row.order_id])
+
+    if partition is not None:
+        _close_partition(db, partition, month_order_ids, directory, chunk_size)
+        counts["partitions"].add(partition.name)
+    counts["partitions"] = sorted(counts["partitions"])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old orders into compressed monthly archive partitions")
+    parser.add_argument("--years", type=int, default=2, help="archive orders older than this many years")
+    parser.add_argument("--before", type=date.fromisoformat, help="archive orders before this date instead")
+    parser.add_argument("--directory", default=ORDER_ARCHIVE_DIR)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    from config.database import SessionLocal
+
+    if args.before:
+        cutoff = datetime.combine(args.before, datetime.min.time())
+    else:
+        cutoff = datetime.combine(date.today().replace(day=1), datetime.min.time())
+        cutoff = cutoff.replace(year=cutoff.year - args.years)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        counts = archive_orders(db, cutoff, args.directory, args.chunk_size)
+    finally:
+        db.close()
+    counts["cutoff"] = cutoff.isoformat()
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == "__main__":
+    main()
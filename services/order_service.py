@@ -1,5 +1,10 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+import os
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, case, delete, insert, select, update
+from sqlalchemy.orm import Session, load_only, selectinload
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
@@ -7,8 +12,69 @@ from models.customers import Customer
 from models.order_items import OrderItem
 from models.orders import Order
 from models.products import Product
+from models.tombstones import write_tombstones, write_tombstones_where
 from models.customer_loyalty import CustomerLoyalty
 from schemas.orders import OrderRequest, OrderUpdate
+from schemas.projection import load_only_columns
+from services.catalog_snapshot import catalog_snapshot
+from services.group_commit import group_committer
+from services.invalidation import invalidation_bus, table_version
+from services.loader import get_loader
+from services.outbox import order_payload, record, record_stock
+from services.search_index import product_index
+
+
+# loyalty levels are reference data the API never writes; they are re-read every
+# LOYALTY_CACHE_SECONDS so edits made directly in the database still take effect
+LOYALTY_CACHE_SECONDS = float(os.getenv("LOYALTY_CACHE_SECONDS", "300"))
+_loyalty_levels: Tuple[float, List[Tuple[int, int]]] = (float("-inf"), [])
+
+# built once; see CUSTOMER_BY_ID in config/auth.py
+# checkout charges the price read here, in the same statement as the stock, so a
+# product write the catalog snapshot has not caught up with is never charged stale
+PRODUCT_STOCK = select(Product).options(load_only(Product.product_id, Product.price, Product.stock_quantity)).where(
+    Product.product_id.in_(bindparam("product_ids", expanding=True)))
+ORDER_FOR_UPDATE = select(Order).where(
+    Order.order_id == bindparam("order_id"), Order.customer_id == bindparam("customer_id")).with_for_update()
+ORDER_ITEM_ROWS = select(OrderItem.order_item_id, OrderItem.product_id, OrderItem.quantity).where(
+    OrderItem.order_id == bindparam("order_id")).order_by(OrderItem.order_item_id)
+# every product whose stock an edit can move, locked in id order so concurrent
+# edits touching the same products cannot deadlock; retired products included, since
+# an order may keep or drop a line for one
+LOCK_PRODUCTS = (
+    select(Product.product_id, Product.price, Product.stock_quantity, Product.deleted_at)
+    .where(Product.product_id.in_(bindparam("product_ids", expanding=True)))
+    .order_by(Product.product_id)
+    .with_for_update()
+    .execution_options(include_deleted=True)
+)
+DELETE_ORDER_ITEMS = delete(OrderItem).where(OrderItem.order_id == bindparam("order_id")).execution_options(
+    synchronize_session=False)
+ORDER_ITEMS_LOADED = (selectinload(Order.items),)
+
+
+def order_load_options(fields: Optional[Tuple[str, ...]] = None) -> list:
+    options = []
+    if fields is None or "items" in fields:
+        options.append(selectinload(Order.items))
+    columns = load_only_columns(Order, fields, "order_id")
+    if columns is not None:
+        options.append(columns)
+    return options
+
+
+# one statement per `fields` selection (parse_fields only admits OrderResponse fields)
+@lru_cache(maxsize=128)
+def customer_orders_statement(fields: Optional[Tuple[str, ...]] = None):
+    # oldest first, read in order from ix_orders_customer_id_order_date
+    return select(Order).options(*order_load_options(fields)).where(
+        Order.customer_id == bindparam("customer_id")).order_by(Order.order_date, Order.order_id)
+
+
+@lru_cache(maxsize=128)
+def customer_order_statement(fields: Optional[Tuple[str, ...]] = None):
+    return select(Order).options(*order_load_options(fields)).where(
+        Order.order_id == bindparam("order_id"), Order.customer_id == bindparam("customer_id"))
 
 
 class OrderService:
@@ -16,138 +82,215 @@ class OrderService:
         self.db = db
 
     def determine_loyalty_id(self, total_spent: float) -> Optional[int]:
-        loyalty = self.db.query(CustomerLoyalty).order_by(CustomerLoyalty.loyalty_points.desc()).all()
-        for level in loyalty:
-            if total_spent >= level.loyalty_points:
-                return level.loyalty_id
+        for loyalty_id, loyalty_points in self.loyalty_levels():
+            if total_spent >= loyalty_points:
+                return loyalty_id
         return None
 
+    def loyalty_levels(self) -> List[Tuple[int, int]]:
+        """(loyalty_id, loyalty_points), highest threshold first, cached per process."""
+        global _loyalty_levels
+        loaded_at, levels = _loyalty_levels
+        if time.monotonic() - loaded_at > LOYALTY_CACHE_SECONDS:
+            levels = [tuple(row) for row in self.db.execute(
+                select(CustomerLoyalty.loyalty_id, CustomerLoyalty.loyalty_points)
+                .order_by(CustomerLoyalty.loyalty_points.desc()))]
+            _loyalty_levels = (time.monotonic(), levels)
+        return levels
+
     def create_order(self, order: OrderRequest, customer_id: int) -> Order:
-        try:
-            total_amount = 0
-            order_items = []
-            product_ids = [item.product_id for item in order.items]
-            products = self.db.query(Product).filter(Product.product_id.in_(product_ids)).all()
-            product_dict = {product.product_id: product for product in products}
-
-            for item in order.items:
-                product = product_dict.get(item.product_id)
-                if not product:
-                    raise ValueError(f"Product ID {item.product_id} not found")
-                if product.stock_quantity < item.quantity:
-                    raise ValueError(f"Not enough stock for product ID {item.product_id}")
-                if product.stock_quantity < 0:
-                    raise ValueError(f"Product ID {item.product_id} is out of stock")
-                price_at_purchase = product.price
-                total_amount += price_at_purchase * item.quantity
-                order_items.append(OrderItem(
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=price_at_purchase
-                ))
-
-            db_order = Order(
-                customer_id=customer_id,
-                order_date=order.order_date,
-                total_amount=total_amount
-            )
-            self.db.add(db_order)
-            self.db.commit()
-            self.db.refresh(db_order)
+        if group_committer.enabled:
+            # placed in a savepoint of a transaction shared with concurrent checkouts
+            try:
+                db_order, stock_levels = group_committer.submit(
+                    lambda db: OrderService(db).place_order(order, customer_id))
+            except IntegrityError:
+                raise ValueError("Invalid customer or product ID")
+        else:
+            try:
+                db_order, stock_levels = self.place_order(order, customer_id)
+                # One commit for order, items, stock and customer; committing in between
+                # expired every loaded product and re-selected them one by one.
+                self.db.commit()
+                self.db.refresh(db_order)
+            except IntegrityError:
+                self.db.rollback()
+                raise ValueError("Invalid customer or product ID")
+            except Exception as e:
+                self.db.rollback()
+                raise e
 
-            for item in order_items:
-                db_order_item = OrderItem(
-                    order_id=db_order.order_id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=item.price_at_purchase
-                )
-                product = self.db.query(Product).filter(Product.product_id == item.product_id).first()
-                product.stock_quantity -= item.quantity
-                self.db.add(db_order_item)
+        for product_id, stock_quantity in stock_levels.items():
+            product_index.update_stock(product_id, stock_quantity)
+        catalog_snapshot.products_changed(stock_levels)
+        return db_order
 
-            self.db.commit()
-            self.db.refresh(db_order)
+    def place_order(self, order: OrderRequest, customer_id: int) -> Tuple[Order, Dict[int, int]]:
+        """Stages the order, its items, the stock decrements and the customer's totals
+        and flushes them; the caller commits. Returns the order and new stock levels."""
+        total_amount = 0
+        order_items = []
+        product_ids = [item.product_id for item in order.items]
+        product_dict = {product.product_id: product
+                        for product in self.db.scalars(PRODUCT_STOCK, {"product_ids": product_ids})}
 
-            db_customer = self.db.query(Customer).filter(Customer.customer_id == customer_id).first()
-            db_customer.total_spent += total_amount
-            new_loyalty_id = self.determine_loyalty_id(db_customer.total_spent)
-            if new_loyalty_id:
-                db_customer.loyalty_id = new_loyalty_id
-            self.db.add(db_customer)
-            self.db.commit()
-            self.db.refresh(db_customer)
+        for item in order.items:
+            product = product_dict.get(item.product_id)
+            if not product:
+                raise ValueError(f"Product ID {item.product_id} not found")
+            if product.stock_quantity < item.quantity:
+                raise ValueError(f"Not enough stock for product ID {item.product_id}")
+            if product.stock_quantity < 0:
+                raise ValueError(f"Product ID {item.product_id} is out of stock")
+            price_at_purchase = product.price
+            total_amount += price_at_purchase * item.quantity
+            order_items.append(OrderItem(
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price_at_purchase=price_at_purchase
+            ))
 
-            return db_order
+        db_order = Order(
+            customer_id=customer_id,
+            order_date=order.order_date,
+            total_amount=total_amount,
+            items=order_items
+        )
+        for item in order_items:
+            product = product_dict[item.product_id]
+            product.stock_quantity -= item.quantity
+        stock_levels = {product.product_id: product.stock_quantity for product in product_dict.values()}
+        self.db.add(db_order)
 
-        except IntegrityError:
-            self.db.rollback()
-            raise ValueError("Invalid customer or product ID")
-        except Exception as e:
-            self.db.rollback()
-            raise e
+        # already in the identity map from authentication (a group commit session loads it)
+        db_customer = self.db.get(Customer, customer_id)
+        db_customer.total_spent += total_amount
+        new_loyalty_id = self.determine_loyalty_id(db_customer.total_spent)
+        if new_loyalty_id:
+            db_customer.loyalty_id = new_loyalty_id
+        self.db.add(db_customer)
+        self.db.flush()
+        record(self.db, "order", "order.created", db_order.order_id, order_payload(db_order, order_items))
+        record_stock(self.db, stock_levels)
+        invalidation_bus.publish(self.db, "product", stock_levels)
+        # the new order id raises max(order_id); totals and loyalty change in place
+        invalidation_bus.publish(self.db, "customer", [customer_id])
+        return db_order, stock_levels
 
-    def get_order(self, order_id: int, customer_id: int) -> Order:
-        order = self.db.query(Order).filter(Order.order_id == order_id, Order.customer_id == customer_id).first()
+    def get_order(self, order_id: int, customer_id: int, fields: Optional[Tuple[str, ...]] = None) -> Order:
+        order = self.db.scalars(customer_order_statement(fields),
+                                {"order_id": order_id, "customer_id": customer_id}).first()
         if order is None:
             raise ValueError("Order not found")
         return order
 
+    def get_orders(self, order_ids: List[int], customer_id: int) -> List[Order]:
+        orders = get_loader(self.db, Order, options=ORDER_ITEMS_LOADED).load_many(order_ids)
+        return [order for order in orders.values() if order.customer_id == customer_id]
+
     def update_order(self, order_id: int, order_update: OrderUpdate, customer_id: int) -> Order:
+        """Edits an order in one transaction with a statement count independent of
+        basket size: the old and new baskets are diffed per product, stock moves by
+        the diff in one UPDATE, and items are updated, inserted and deleted in bulk."""
         try:
-            db_order = self.db.query(Order).filter(Order.order_id == order_id,
-                                                   Order.customer_id == customer_id).first()
+            # the order row lock serializes concurrent edits of the same basket
+            db_order = self.db.scalars(ORDER_FOR_UPDATE, {"order_id": order_id, "customer_id": customer_id}).first()
             if db_order is None:
                 raise ValueError("Order not found")
 
             if order_update.order_date is not None:
                 db_order.order_date = order_update.order_date
 
+            event_items = None
+            stock_levels = {}
             if order_update.items is not None:
-                existing_items = {item.product_id: item for item in db_order.items}
-                new_total_amount = 0
+                new_quantities: Dict[int, int] = defaultdict(int)
+                for item in order_update.items:
+                    new_quantities[item.product_id] += item.quantity
 
-                product_ids = [item.product_id for item in order_update.items]
-                products = self.db.query(Product).filter(Product.product_id.in_(product_ids)).all()
-                product_dict = {product.product_id: product for product in products}
+                existing_items = self.db.execute(ORDER_ITEM_ROWS, {"order_id": order_id}).all()
+                old_quantities: Dict[int, int] = defaultdict(int)
+                kept_items: Dict[int, int] = {}
+                removed_item_ids = []
+                for item in existing_items:
+                    old_quantities[item.product_id] += item.quantity
+                    if item.product_id in new_quantities and item.product_id not in kept_items:
+                        kept_items[item.product_id] = item.order_item_id
+                    else:
+                        removed_item_ids.append(item.order_item_id)
 
-                if len(product_dict) != len(product_ids):
-                    missing_product_ids = set(product_ids) - set(product_dict.keys())
+                products = {row.product_id: row for row in self.db.execute(
+                    LOCK_PRODUCTS, {"product_ids": list(set(new_quantities) | set(old_quantities))})}
+                missing_product_ids = set(new_quantities) - set(products)
+                if missing_product_ids:
                     raise ValueError(f"Products with IDs {missing_product_ids} not found")
 
-                for item in order_update.items:
-                    product = product_dict[item.product_id]
-                    price_at_purchase = product.price
-                    new_total_amount += price_at_purchase * item.quantity
-
-                    if item.product_id in existing_items:
-                        existing_item = existing_items[item.product_id]
-                        existing_item.quantity = item.quantity
-                        existing_item.price_at_purchase = price_at_purchase
+                # a retired product can stay in the order, or leave it, but not be bought anew
+                retired_product_ids = {product_id for product_id, product in products.items()
+                                       if product.deleted_at is not None
+                                       and new_quantities.get(product_id, 0) > old_quantities.get(product_id, 0)}
+                if retired_product_ids:
+                    raise ValueError(f"Products with IDs {retired_product_ids} are no longer sold")
+
+                stock_delta: Dict[int, int] = {}
+                for product_id, product in products.items():
+                    delta = new_quantities.get(product_id, 0) - old_quantities.get(product_id, 0)
+                    if delta > 0 and product.stock_quantity < delta:
+                        raise ValueError(f"Not enough stock for product ID {product_id}")
+                    if delta:
+                        stock_delta[product_id] = delta
+                if stock_delta:
+                    self.db.execute(
+                        update(Product).where(Product.product_id.in_(stock_delta))
+                        .values(stock_quantity=Product.stock_quantity - case(stock_delta, value=Product.product_id))
+                        .execution_options(synchronize_session=False, include_deleted=True)
+                    )
+                    stock_levels = {product_id: products[product_id].stock_quantity - delta
+                                    for product_id, delta in stock_delta.items()}
+
+                updated_rows, inserted_rows, event_items = [], [], []
+                for product_id, quantity in new_quantities.items():
+                    price_at_purchase = products[product_id].price
+                    event_items.append(OrderItem(product_id=product_id, quantity=quantity,
+                                                 price_at_purchase=price_at_purchase))
+                    if product_id in kept_items:
+                        updated_rows.append({"order_item_id": kept_items[product_id], "quantity": quantity,
+                                             "price_at_purchase": price_at_purchase})
                     else:
-                        db_order_item = OrderItem(
-                            order_id=db_order.order_id,
-                            product_id=item.product_id,
-                            quantity=item.quantity,
-                            price_at_purchase=price_at_purchase
-                        )
-                        self.db.add(db_order_item)
-
-                item_ids_to_keep = {item.product_id for item in order_update.items}
-                for existing_item in db_order.items:
-                    if existing_item.product_id not in item_ids_to_keep:
-                        self.db.delete(existing_item)
-
-                db_customer = self.db.query(Customer).filter(Customer.customer_id == customer_id).first()
+                        inserted_rows.append({"order_id": order_id, "product_id": product_id, "quantity": quantity,
+                                              "price_at_purchase": price_at_purchase})
+                if updated_rows:
+                    self.db.execute(update(OrderItem), updated_rows)
+                if inserted_rows:
+                    self.db.execute(insert(OrderItem), inserted_rows)
+                if removed_item_ids:
+                    self.db.execute(delete(OrderItem).where(OrderItem.order_item_id.in_(removed_item_ids))
+                                    .execution_options(synchronize_session=False))
+                    write_tombstones(self.db, "order_item", removed_item_ids)
+
+                new_total_amount = sum(item.price_at_purchase * item.quantity for item in event_items)
+                # already in the identity map from authentication
+                db_customer = self.db.get(Customer, customer_id)
                 db_customer.total_spent -= db_order.total_amount
                 db_order.total_amount = new_total_amount
+                # the items changed even when the total did not; the change feed reads this
+                db_order.updated_at = datetime.utcnow()
                 db_customer.total_spent += new_total_amount
-                new_loyalty_id = self.determine_loyalty_id(db_customer.total_spent)
-                db_customer.loyalty_id = new_loyalty_id
-                self.db.add(db_customer)
+                db_customer.loyalty_id = self.determine_loyalty_id(db_customer.total_spent)
+                invalidation_bus.publish(self.db, "customer", [customer_id])
+                if stock_levels:
+                    record_stock(self.db, stock_levels)
+                    invalidation_bus.publish(self.db, "product", stock_levels)
 
+            record(self.db, "order", "order.updated", order_id,
+                   order_payload(db_order, db_order.items if event_items is None else event_items))
+            invalidation_bus.publish(self.db, "order", [order_id])
             self.db.commit()
             self.db.refresh(db_order)
+            for product_id, stock_quantity in stock_levels.items():
+                product_index.update_stock(product_id, stock_quantity)
+            if stock_levels:
+                catalog_snapshot.products_changed(stock_levels)
 
             return db_order
 
@@ -159,20 +302,31 @@ class OrderService:
             raise e
 
     def delete_order(self, order_id: int, customer_id: int) -> None:
-        db_order = self.db.query(Order).filter(Order.order_id == order_id, Order.customer_id == customer_id).first()
+        """Deletes an order and its items in one transaction without loading the items."""
+        db_order = self.db.scalars(ORDER_FOR_UPDATE, {"order_id": order_id, "customer_id": customer_id}).first()
         if db_order is None:
             raise ValueError("Order not found")
 
-        db_customer = self.db.query(Customer).filter(Customer.customer_id == customer_id).first()
-        db_customer.total_spent -= db_order.total_amount
-        new_loyalty_id = self.determine_loyalty_id(db_customer.total_spent)
-        db_customer.loyalty_id = new_loyalty_id
-        self.db.add(db_customer)
-        self.db.commit()
+        try:
+            db_customer = self.db.get(Customer, customer_id)
+            db_customer.total_spent -= db_order.total_amount
+            db_customer.loyalty_id = self.determine_loyalty_id(db_customer.total_spent)
+
+            # items first: the order row goes at flush, and the bulk DELETE must not
+            # depend on an ON DELETE CASCADE that older databases lack
+            write_tombstones_where(self.db, "order_item", OrderItem.order_item_id, OrderItem.order_id == order_id)
+            self.db.execute(DELETE_ORDER_ITEMS, {"order_id": order_id})
+            self.db.delete(db_order)
+            record(self.db, "order", "order.deleted", order_id, {"order_id": order_id, "customer_id": customer_id})
+            invalidation_bus.publish(self.db, "order", [order_id])
+            invalidation_bus.publish(self.db, "customer", [customer_id])
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise e
 
-        self.db.delete(db_order)
-        self.db.commit()
+    def orders_version(self, customer_id: int) -> tuple:
+        return table_version(self.db, "order", Order.order_id, Order.customer_id == customer_id)
 
-    def get_all_orders(self, customer_id: int) -> List[Order]:
-        orders = self.db.query(Order).filter(Order.customer_id == customer_id).all()
-        return orders
+    def get_all_orders(self, customer_id: int, fields: Optional[Tuple[str, ...]] = None) -> List[Order]:
+        return list(self.db.scalars(customer_orders_statement(fields), {"customer_id": customer_id}))
@@ -0,0 +1,259 @@
+"""Transactional outbox for order and stock events.
+
+Services call record() before committing; the rows are inserted in the same
+transaction as the change, so an event exists exactly when its change does. Each
+worker runs an OutboxRelay that tails outbox_events by event_id and hands new rows
+to its EventBroker, which fans them out to that worker's WebSocket subscribers
+(routers/events.py). event_id is the offset subscribers resume from.
+
+An event_id is taken when its transaction inserts the row, just before COMMIT, so
+one can commit after a higher id has been relayed. The relay therefore also
+re-reads rows younger than OUTBOX_SETTLE_SECONDS and publishes the ones it has
+not seen yet; live subscribers can receive such a late event below their offset.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from models.outbox_events import OutboxEvent
+
+TOPICS = ("order", "stock")
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+OUTBOX_RETENTION = int(os.getenv("OUTBOX_RETENTION", str(7 * 24 * 3600)))
+OUTBOX_SETTLE_SECONDS = float(os.getenv("OUTBOX_SETTLE_SECONDS", "5"))
+# events each worker keeps in memory so reconnecting subscribers resume without a query
+OUTBOX_BUFFER = int(os.getenv("OUTBOX_BUFFER", "10000"))
+OUTBOX_PAGE_SIZE = 1000
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def record(db: Session, topic: str, event_type: str, aggregate_id: int, payload: dict):
+    """Queues an event; it is inserted by the session's next commit."""
+    db.info.setdefault("outbox", []).append({
+        "topic": topic,
+        "event_type": event_type,
+        "aggregate_id": aggregate_id,
+        "payload": json.dumps(payload, separators=(",", ":")),
+    })
+
+
+def order_payload(order, items: Iterable) -> dict:
+    return {
+        "order_id": order.order_id,
+        "customer_id": order.customer_id,
+        "order_date": order.order_date.isoformat() if order.order_date else None,
+        "total_amount": order.total_amount,
+        "items": [{"product_id": item.product_id, "quantity": item.quantity,
+                   "price_at_purchase": item.price_at_purchase} for item in items],
+    }
+
+
+def record_stock(db: Session, stock_levels: Dict[int, int]):
+    for product_id, stock_quantity in stock_levels.items():
+        record(db, "stock", "stock.updated", product_id,
+               {"product_id": product_id, "stock_quantity": stock_quantity})
+
+
+@event.listens_for(Session, "before_commit")
+def _insert_outbox(session):
+    rows = session.info.pop("outbox", None)
+    if rows:
+        session.execute(insert(OutboxEvent), rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_outbox(session):
+    session.info.pop("outbox", None)
+
+
+class StreamEvent(NamedTuple):
+    event_id: int
+    topic: str
+    event_type: str
+    aggregate_id: int
+    payload: str
+    created_at: datetime
+
+    def to_json(self) -> str:
+        # payload is stored as JSON already; splice it in instead of parsing it again
+        head = json.dumps({"offset": self.event_id, "topic": self.topic, "type": self.event_type,
+                           "id": self.aggregate_id, "created_at": self.created_at.isoformat()},
+                          separators=(",", ":"))
+        return f'{head[:-1]},"data":{self.payload}}}'
+
+
+EVENT_COLUMNS = (OutboxEvent.event_id, OutboxEvent.topic, OutboxEvent.event_type, OutboxEvent.aggregate_id,
+                 OutboxEvent.payload, OutboxEvent.created_at)
+
+
+def read_events(db: Session, after: int, limit: int = OUTBOX_PAGE_SIZE,
+                topics: Optional[Set[str]] = None) -> List[StreamEvent]:
+    query = select(*EVENT_COLUMNS).where(OutboxEvent.event_id > after)
+    if topics:
+        query = query.where(OutboxEvent.topic.in_(topics))
+    return [StreamEvent(*row) for row in db.execute(query.order_by(OutboxEvent.event_id).limit(limit))]
+
+
+class Subscription:
+    def __init__(self, topics: Optional[Set[str]], loop: asyncio.AbstractEventLoop):
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # set when the subscriber fell too far behind; it reconnects with its last offset
+        self.overflowed = False
+
+    def _deliver(self, events: List[StreamEvent]):
+        for stream_event in events:
+            if self.topics and stream_event.topic not in self.topics:
+                continue
+            try:
+                self.queue.put_nowait(stream_event)
+            except asyncio.QueueFull:
+                self.overflowed = True
+                return
+
+
+class EventBroker:
+    """Fans relayed events out to the asyncio subscribers of this worker."""
+
+    def __init__(self, buffer_size: int = OUTBOX_BUFFER):
+        self._lock = threading.Lock()
+        self._recent: deque = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+        self.last_offset = 0
+        self.published = 0
+
+    def subscribe(self, topics: Optional[Set[str]], loop: asyncio.AbstractEventLoop) -> Subscription:
+        subscription = Subscription(topics, loop)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, events: List[StreamEvent]):
+        if not events:
+            return
+        with self._lock:
+            self._recent.extend(events)
+            # late events sit below it
+            self.last_offset = max(self.last_offset, events[-1].event_id)
+            self.published += len(events)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription._deliver, events)
+
+    def recent_after(self, offset: int, topics: Optional[Set[str]] = None) -> Optional[List[StreamEvent]]:
+        """Buffered events after offset, or None when the buffer no longer reaches back that far."""
+        with self._lock:
+            if offset >= self.last_offset:
+                return []
+            if not self._recent or self._recent[0].event_id > offset + 1:
+                return None
+            events = [stream_event for stream_event in self._recent if stream_event.event_id > offset]
+        return [stream_event for stream_event in events if not topics or stream_event.topic in topics]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "last_offset": self.last_offset,
+                    "published": self.published, "buffered": len(self._recent)}
+
+
+class OutboxRelay:
+    """Tails outbox_events from a background thread and publishes new rows to broker."""
+
+    def __init__(self, broker: EventBroker, interval: float = OUTBOX_POLL_INTERVAL,
+                 retention: int = OUTBOX_RETENTION, settle: float = OUTBOX_SETTLE_SECONDS):
+        self.broker = broker
+        self.interval = interval
+        self.retention = retention
+        self.settle = settle
+        self._last_id: Optional[int] = None
+        # event_id -> created_at of relayed events still inside the settle window
+        self._seen: Dict[int, datetime] = {}
+        self._last_purge = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        from config.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            # subscribers replay older offsets from the table itself
+            self._last_id = db.execute(select(func.max(OutboxEvent.event_id))).scalar() or 0
+            horizon = datetime.utcnow() - timedelta(seconds=self.settle)
+            self._seen = dict(db.execute(select(OutboxEvent.event_id, OutboxEvent.created_at)
+                                         .where(OutboxEvent.created_at >= horizon)).all())
+        finally:
+            db.close()
+        self.broker.last_offset = self._last_id
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.interval * 2)
+        self._thread = None
+
+    def relay(self):
+        from config.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            horizon = datetime.utcnow() - timedelta(seconds=self.settle)
+            # events that committed after a higher id was relayed
+            late = [StreamEvent(*row) for row in db.execute(
+                select(*EVENT_COLUMNS)
+                .where(OutboxEvent.event_id <= self._last_id, OutboxEvent.created_at >= horizon)
+                .order_by(OutboxEvent.event_id)
+            ) if row.event_id not in self._seen]
+            self._publish(late)
+            while True:
+                events = read_events(db, self._last_id)
+                if not events:
+                    break
+                self._last_id = events[-1].event_id
+                self._publish(events)
+                if len(events) < OUTBOX_PAGE_SIZE:
+                    break
+            self._seen = {event_id: created_at for event_id, created_at in self._seen.items()
+                          if created_at >= horizon}
+            if time.monotonic() - self._last_purge > 3600:
+                self._last_purge = time.monotonic()
+                cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+                db.execute(delete(OutboxEvent).where(OutboxEvent.created_at < cutoff))
+                db.commit()
+        finally:
+            db.close()
+
+    def _publish(self, events: List[StreamEvent]):
+        self._seen.update((stream_event.event_id, stream_event.created_at) for stream_event in events)
+        self.broker.publish(events)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.relay()
+            except Exception as e:
+                print(f"Outbox relay failed: {e}")
+
+
+outbox_broker = EventBroker()
+outbox_relay = OutboxRelay(outbox_broker)
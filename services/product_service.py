@@ -1,7 +1,16 @@
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from models.products import Product
+from models.tombstones import write_tombstones
 from schemas.products import ProductRequest, ProductUpdateRequest
+from services.catalog_snapshot import catalog_snapshot
+from services.invalidation import invalidation_bus
+from services.loader import get_loader
+from services.outbox import record, record_stock
+from services.search_index import ProductDoc, product_index
 
 
 class ProductService:
@@ -16,35 +25,69 @@ class ProductService:
             stock_quantity=product.stock_quantity
         )
         self.db.add(new_product)
+        self.db.flush()
+        invalidation_bus.publish(self.db, "product", [new_product.product_id])
+        record_stock(self.db, {new_product.product_id: new_product.stock_quantity})
         self.db.commit()
         self.db.refresh(new_product)
+        product_index.upsert(new_product)
+        catalog_snapshot.products_changed([new_product.product_id])
         return new_product
 
     def get_product(self, product_id: int):
-        product = self.db.query(Product).filter(Product.product_id == product_id).first()
-        if product is None:
+        products = self.get_products([product_id])
+        if not products:
             raise ValueError("Product not found")
-        return product
+        return products[0]
+
+    def get_products(self, product_ids: List[int]) -> List[Product]:
+        # the snapshot may trail product writes and checkouts by CATALOG_SNAPSHOT_REFRESH
+        # seconds; products it does not have yet, such as new ones, come from the database
+        snapshot = catalog_snapshot.current()
+        found = {} if snapshot is None else {record.product_id: record
+                                             for record in snapshot.get_many(product_ids)}
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        if missing:
+            found.update(get_loader(self.db, Product).load_many(missing))
+        return [found[product_id] for product_id in product_ids if product_id in found]
 
     def update_product(self, product_id: int, product_data: ProductUpdateRequest):
-        product = self.db.query(Product).filter(Product.product_id == product_id).first()
+        product = get_loader(self.db, Product).load(product_id)
         if product is None:
             raise ValueError("Product not found")
 
-        for key, value in product_data.dict(exclude_unset=True).items():
+        changes = product_data.dict(exclude_unset=True)
+        for key, value in changes.items():
             setattr(product, key, value)
 
+        if "stock_quantity" in changes:
+            record_stock(self.db, {product_id: product.stock_quantity})
+        invalidation_bus.publish(self.db, "product", [product_id])
         self.db.commit()
         self.db.refresh(product)
+        product_index.upsert(product)
+        catalog_snapshot.products_changed([product_id])
         return product
 
     def delete_product(self, product_id: int):
-        product = self.db.query(Product).filter(Product.product_id == product_id).first()
-        if product is None:
+        """Retires a product; its order items keep pointing at it."""
+        retired = self.db.execute(
+            update(Product).where(Product.product_id == product_id).values(deleted_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not retired:
             raise ValueError("Product not found")
-
-        self.db.delete(product)
+        write_tombstones(self.db, "product", [product_id])
+        record(self.db, "stock", "stock.deleted", product_id, {"product_id": product_id})
+        invalidation_bus.publish(self.db, "product", [product_id])
         self.db.commit()
+        product_index.remove(product_id)
+        catalog_snapshot.products_changed([product_id])
 
     def get_all_products(self):
         return self.db.query(Product).all()
+
+    def search_products(self, q: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                        in_stock: Optional[bool], sort: str, limit: int, offset: int) -> List[ProductDoc]:
+        product_index.ensure_built(self.db)
+        return product_index.search(q, min_price, max_price, in_stock, sort, limit, offset)
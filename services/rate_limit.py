@@ -0,0 +1,205 @@
+"""Throttling for the password endpoints.
+
+bcrypt is slow on purpose, so a credential-stuffing burst against /auth/login or
+/auth/register can pin every core and starve checkouts. Before any database
+query or hashing, those handlers:
+
+  1. take a token from the client IP's bucket and one from the email's bucket
+     (AUTH_RATE_PER_IP / AUTH_RATE_PER_EMAIL attempts a minute, bursting to
+     AUTH_BURST_PER_IP / AUTH_BURST_PER_EMAIL), then
+  2. claim one of AUTH_HASH_CONCURRENCY bcrypt slots in this worker, waiting at
+     most AUTH_HASH_WAIT seconds for one.
+
+Either failure is answered straight away with 429 and Retry-After.
+
+Bucket backends (AUTH_LIMIT_BACKEND):
+    memory  per worker, at most AUTH_LIMIT_MAX_KEYS buckets, least recently used
+            evicted first (default)
+    file    an SQLite file at AUTH_LIMIT_PATH shared by every worker on the host
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+AUTH_LIMIT_BACKEND = os.getenv("AUTH_LIMIT_BACKEND", "memory").strip().lower() or "memory"
+AUTH_LIMIT_PATH = os.getenv("AUTH_LIMIT_PATH") or "/tmp/flowershop-auth-limits.db"
+AUTH_LIMIT_MAX_KEYS = int(os.getenv("AUTH_LIMIT_MAX_KEYS", "100000"))
+AUTH_RATE_PER_IP = float(os.getenv("AUTH_RATE_PER_IP", "30"))
+AUTH_BURST_PER_IP = float(os.getenv("AUTH_BURST_PER_IP", "20"))
+AUTH_RATE_PER_EMAIL = float(os.getenv("AUTH_RATE_PER_EMAIL", "5"))
+AUTH_BURST_PER_EMAIL = float(os.getenv("AUTH_BURST_PER_EMAIL", "10"))
+AUTH_HASH_CONCURRENCY = int(os.getenv("AUTH_HASH_CONCURRENCY") or os.cpu_count() or 1)
+AUTH_HASH_WAIT = float(os.getenv("AUTH_HASH_WAIT", "0.1"))
+# only behind a proxy that sets X-Forwarded-For; otherwise clients could pick their own key
+AUTH_LIMIT_TRUST_PROXY = os.getenv("AUTH_LIMIT_TRUST_PROXY", "0") == "1"
+
+
+def _take(tokens: float, updated: float, rate: float, burst: float, now: float) -> Tuple[float, float]:
+    """Refills a bucket up to now and spends one token. Returns the tokens left and
+    0, or, if the bucket was empty, the tokens and the seconds until one is due."""
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Buckets in this worker only. A bucket evicted for space starts full again,
+    which is what it would have refilled to anyway once idle long enough."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = AUTH_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens, wait = _take(tokens, updated, rate, burst, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class FileBuckets:
+    """Buckets in one SQLite file, so every worker on a host spends from the same
+    counters. Each take is a short BEGIN IMMEDIATE transaction; rows beyond
+    max_keys, least recently used first, are pruned every 1000 takes."""
+
+    name = "file"
+
+    def __init__(self, path: str = AUTH_LIMIT_PATH, max_keys: int = AUTH_LIMIT_MAX_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._takes = 0
+        self._connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS buckets "
+                                 "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS ix_buckets_updated ON buckets (updated)")
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # wall clock, since the monotonic clock is not shared between processes
+                now = time.time()
+                row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row is not None else (burst, now)
+                tokens, wait = _take(tokens, updated, rate, burst, now)
+                connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                                   (key, tokens, now))
+                self._takes += 1
+                if self._takes % 1000 == 0:
+                    connection.execute("DELETE FROM buckets WHERE key IN "
+                                       "(SELECT key FROM buckets ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                                       (self.max_keys,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+def create_backend(name: str = AUTH_LIMIT_BACKEND):
+    if name == "memory":
+        return MemoryBuckets()
+    if name == "file":
+        return FileBuckets()
+    raise ValueError(f"AUTH_LIMIT_BACKEND must be memory or file, not {name!r}")
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(status_code=429, detail="Too many attempts, try again later",
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+def client_ip(request: Request) -> str:
+    if AUTH_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # the last hop is the one our proxy appended; earlier ones are client supplied
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class AuthLimiter:
+    def __init__(self, backend, hash_concurrency: int = AUTH_HASH_CONCURRENCY, hash_wait: float = AUTH_HASH_WAIT):
+        self.backend = backend
+        self.hash_concurrency = hash_concurrency
+        self.hash_wait = hash_wait
+        self._slots = threading.BoundedSemaphore(hash_concurrency)
+        self._lock = threading.Lock()
+        self.hashing_now = 0
+        self.rejected_ip = 0
+        self.rejected_email = 0
+        self.rejected_busy = 0
+
+    def check(self, ip: str, email: Optional[str] = None):
+        """Spends one attempt from the IP's bucket, then from the email's; raises 429
+        for the first one that is empty."""
+        wait = self.backend.take(f"ip:{ip}", AUTH_RATE_PER_IP / 60, AUTH_BURST_PER_IP)
+        if wait:
+            with self._lock:
+                self.rejected_ip += 1
+            raise too_many_requests(wait)
+        if email:
+            wait = self.backend.take(f"email:{email.strip().lower()}", AUTH_RATE_PER_EMAIL / 60,
+                                     AUTH_BURST_PER_EMAIL)
+            if wait:
+                with self._lock:
+                    self.rejected_email += 1
+                raise too_many_requests(wait)
+
+    @contextmanager
+    def hashing(self):
+        """Holds one bcrypt slot for the block; raises 429 if none frees up within hash_wait."""
+        if not self._slots.acquire(timeout=self.hash_wait):
+            with self._lock:
+                self.rejected_busy += 1
+            raise too_many_requests(1)
+        with self._lock:
+            self.hashing_now += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.hashing_now -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "buckets": len(self.backend),
+                "hash_concurrency": self.hash_concurrency,
+                "hashing": self.hashing_now,
+                "rejected_ip": self.rejected_ip,
+                "rejected_email": self.rejected_email,
+                "rejected_busy": self.rejected_busy,
+            }
+
+
+auth_limiter = AuthLimiter(create_backend())
@@ -1,68 +1,92 @@
 from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from config.dialect import as_date, day_bucket, day_range, in_range, month_bucket, month_range, year_bucket, year_range
 from models.orders import Order
 from schemas.revenues import DailyRevenueResponse, MonthlyRevenueResponse, YearlyRevenueResponse
+from services.invalidation import invalidation_bus
+from services.order_archive import order_archive
+from services.single_flight import single_flight
 from datetime import date
 
 class RevenueService:
     def __init__(self, db: Session):
         self.db = db
+        self.dialect_name = db.get_bind().dialect.name
 
+    # dashboards refresh together; identical aggregates in flight run once, and a
+    # call made after an order write starts its own
+    @single_flight(version=lambda: invalidation_bus.version("order"))
     def get_daily_revenue(self, date: Optional[date]) -> DailyRevenueResponse:
+        day = day_bucket(Order.order_date, self.dialect_name)
         query = self.db.query(
-            func.date(Order.order_date).label('date'),
+            day.label('date'),
             func.sum(Order.total_amount).label('total_revenue')
         )
 
         if date:
-            query = query.filter(func.date(Order.order_date) == date)
+            query = query.filter(in_range(Order.order_date, day_range(date)))
 
-        result = query.group_by(
-            func.date(Order.order_date)
-        ).first()
+        totals = {as_date(row.date): row.total_revenue for row in query.group_by(day).all()}
+        _merge_archived(totals, order_archive.daily_totals(), lambda key: not date or key == date)
 
-        if result is None:
+        if not totals:
             return DailyRevenueResponse(date=date, total_revenue=0.0)
 
-        return DailyRevenueResponse(date=result.date, total_revenue=result.total_revenue)
+        first = min(totals)
+        return DailyRevenueResponse(date=first, total_revenue=totals[first])
 
+    @single_flight(version=lambda: invalidation_bus.version("order"))
     def get_monthly_revenue(self, year: Optional[int], month: Optional[int]) -> MonthlyRevenueResponse:
+        year_part = year_bucket(Order.order_date)
+        month_part = month_bucket(Order.order_date)
         query = self.db.query(
-            func.extract('year', Order.order_date).label('year'),
-            func.extract('month', Order.order_date).label('month'),
+            year_part.label('year'),
+            month_part.label('month'),
             func.sum(Order.total_amount).label('total_revenue')
         )
 
-        if year:
-            query = query.filter(func.extract('year', Order.order_date) == year)
-        if month:
-            query = query.filter(func.extract('month', Order.order_date) == month)
+        if year and month:
+            query = query.filter(in_range(Order.order_date, month_range(year, month)))
+        elif year:
+            query = query.filter(in_range(Order.order_date, year_range(year)))
+        elif month:
+            query = query.filter(month_part == month)
 
-        result = query.group_by(
-            func.extract('year', Order.order_date),
-            func.extract('month', Order.order_date)
-        ).first()
+        totals = {(int(row.year), int(row.month)): row.total_revenue
+                  for row in query.group_by(year_part, month_part).all()}
+        _merge_archived(totals, order_archive.monthly_totals(),
+                        lambda key: (not year or key[0] == year) and (not month or key[1] == month))
 
-        if result is None:
+        if not totals:
             return MonthlyRevenueResponse(year=year or 0, month=month or 0, total_revenue=0.0)
 
-        return MonthlyRevenueResponse(year=int(result.year), month=int(result.month), total_revenue=result.total_revenue)
+        first = min(totals)
+        return MonthlyRevenueResponse(year=first[0], month=first[1], total_revenue=totals[first])
 
+    @single_flight(version=lambda: invalidation_bus.version("order"))
     def get_yearly_revenue(self, year: Optional[int]) -> YearlyRevenueResponse:
+        year_part = year_bucket(Order.order_date)
         query = self.db.query(
-            func.extract('year', Order.order_date).label('year'),
+            year_part.label('year'),
             func.sum(Order.total_amount).label('total_revenue')
         )
 
         if year:
-            query = query.filter(func.extract('year', Order.order_date) == year)
+            query = query.filter(in_range(Order.order_date, year_range(year)))
 
-        result = query.group_by(
-            func.extract('year', Order.order_date)
-        ).first()
+        totals = {int(row.year): row.total_revenue for row in query.group_by(year_part).all()}
+        _merge_archived(totals, order_archive.yearly_totals(), lambda key: not year or key == year)
 
-        if result is None:
+        if not totals:
             return YearlyRevenueResponse(year=year or 0, total_revenue=0.0)
 
-        return YearlyRevenueResponse(year=int(result.year), total_revenue=result.total_revenue)
+        first = min(totals)
+        return YearlyRevenueResponse(year=first, total_revenue=totals[first])
+
+
+def _merge_archived(totals: dict, archived: dict, wanted):
+    """Adds archived partition totals (services/order_archive.py) into live totals."""
+    for key, total in archived.items():
+        if wanted(key):
+            totals[key] = totals.get(key, 0.0) + total
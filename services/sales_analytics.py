@@ -0,0 +1,321 @@
+"""Columnar sales analytics for the /revenue/analytics/* reports.
+
+SalesAnalytics keeps orders and order items in memory as NumPy column arrays and
+answers top-N and group-by reports with vectorized operations (bincount over
+the dense integer ids, argpartition for top N) rather than per-row ORM loops.
+
+The arrays are refreshed incrementally. Rows whose updated_at is past the last
+watermark are upserted by id, and ids with a tombstone are dropped, so a refresh
+reads only what changed; customers' loyalty tiers are kept the same way. The whole snapshot is rebuilt every
+ANALYTICS_REBUILD_INTERVAL seconds. Orders that services/order_archive.py
+deletes leave no tombstone, so they drop out at the next rebuild.
+
+    python -m benchmarks.analytics --items 10000000
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models.customer_loyalty import CustomerLoyalty
+from models.customers import Customer
+from models.order_items import OrderItem
+from models.orders import Order
+from models.products import Product
+from models.tombstones import Tombstone
+from services.change_feed import CHANGE_FEED_SETTLE_SECONDS
+
+# reports may lag writes by this much; a refresh runs at most this often
+ANALYTICS_MAX_AGE = float(os.getenv("ANALYTICS_MAX_AGE", "30"))
+ANALYTICS_REBUILD_INTERVAL = float(os.getenv("ANALYTICS_REBUILD_INTERVAL", "3600"))
+LOAD_CHUNK = 100_000
+# the last basket-size bucket counts baskets of this many units or more
+MAX_BASKET_SIZE = 20
+
+ORDER_COLUMNS = (("order_id", np.int64), ("customer_id", np.int64), ("order_date", "datetime64[us]"),
+                 ("total_amount", np.float64))
+ITEM_COLUMNS = (("order_item_id", np.int64), ("order_id", np.int64), ("product_id", np.int64),
+                ("quantity", np.int64), ("price_at_purchase", np.float64))
+CHANGED_AT = (("updated_at", "datetime64[us]"),)
+CUSTOMER_COLUMNS = (("customer_id", np.int64), ("loyalty_id", np.int64))
+CUSTOMER_LOYALTY = select(Customer.customer_id, func.coalesce(Customer.loyalty_id, 0))
+
+Columns = Dict[str, np.ndarray]
+
+
+def _load(db: Session, query, columns) -> Columns:
+    """Streams a select into one array per column, LOAD_CHUNK rows at a time."""
+    chunks: Dict[str, list] = {name: [] for name, _ in columns}
+    for partition in db.execute(query.execution_options(yield_per=LOAD_CHUNK)).partitions():
+        for (name, dtype), values in zip(columns, zip(*partition)):
+            chunks[name].append(np.array(values, dtype=dtype))
+    return {name: np.concatenate(chunks[name]) if chunks[name] else np.empty(0, dtype=dtype)
+            for name, dtype in columns}
+
+
+def _sorted(columns: Columns, key: str) -> Columns:
+    """columns ordered by key. Changed rows are sorted here rather than in SQL, where
+    ORDER BY id would make sqlite walk the table instead of the updated_at index."""
+    order = np.argsort(columns[key], kind="stable")
+    return {name: values[order] for name, values in columns.items()}
+
+
+def _positions(ids: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Insertion points of keys in the sorted ids, and which keys are present."""
+    position = np.searchsorted(ids, keys)
+    present = np.zeros(len(keys), dtype=bool)
+    inside = position < len(ids)
+    present[inside] = ids[position[inside]] == keys[inside]
+    return position, present
+
+
+def _upsert(columns: Columns, key: str, changed: Columns, removed: np.ndarray) -> Columns:
+    """Applies changed rows (sorted by key) and then removed keys to columns sorted by
+    key, by position rather than by re-sorting; the input arrays are not modified."""
+    position, present = _positions(columns[key], changed[key])
+    if present.any():
+        columns = {name: values.copy() for name, values in columns.items()}
+        for name, values in columns.items():
+            values[position[present]] = changed[name][present]
+    if not present.all():
+        added = ~present
+        columns = {name: np.insert(values, position[added], changed[name][added]) for name, values in columns.items()}
+    if len(removed):
+        position, present = _positions(columns[key], np.unique(removed))
+        if present.any():
+            columns = {name: np.delete(values, position[present]) for name, values in columns.items()}
+    return columns
+
+
+def _with_loyalty(loyalty: np.ndarray, customers: Columns) -> np.ndarray:
+    """A copy of loyalty with the customers' loyalty ids written in, grown to fit them."""
+    ids = customers["customer_id"]
+    if not len(ids):
+        return loyalty
+    size = max(len(loyalty), int(ids.max()) + 1)
+    loyalty = np.concatenate([loyalty, np.zeros(size - len(loyalty), dtype=np.int64)])
+    loyalty[ids] = customers["loyalty_id"]
+    return loyalty
+
+
+def _with_order_dates(items: Columns, orders: Columns) -> Columns:
+    """Adds each item's order_date; items whose order is not loaded are left out."""
+    index = np.searchsorted(orders["order_id"], items["order_id"])
+    index[index == len(orders["order_id"])] = 0
+    found = orders["order_id"][index] == items["order_id"] if len(orders["order_id"]) else \
+        np.zeros(len(items["order_id"]), dtype=bool)
+    items = {name: values[found] for name, values in items.items()}
+    items["order_date"] = orders["order_date"][index[found]]
+    return items
+
+
+def _window(dates: np.ndarray, start: Optional[date], end: Optional[date]) -> Optional[np.ndarray]:
+    """Mask for start <= date < end + 1 day, or None when both are open."""
+    mask = None
+    if start:
+        mask = dates >= np.datetime64(start, "us")
+    if end:
+        before = dates < np.datetime64(end + timedelta(days=1), "us")
+        mask = before if mask is None else mask & before
+    return mask
+
+
+def _select(columns: Columns, mask: Optional[np.ndarray], *names: str) -> Tuple[np.ndarray, ...]:
+    return tuple(columns[name] if mask is None else columns[name][mask] for name in names)
+
+
+class SalesSnapshot:
+    """One immutable generation of the column arrays, each table sorted by its id;
+    refreshes build a new one."""
+
+    def __init__(self, orders: Columns, items: Columns, loyalty: np.ndarray, tiers: Dict[int, str]):
+        self.orders = orders
+        self.items = items
+        # loyalty[customer_id] is the customer's loyalty_id, 0 for none
+        self.loyalty = loyalty
+        self.tiers = tiers
+
+    def top_products(self, limit: int, start: Optional[date] = None, end: Optional[date] = None,
+                     by: str = "revenue") -> List[dict]:
+        product_ids, quantities, prices = _select(self.items, _window(self.items["order_date"], start, end),
+                                                  "product_id", "quantity", "price_at_purchase")
+        if not len(product_ids):
+            return []
+        revenue = np.bincount(product_ids, weights=quantities * prices)
+        units = np.bincount(product_ids, weights=quantities)
+        lines = np.bincount(product_ids)
+        score = revenue if by == "revenue" else units
+        sold = np.flatnonzero(lines)
+        if len(sold) > limit:
+            sold = sold[np.argpartition(-score[sold], limit - 1)[:limit]]
+        sold = sold[np.lexsort((sold, -score[sold]))]
+        return [{"product_id": int(product_id), "revenue": float(revenue[product_id]),
+                 "units": int(units[product_id]), "order_lines": int(lines[product_id])}
+                for product_id in sold]
+
+    def basket_sizes(self, start: Optional[date] = None, end: Optional[date] = None,
+                     max_size: int = MAX_BASKET_SIZE) -> dict:
+        order_ids, = _select(self.orders, _window(self.orders["order_date"], start, end), "order_id")
+        item_order_ids, quantities = _select(self.items, _window(self.items["order_date"], start, end),
+                                             "order_id", "quantity")
+        if not len(order_ids):
+            return {"orders": 0, "mean_units": 0.0, "median_units": 0.0, "p90_units": 0.0,
+                    "mean_lines": 0.0, "distribution": []}
+        size = int(order_ids.max()) + 1
+        units = np.bincount(item_order_ids, weights=quantities, minlength=size)[order_ids].astype(np.int64)
+        lines = np.bincount(item_order_ids, minlength=size)[order_ids]
+        counts = np.bincount(np.minimum(units, max_size), minlength=max_size + 1)
+        return {
+            "orders": len(order_ids),
+            "mean_units": float(units.mean()),
+            "median_units": float(np.median(units)),
+            "p90_units": float(np.percentile(units, 90)),
+            "mean_lines": float(lines.mean()),
+            "distribution": [{"units": basket, "orders": int(count)} for basket, count in enumerate(counts) if count],
+        }
+
+    def revenue_by_tier(self, start: Optional[date] = None, end: Optional[date] = None) -> List[dict]:
+        customer_ids, totals = _select(self.orders, _window(self.orders["order_date"], start, end),
+                                       "customer_id", "total_amount")
+        if not len(customer_ids):
+            return []
+        loyalty = self.loyalty
+        if int(customer_ids.max()) >= len(loyalty):
+            loyalty = np.concatenate([loyalty, np.zeros(int(customer_ids.max()) + 1 - len(loyalty), np.int64)])
+        tier = loyalty[customer_ids]
+        revenue = np.bincount(tier, weights=totals)
+        orders = np.bincount(tier)
+        ordered = np.flatnonzero(np.bincount(customer_ids))
+        customers = np.bincount(loyalty[ordered], minlength=len(orders))
+        result = [{"loyalty_id": int(loyalty_id) or None, "status": self.tiers.get(int(loyalty_id)),
+                   "orders": int(orders[loyalty_id]), "customers": int(customers[loyalty_id]),
+                   "revenue": float(revenue[loyalty_id]),
+                   "average_order_value": float(revenue[loyalty_id] / orders[loyalty_id])}
+                  for loyalty_id in np.flatnonzero(orders)]
+        return sorted(result, key=lambda row: -row["revenue"])
+
+
+class SalesAnalytics:
+    """Holds the current SalesSnapshot and refreshes it when older than max_age."""
+
+    def __init__(self, max_age: float = ANALYTICS_MAX_AGE, rebuild_interval: float = ANALYTICS_REBUILD_INTERVAL):
+        self.max_age = max_age
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SalesSnapshot] = None
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        # largest updated_at / deleted_at seen so far
+        self._changed_at: Optional[datetime] = None
+        self._customers_changed_at: Optional[datetime] = None
+        self._deleted_at: Optional[datetime] = None
+
+    def snapshot(self, db: Session) -> SalesSnapshot:
+        if self._snapshot is not None and time.monotonic() - self._refreshed_at < self.max_age:
+            return self._snapshot
+        with self._lock:
+            # another request may have refreshed while this one waited
+            now = time.monotonic()
+            if self._snapshot is None or now - self._refreshed_at >= self.max_age:
+                if self._snapshot is None or now - self._rebuilt_at >= self.rebuild_interval:
+                    self._snapshot = self._rebuild(db)
+                    self._rebuilt_at = now
+                else:
+                    self._snapshot = self._refresh(db, self._snapshot)
+                self._refreshed_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def _rebuild(self, db: Session) -> SalesSnapshot:
+        # watermarks first: anything written while the arrays load is re-read by the next refresh
+        self._changed_at, item_changed_at, self._customers_changed_at, self._deleted_at = db.execute(select(
+            select(func.max(Order.updated_at)).scalar_subquery(),
+            select(func.max(OrderItem.updated_at)).scalar_subquery(),
+            select(func.max(Customer.updated_at)).scalar_subquery(),
+            select(func.max(Tombstone.deleted_at)).scalar_subquery(),
+        )).one()
+        if item_changed_at and (self._changed_at is None or item_changed_at > self._changed_at):
+            self._changed_at = item_changed_at
+        orders = _load(db, select(*(getattr(Order, name) for name, _ in ORDER_COLUMNS))
+                       .order_by(Order.order_id), ORDER_COLUMNS)
+        items = _with_order_dates(_load(db, select(*(getattr(OrderItem, name) for name, _ in ITEM_COLUMNS))
+                                        .order_by(OrderItem.order_item_id), ITEM_COLUMNS), orders)
+        tiers = dict(db.execute(select(CustomerLoyalty.loyalty_id, CustomerLoyalty.status)).all())
+        # only customers who ordered count towards a tier; the rest arrive with
+        # their first order, which moves their updated_at
+        ordered = select(Order.customer_id).distinct().subquery()
+        customers = _load(db, CUSTOMER_LOYALTY.join_from(ordered, Customer,
+                                                         Customer.customer_id == ordered.c.customer_id),
+                          CUSTOMER_COLUMNS)
+        return SalesSnapshot(orders, items, _with_loyalty(np.zeros(1, dtype=np.int64), customers), tiers)
+
+    def _refresh(self, db: Session, snapshot: SalesSnapshot) -> SalesSnapshot:
+        # re-read a settle window behind the watermarks: transactions that started
+        # earlier can still commit rows stamped before them
+        settle = timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+        since = self._changed_at - settle if self._changed_at else datetime.min
+        changed_orders = _load(db, select(*(getattr(Order, name) for name, _ in ORDER_COLUMNS), Order.updated_at)
+                               .where(Order.updated_at > since), ORDER_COLUMNS + CHANGED_AT)
+        changed_items = _load(db, select(*(getattr(OrderItem, name) for name, _ in ITEM_COLUMNS),
+                                         OrderItem.updated_at)
+                              .where(OrderItem.updated_at > since), ITEM_COLUMNS + CHANGED_AT)
+        for changed in (changed_orders, changed_items):
+            changed_at = changed.pop("updated_at")
+            if len(changed_at):
+                latest = changed_at.max().astype(datetime)
+                self._changed_at = max(self._changed_at or latest, latest)
+        changed_orders = _sorted(changed_orders, "order_id")
+        changed_items = _sorted(changed_items, "order_item_id")
+
+        customers_since = self._customers_changed_at - settle if self._customers_changed_at else datetime.min
+        changed_customers = _load(db, CUSTOMER_LOYALTY.add_columns(Customer.updated_at)
+                                  .where(Customer.updated_at > customers_since), CUSTOMER_COLUMNS + CHANGED_AT)
+        changed_at = changed_customers.pop("updated_at")
+        if len(changed_at):
+            latest = changed_at.max().astype(datetime)
+            self._customers_changed_at = max(self._customers_changed_at or latest, latest)
+
+        deleted_since = self._deleted_at - settle if self._deleted_at else datetime.min
+        deleted = {"order": [], "order_item": []}
+        for row in db.execute(select(Tombstone.entity, Tombstone.entity_id, Tombstone.deleted_at)
+                              .where(Tombstone.deleted_at > deleted_since, Tombstone.entity.in_(tuple(deleted)))):
+            deleted[row.entity].append(row.entity_id)
+            self._deleted_at = max(self._deleted_at or row.deleted_at, row.deleted_at)
+
+        orders = _upsert(snapshot.orders, "order_id", changed_orders, np.array(deleted["order"], dtype=np.int64))
+        items = _upsert(snapshot.items, "order_item_id", _with_order_dates(changed_items, orders),
+                        np.array(deleted["order_item"], dtype=np.int64))
+        return SalesSnapshot(orders, items, _with_loyalty(snapshot.loyalty, changed_customers), snapshot.tiers)
+
+
+sales_analytics = SalesAnalytics()
+
+
+class AnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_top_products(self, limit: int, start: Optional[date], end: Optional[date], by: str) -> List[dict]:
+        top = sales_analytics.snapshot(self.db).top_products(limit, start, end, by)
+        if top:
+            # retired products still appear in sales history
+            names = dict(self.db.execute(select(Product.product_id, Product.name)
+                                         .where(Product.product_id.in_([row["product_id"] for row in top]))
+                                         .execution_options(include_deleted=True)).all())
+            for row in top:
+                row["name"] = names.get(row["product_id"])
+        return top
+
+    def get_basket_sizes(self, start: Optional[date], end: Optional[date]) -> dict:
+        return sales_analytics.snapshot(self.db).basket_sizes(start, end)
+
+    def get_revenue_by_tier(self, start: Optional[date], end: Optional[date]) -> List[dict]:
+        return sales_analytics.snapshot(self.db).revenue_by_tier(start, end)
@@ -0,0 +1,233 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from models.products import Product
+from services.invalidation import InvalidationEvent, invalidation_bus
+
+SORTS = ("relevance", "price_asc", "price_desc", "name")
+
+PRODUCTS_BY_ID = select(Product).where(Product.product_id.in_(bindparam("product_ids", expanding=True)))
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased, accent-stripped word tokens, so 'Hoa hồng' matches 'hoa hong'."""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).replace("đ", "d")
+    return _TOKEN.findall(stripped)
+
+
+class ProductDoc(NamedTuple):
+    product_id: int
+    name: str
+    description: Optional[str]
+    price: float
+    stock_quantity: int
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+class ProductSearchIndex:
+    """In-process inverted index over product name and description.
+
+    Terms live in a sorted vocabulary so a query token matches every term it
+    prefixes via bisect, and (price, product_id) pairs are kept sorted for range
+    filters. Built once at startup and updated incrementally after product writes
+    commit; search never touches the database.
+    """
+
+    NAME_WEIGHT = 3
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[int, ProductDoc] = {}
+        self._doc_terms: Dict[int, Dict[str, int]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._vocabulary: List[str] = []
+        self._prices: List[tuple] = []
+        self.built = False
+
+    def build(self, products: Iterable):
+        with self._lock:
+            self._docs.clear()
+            self._doc_terms.clear()
+            self._postings.clear()
+            self._vocabulary = []
+            self._prices = []
+            for product in products:
+                doc = self._doc(product)
+                self._add(doc)
+                self._prices.append((doc.price, doc.product_id))
+            self._vocabulary = sorted(self._postings)
+            self._prices.sort()
+            self.built = True
+
+    def build_from_db(self, db: Session):
+        self.build(db.query(Product).all())
+
+    def ensure_built(self, db: Session):
+        if not self.built:
+            self.build_from_db(db)
+
+    def upsert(self, product):
+        doc = self._doc(product)
+        with self._lock:
+            self._remove(doc.product_id)
+            for term in self._add(doc):
+                insort(self._vocabulary, term)
+            insort(self._prices, (doc.price, doc.product_id))
+
+    def refresh(self, db: Session, product_ids: Iterable[int]):
+        """Reloads product_ids from the database, dropping the ones that are gone."""
+        product_ids = set(product_ids)
+        products = db.scalars(PRODUCTS_BY_ID, {"product_ids": list(product_ids)}).all()
+        for product in products:
+            self.upsert(product)
+        for product_id in product_ids - {product.product_id for product in products}:
+            self.remove(product_id)
+
+    def update_stock(self, product_id: int, stock_quantity: int):
+        with self._lock:
+            doc = self._docs.get(product_id)
+            if doc is not None:
+                self._docs[product_id] = doc._replace(stock_quantity=stock_quantity)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def search(self, q: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None,
+               in_stock: Optional[bool] = None, sort: str = "relevance", limit: int = 50,
+               offset: int = 0) -> List[ProductDoc]:
+        if sort not in SORTS:
+            raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+        tokens = tokenize(q)
+        with self._lock:
+            scores: Optional[Dict[int, int]] = None
+            for token in tokens:
+                matches = self._match_prefix(token)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {product_id: scores[product_id] + score
+                              for product_id, score in matches.items() if product_id in scores}
+                if not scores:
+                    return []
+
+            if min_price is not None or max_price is not None:
+                in_range = self._price_range(min_price, max_price)
+                candidates = in_range if scores is None else [pid for pid in in_range if pid in scores]
+            else:
+                candidates = list(self._docs) if scores is None else list(scores)
+
+            docs = [self._docs[product_id] for product_id in candidates]
+
+        if in_stock is True:
+            docs = [doc for doc in docs if doc.stock_quantity > 0]
+        elif in_stock is False:
+            docs = [doc for doc in docs if doc.stock_quantity <= 0]
+
+        if sort == "price_asc":
+            docs.sort(key=lambda doc: (doc.price, doc.product_id))
+        elif sort == "price_desc":
+            docs.sort(key=lambda doc: (-doc.price, doc.product_id))
+        elif sort == "name":
+            docs.sort(key=lambda doc: (doc.name.lower(), doc.product_id))
+        elif scores is not None:
+            docs.sort(key=lambda doc: (-scores[doc.product_id], doc.product_id))
+        else:
+            docs.sort(key=lambda doc: doc.product_id)
+        return docs[offset:offset + limit]
+
+    def _doc(self, product) -> ProductDoc:
+        return ProductDoc(product.product_id, product.name, product.description, product.price, product.stock_quantity)
+
+    def _add(self, doc: ProductDoc) -> List[str]:
+        """Indexes doc and returns terms that are new to the vocabulary (build() sorts them itself)."""
+        weights: Dict[str, int] = {}
+        for term in tokenize(doc.description):
+            weights[term] = weights.get(term, 0) + 1
+        for term in tokenize(doc.name):
+            weights[term] = weights.get(term, 0) + self.NAME_WEIGHT
+
+        new_terms = []
+        for term in weights:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = set()
+                new_terms.append(term)
+            postings.add(doc.product_id)
+        self._docs[doc.product_id] = doc
+        self._doc_terms[doc.product_id] = weights
+        return new_terms
+
+    def _remove(self, product_id: int):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        for term in self._doc_terms.pop(product_id, {}):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[term]
+                index = bisect_left(self._vocabulary, term)
+                if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                    del self._vocabulary[index]
+        index = bisect_left(self._prices, (doc.price, product_id))
+        if index < len(self._prices) and self._prices[index] == (doc.price, product_id):
+            del self._prices[index]
+
+    def _match_prefix(self, token: str) -> Dict[int, int]:
+        matches: Dict[int, int] = {}
+        index = bisect_left(self._vocabulary, token)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+            term = self._vocabulary[index]
+            for product_id in self._postings[term]:
+                # exact term matches outrank prefix matches
+                score = self._doc_terms[product_id][term] * (2 if term == token else 1)
+                matches[product_id] = max(matches.get(product_id, 0), score)
+            index += 1
+        return matches
+
+    def _price_range(self, min_price: Optional[float], max_price: Optional[float]) -> List[int]:
+        start = 0 if min_price is None else bisect_left(self._prices, (min_price, float("-inf")))
+        end = len(self._prices) if max_price is None else bisect_right(self._prices, (max_price, float("inf")))
+        return [product_id for _, product_id in self._prices[start:end]]
+
+
+product_index = ProductSearchIndex()
+
+
+def _apply_product_invalidations(events: List[InvalidationEvent]):
+    # version 0 is this worker's own write, which already updated the index
+    events = [invalidation for invalidation in events if invalidation.version]
+    if not events or not product_index.built:
+        return
+    from config.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if any(invalidation.key is None for invalidation in events):
+            product_index.build_from_db(db)
+        else:
+            product_index.refresh(db, (int(invalidation.key) for invalidation in events))
+    finally:
+        db.close()
+
+
+invalidation_bus.subscribe("product", _apply_product_invalidations)
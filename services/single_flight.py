@@ -0,0 +1,104 @@
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; identical calls that arrive while it is in
+    flight wait for it and share its result (or exception) instead of running again.
+
+    Nothing is kept once the call returns. A caller that joins a flight gets what the
+    leader read when it started, which may predate a write the caller has already
+    seen; single_flight(version=...) keys on a version that such writes bump, and
+    only then is the result never older than the caller would have read itself.
+    Callers block a thread while waiting, so only use it from sync (threadpool)
+    endpoints.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "in_flight": len(self._flights),
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def single_flight(name: Optional[str] = None, version: Optional[Callable[[], Hashable]] = None):
+    """Coalesces concurrent calls of a service method with equal arguments.
+
+    The key is the method's positional and keyword arguments (not self, whose
+    session is only used by the leader). Pass version for anything a write can
+    change: version() is added to the key, so a call made after a write that bumps
+    it never joins a flight that started before it. Without it, a call may share
+    a result read before a write it has already seen.
+    """
+    def decorator(method):
+        group = _groups.setdefault(name or method.__qualname__, SingleFlight(name or method.__qualname__))
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())), version() if version else None)
+            return group.do(key, method, self, *args, **kwargs)
+
+        wrapper.single_flight = group
+        return wrapper
+
+    return decorator
+
+
+def single_flight_stats() -> Dict[str, dict]:
+    return {name: group.stats() for name, group in sorted(_groups.items())}
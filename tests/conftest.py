@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# settings the app reads at import; the tests never touch a real MySQL server
+os.environ.setdefault("PRIVATE_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["INVALIDATION_TRANSPORT"] = "off"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def enforce_route_budgets(monkeypatch):
+    """Makes every request served during the test fail when it exceeds its route budget."""
+    from config import query_budget
+
+    monkeypatch.setattr(query_budget, "QUERY_BUDGET_MODE", "raise")
+    yield query_budget.ROUTE_BUDGETS
@@ -0,0 +1,113 @@
+import os
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, insert, update
+
+from config.database import Base, SessionLocal, engine
+from models.customers import Customer
+from models.products import Product
+from models.roles import Role
+from schemas.orders import OrderItemRequest, OrderRequest
+from services.catalog_snapshot import CatalogSnapshotStore, read_generation, snapshot_lock, write_snapshot
+from services.order_service import OrderService
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.execute(insert(Role), [{"role_id": 1, "role_name": "customer"}])
+        db.execute(insert(Customer), [{"customer_id": 1, "name": "Ann", "email": "ann@example.com",
+                                       "hashed_password": "x", "phone_number": "1", "role_id": 1}])
+        db.execute(insert(Product), [{"product_id": 1, "name": "Rose", "price": 2.0, "stock_quantity": 10}])
+        db.commit()
+    store = CatalogSnapshotStore(str(tmp_path / "catalog.bin"), refresh=0)
+    monkeypatch.setattr("services.order_service.catalog_snapshot", store)
+    with SessionLocal() as db:
+        store.refresh_from_db(db)
+    yield store
+    Base.metadata.drop_all(engine)
+
+
+def reprice(price):
+    """Commits an admin price change; the snapshot has not seen it yet."""
+    with SessionLocal() as db:
+        db.execute(update(Product).where(Product.product_id == 1).values(price=price))
+        db.commit()
+
+
+def refresh_now(store, product_ids):
+    """What the background refresh does once products_changed has noted product_ids."""
+    store._changed.update(product_ids)
+    store._refresh_in_background()
+
+
+def test_failed_refresh_removes_the_snapshot(store, monkeypatch):
+    def refresh_fails(db, product_ids):
+        raise OSError("No space left on device")
+
+    reprice(3.0)
+    monkeypatch.setattr(store, "apply_changes", refresh_fails)
+    refresh_now(store, [1])
+    assert store.current() is None
+
+
+def test_refresh_reads_only_the_changed_products(store):
+    reprice(3.0)
+    with SessionLocal() as db:
+        db.execute(insert(Product), [{"product_id": 2, "name": "Tulip", "price": 1.0, "stock_quantity": 5},
+                                     {"product_id": 3, "name": "Lily", "price": 4.0, "stock_quantity": 5}])
+        db.commit()
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        refresh_now(store, [1, 2])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    snapshot = store.current()
+    assert [record.price for record in snapshot.records()] == [3.0, 1.0]
+    assert all("IN (" in statement for statement in statements)
+
+
+def test_retired_product_drops_out_of_the_snapshot(store):
+    with SessionLocal() as db:
+        db.execute(update(Product).where(Product.product_id == 1).values(deleted_at=datetime.utcnow()))
+        db.commit()
+    refresh_now(store, [1])
+    assert store.current().get(1) is None
+
+
+def test_checkout_charges_the_committed_price_over_the_snapshot(store):
+    reprice(3.0)
+    assert store.current().price(1) == 2.0
+    with SessionLocal() as db:
+        order = OrderService(db).create_order(
+            OrderRequest(items=[OrderItemRequest(product_id=1, quantity=2)]), customer_id=1)
+        assert order.total_amount == 6.0
+
+
+def test_older_read_never_replaces_a_newer_generation(store):
+    newer = read_generation(store.path)
+    with snapshot_lock(store.path):
+        assert write_snapshot(store.path, [(1, "Rose", None, 1.0, 10)], newer - 1) == newer
+    assert store.current().price(1) == 2.0
+
+
+def test_concurrent_refreshes_publish_a_whole_file(store):
+    def refresh():
+        with SessionLocal() as db:
+            store.refresh_from_db(db)
+
+    writers = [threading.Thread(target=refresh) for _ in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert store.current().get(1).name == "Rose"
+    assert [name for name in os.listdir(os.path.dirname(store.path)) if name.endswith(".tmp")] == []
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import create_engine, delete, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from models.orders import Order
+from models.table_versions import VERSIONED_ENTITIES, TableVersion
+from services.invalidation import invalidation_bus, table_version
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'etags.db'}")
+    TableVersion.__table__.create(engine)
+    Order.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.execute(insert(TableVersion), [{"entity": entity, "version": 0} for entity in VERSIONED_ENTITIES])
+        db.execute(insert(Order), [{"order_id": order_id, "customer_id": 1, "total_amount": 10.0}
+                                   for order_id in (1, 2, 3)])
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def orders_version(db):
+    return table_version(db, "order", Order.order_id, Order.customer_id == 1)
+
+
+def test_version_moves_with_every_published_write(session_factory):
+    # nothing the list reads from the rows themselves changes: same max key, and
+    # no updated_at, which mysql stores to the second anyway
+    with session_factory() as db:
+        before = orders_version(db)
+        db.execute(update(Order).where(Order.order_id == 2).values(total_amount=12.0))
+        invalidation_bus.publish(db, "order", [2])
+        db.commit()
+        assert orders_version(db) != before
+
+
+def test_version_changes_when_a_row_below_the_max_is_deleted(session_factory):
+    with session_factory() as db:
+        before = orders_version(db)
+        db.execute(delete(Order).where(Order.order_id == 2))
+        invalidation_bus.publish(db, "order", [2])
+        db.commit()
+        assert orders_version(db) != before
+        assert orders_version(db)[0] == before[0]
+
+
+def test_rolled_back_write_leaves_the_version(session_factory):
+    with session_factory() as db:
+        before = orders_version(db)
+        invalidation_bus.publish(db, "order", [2])
+        db.rollback()
+        db.commit()
+        assert orders_version(db) == before
+
+
+def test_version_is_stable_without_writes(session_factory):
+    with session_factory() as db:
+        assert orders_version(db) == orders_version(db)
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from config.migrations import _sqlite_autoincrement
+from models.cache_invalidations import CacheInvalidation
+from services.invalidation import DatabaseTransport, InvalidationBus
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'invalidations.db'}")
+    CacheInvalidation.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def write(session_factory, entity, key, row_id=None, age=0.0):
+    """Commits one invalidation row, as another worker's transaction would."""
+    row = {"entity": entity, "key": key, "created_at": datetime.utcnow() - timedelta(seconds=age)}
+    if row_id is not None:
+        row["id"] = row_id
+    with session_factory() as db:
+        db.execute(insert(CacheInvalidation), [row])
+        db.commit()
+
+
+def worker_cache(session_factory, settle=5.0):
+    """A worker's bus with a cache of product names that its handler clears."""
+    cache = {"1": "Rose", "2": "Tulip"}
+    bus = InvalidationBus(DatabaseTransport(session_factory, settle=settle))
+    bus.subscribe("product", lambda events: [cache.pop(event.key, None) for event in events])
+    bus.poll()
+    return bus, cache
+
+
+def test_stale_read_clears_on_next_poll(session_factory):
+    bus, cache = worker_cache(session_factory)
+    write(session_factory, "product", "1")
+    assert cache["1"] == "Rose"  # stale until the worker polls
+    bus.poll()
+    assert "1" not in cache and cache["2"] == "Tulip"
+
+
+def test_commit_landing_below_a_seen_id_is_delivered(session_factory):
+    bus, cache = worker_cache(session_factory)
+    write(session_factory, "product", "2", row_id=10)
+    bus.poll()
+    # a transaction that took id 5 before id 10 was taken, but committed after it
+    cache["2"] = "Tulip"
+    write(session_factory, "product", "1", row_id=5)
+    bus.poll()
+    assert "1" not in cache
+    assert cache["2"] == "Tulip"  # id 10 is not delivered twice
+
+
+def test_late_commit_outside_settle_window_is_skipped(session_factory):
+    bus, cache = worker_cache(session_factory, settle=1.0)
+    write(session_factory, "product", "2", row_id=10)
+    bus.poll()
+    write(session_factory, "product", "1", row_id=5, age=60)
+    bus.poll()
+    assert cache["1"] == "Rose"
+
+
+def test_first_poll_starts_from_the_tail(session_factory):
+    write(session_factory, "product", "1")
+    bus, cache = worker_cache(session_factory)
+    bus.poll()
+    assert cache == {"1": "Rose", "2": "Tulip"}
+
+
+def test_ids_are_not_reused_after_a_purge(session_factory):
+    bus, cache = worker_cache(session_factory)
+    write(session_factory, "product", "2")
+    write(session_factory, "product", "2")
+    bus.poll()
+    with session_factory() as db:
+        last_id = db.execute(select(CacheInvalidation.id).order_by(CacheInvalidation.id.desc())).scalars().first()
+        db.execute(delete(CacheInvalidation))
+        db.commit()
+    write(session_factory, "product", "1")
+    with session_factory() as db:
+        assert db.execute(select(CacheInvalidation.id)).scalar() > last_id
+    bus.poll()
+    assert "1" not in cache
+
+
+def test_migration_rebuilds_table_without_autoincrement(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE cache_invalidations (id INTEGER NOT NULL PRIMARY KEY, "
+                                   "entity VARCHAR(50) NOT NULL, key VARCHAR(100), created_at DATETIME NOT NULL)")
+        connection.exec_driver_sql("INSERT INTO cache_invalidations VALUES (7, 'product', '1', '2024-01-01')")
+        _sqlite_autoincrement(connection, CacheInvalidation.__table__)
+    with engine.begin() as connection:
+        ddl = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'cache_invalidations'").scalar()
+        assert "AUTOINCREMENT" in ddl
+        assert connection.exec_driver_sql("SELECT id FROM cache_invalidations").scalar() == 7
+        connection.exec_driver_sql("DELETE FROM cache_invalidations")
+        connection.execute(insert(CacheInvalidation), [{"entity": "product", "key": "1",
+                                                        "created_at": datetime.utcnow()}])
+        assert connection.exec_driver_sql("SELECT id FROM cache_invalidations").scalar() == 8
+    engine.dispose()
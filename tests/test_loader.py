@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import insert
+
+from config.database import Base, SessionLocal, engine
+from models.customers import Customer
+from models.orders import Order
+from models.roles import Role
+from services.loader import get_loader
+from services.order_service import ORDER_ITEMS_LOADED
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.execute(insert(Role), [{"role_id": 1, "role_name": "customer"}])
+        db.execute(insert(Customer), [{"customer_id": 1, "name": "Ann", "email": "ann@example.com",
+                                       "hashed_password": "x", "phone_number": "1", "role_id": 1}])
+        db.execute(insert(Order), [{"order_id": 1, "customer_id": 1, "total_amount": 10.0}])
+        yield db
+    Base.metadata.drop_all(engine)
+
+
+def test_loaders_are_shared_per_options(db):
+    plain = get_loader(db, Order)
+    assert get_loader(db, Order, Order.order_id) is plain
+    assert get_loader(db, Order, options=ORDER_ITEMS_LOADED) is not plain
+    assert get_loader(db, Order, options=ORDER_ITEMS_LOADED) is get_loader(db, Order, options=ORDER_ITEMS_LOADED)
+
+
+def test_later_caller_gets_its_options(db):
+    get_loader(db, Order).load(1)
+    db.expunge_all()
+    order = get_loader(db, Order, options=ORDER_ITEMS_LOADED).load(1)
+    assert "items" in order.__dict__
@@ -0,0 +1,77 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from config.database import Base, SessionLocal, engine
+from models.customers import Customer
+from models.order_items import OrderItem
+from models.orders import Order
+from models.products import Product
+from models.roles import Role
+from services.order_archive import Partition, archive_orders
+
+CUTOFF = datetime(2020, 1, 1)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.execute(insert(Role), [{"role_id": 1, "role_name": "customer"}])
+        db.execute(insert(Customer), [{"customer_id": 1, "name": "Ann", "email": "ann@example.com",
+                                       "hashed_password": "x", "phone_number": "1", "role_id": 1}])
+        db.execute(insert(Product), [{"product_id": 1, "name": "Rose", "price": 2.0, "stock_quantity": 10}])
+        # seven March orders and three in April 2019, one newer order that stays
+        dates = [datetime(2019, 3, day) for day in range(1, 8)] + [datetime(2019, 4, day) for day in (1, 1, 2)]
+        db.execute(insert(Order), [{"order_id": order_id, "customer_id": 1, "order_date": order_date,
+                                    "total_amount": 2.0} for order_id, order_date in enumerate(dates, 1)]
+                   + [{"order_id": 11, "customer_id": 1, "order_date": datetime(2021, 1, 1), "total_amount": 2.0}])
+        db.execute(insert(OrderItem), [{"order_id": order_id, "product_id": 1, "quantity": 1,
+                                        "price_at_purchase": 2.0} for order_id in range(1, 12)])
+        db.commit()
+        yield db
+    Base.metadata.drop_all(engine)
+
+
+def remaining_orders(db):
+    return db.execute(select(func.count()).select_from(Order)).scalar()
+
+
+def test_each_month_is_written_once(db, tmp_path, monkeypatch):
+    writes = []
+    write = Partition.write
+
+    def counted_write(partition, directory):
+        writes.append(partition.name)
+        write(partition, directory)
+
+    monkeypatch.setattr(Partition, "write", counted_write)
+
+    counts = archive_orders(db, CUTOFF, str(tmp_path), chunk_size=2)
+
+    assert writes == ["orders-2019-03.zip", "orders-2019-04.zip"]
+    assert counts == {"orders": 10, "order_items": 10, "partitions": writes}
+    assert remaining_orders(db) == 1
+    march = Partition.read(os.path.join(tmp_path, "orders-2019-03.zip"))
+    assert march.orders["order_id"] == list(range(1, 8))
+    assert march.items["order_id"] == list(range(1, 8))
+
+
+def test_rerun_after_a_crash_skips_archived_orders(db, tmp_path, monkeypatch):
+    def crash(*args):
+        raise RuntimeError("killed")
+
+    # March is written, then the process dies before deleting its rows
+    monkeypatch.setattr("services.order_archive.delete", crash)
+    with pytest.raises(RuntimeError):
+        archive_orders(db, CUTOFF, str(tmp_path), chunk_size=2)
+    db.rollback()
+    monkeypatch.undo()
+
+    archive_orders(db, CUTOFF, str(tmp_path), chunk_size=2)
+
+    march = Partition.read(os.path.join(tmp_path, "orders-2019-03.zip"))
+    assert march.orders["order_id"] == list(range(1, 8))
+    assert remaining_orders(db) == 1
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from config.database import SessionLocal, engine
+from models.outbox_events import OutboxEvent
+from services.outbox import EventBroker, OutboxRelay
+
+
+@pytest.fixture
+def relay():
+    OutboxEvent.__table__.drop(engine, checkfirst=True)
+    OutboxEvent.__table__.create(engine)
+    relay = OutboxRelay(EventBroker(), interval=60, settle=5)
+    relay.start()
+    relay.stop()
+    yield relay
+    OutboxEvent.__table__.drop(engine)
+
+
+def write(aggregate_id, event_id=None, age=0.0):
+    """Commits one outbox row, as another worker's transaction would."""
+    row = {"topic": "order", "event_type": "order.created", "aggregate_id": aggregate_id, "payload": "{}",
+           "created_at": datetime.utcnow() - timedelta(seconds=age)}
+    if event_id is not None:
+        row["event_id"] = event_id
+    with SessionLocal() as db:
+        db.execute(insert(OutboxEvent), [row])
+        db.commit()
+
+
+def relayed(relay):
+    before = len(relay.broker._recent)
+    relay.relay()
+    return [stream_event.aggregate_id for stream_event in list(relay.broker._recent)[before:]]
+
+
+def test_new_events_are_relayed_once(relay):
+    write(1)
+    write(2)
+    assert relayed(relay) == [1, 2]
+    assert relayed(relay) == []
+
+
+def test_commit_landing_below_a_relayed_id_is_relayed(relay):
+    write(1, event_id=10)
+    assert relayed(relay) == [1]
+    # took id 5 before id 10 was taken, but committed after it
+    write(2, event_id=5)
+    assert relayed(relay) == [2]
+    assert relayed(relay) == []
+    assert relay.broker.last_offset == 10
+
+
+def test_offsets_are_not_reused_after_a_purge(relay):
+    write(1)
+    write(2)
+    assert relayed(relay) == [1, 2]
+    with SessionLocal() as db:
+        db.execute(delete(OutboxEvent))
+        db.commit()
+    write(3)
+    with SessionLocal() as db:
+        assert db.execute(select(OutboxEvent.event_id)).scalar() == 3
+    assert relayed(relay) == [3]
@@ -0,0 +1,28 @@
+import threading
+import time
+
+from config import passwords
+
+
+def test_one_worker_calibrates_while_the_others_wait(tmp_path, monkeypatch):
+    calibrations = []
+
+    def calibrate(target_ms):
+        calibrations.append(target_ms)
+        time.sleep(0.2)
+        return 11
+
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 0)
+    monkeypatch.setattr(passwords, "BCRYPT_TARGET_MS", 250.0)
+    monkeypatch.setattr(passwords, "BCRYPT_CALIBRATION_PATH", str(tmp_path / "bcrypt-rounds"))
+    monkeypatch.setattr(passwords, "calibrate", calibrate)
+    monkeypatch.setattr(passwords, "set_rounds", lambda rounds: None)
+
+    workers = [threading.Thread(target=passwords.configure_password_hashing) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert calibrations == [250.0]
+    assert passwords._read_calibration(250.0, passwords.BCRYPT_MIN_ROUNDS) == 11
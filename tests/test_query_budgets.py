@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from config.database import Base, SessionLocal, engine
+from config.migrations import check_schema
+from config.query_budget import ROUTE_BUDGETS
+from models.customer_loyalty import CustomerLoyalty
+from models.roles import Role
+
+BASKET = {"items": [{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1},
+                    {"product_id": 3, "quantity": 1}, {"product_id": 4, "quantity": 1},
+                    {"product_id": 5, "quantity": 1}]}
+
+
+@pytest.fixture(scope="module")
+def client():
+    check_schema(engine)
+    with SessionLocal() as db:
+        db.add_all([Role(role_id=1, role_name="admin"), Role(role_id=2, role_name="user"),
+                    CustomerLoyalty(status="Silver", loyalty_points=10),
+                    CustomerLoyalty(status="Gold", loyalty_points=100)])
+        db.commit()
+    client = TestClient(main.app)
+    client.post("/auth/register", json={"name": "Admin", "email": "admin@example.com", "password": "secret1",
+                                        "phone_number": "123", "address": "Hanoi", "role_id": 1})
+    client.headers["Authorization"] = f"Bearer {login(client)['access_token']}"
+    for index in range(6):
+        client.post("/admin/products", json={"name": f"Rose {index}", "description": "red rose bouquet",
+                                             "price": 10 + index, "stock_quantity": 1000})
+    for _ in range(3):
+        client.post("/orders/", json=BASKET)
+    yield client
+    Base.metadata.drop_all(engine)
+
+
+def login(client) -> dict:
+    return client.post("/auth/login", data={"username": "admin@example.com", "password": "secret1"}).json()
+
+
+def delete_new_order(client):
+    order_id = client.post("/orders/", json=BASKET).json()["data"]["order_id"]
+    return client.delete(f"/orders/{order_id}")
+
+
+# one representative request per budgeted route, each a full basket where it takes one
+ROUTE_CALLS = {
+    ("GET", "/"): lambda client: client.get("/"),
+    ("POST", "/auth/register"): lambda client: client.post("/auth/register", json={
+        "name": "User", "email": "user@example.com", "password": "secret1", "phone_number": "123",
+        "address": "Hanoi", "role_id": 2}),
+    ("POST", "/auth/login"): lambda client: client.post(
+        "/auth/login", data={"username": "admin@example.com", "password": "secret1"}),
+    ("POST", "/auth/refresh"): lambda client: client.post(
+        "/auth/refresh", json={"refresh_token": login(client)["refresh_token"]}),
+    ("GET", "/customers/"): lambda client: client.get("/customers/"),
+    ("PUT", "/customers/"): lambda client: client.put("/customers/", json={"name": "Admin Two"}),
+    ("PUT", "/customers/password"): lambda client: client.put(
+        "/customers/password", json={"password": "secret1", "new_password": "secret1"}),
+    ("POST", "/orders/"): lambda client: client.post("/orders/", json=BASKET),
+    ("GET", "/orders/"): lambda client: client.get("/orders/"),
+    ("GET", "/orders/{order_id}"): lambda client: client.get("/orders/1"),
+    ("PUT", "/orders/{order_id}"): lambda client: client.put("/orders/1", json={
+        "items": [{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 3},
+                  {"product_id": 4, "quantity": 1}, {"product_id": 5, "quantity": 2},
+                  {"product_id": 6, "quantity": 1}]}),
+    ("DELETE", "/orders/{order_id}"): delete_new_order,
+    ("POST", "/admin/products"): lambda client: client.post("/admin/products", json={
+        "name": "Tulip", "description": "yellow tulips", "price": 8, "stock_quantity": 50}),
+    ("GET", "/admin/products"): lambda client: client.get("/admin/products"),
+    ("GET", "/admin/products/{product_id}"): lambda client: client.get("/admin/products/1"),
+    ("PUT", "/admin/products/{product_id}"): lambda client: client.put("/admin/products/1", json={"price": 12.5}),
+    ("DELETE", "/admin/products/{product_id}"): lambda client: client.delete("/admin/products/6"),
+    ("GET", "/admin/customers"): lambda client: client.get("/admin/customers"),
+    ("GET", "/admin/orders"): lambda client: client.get("/admin/orders"),
+    ("GET", "/admin/changes"): lambda client: client.get("/admin/changes"),
+    ("GET", "/admin/metrics"): lambda client: client.get("/admin/metrics"),
+    ("GET", "/products/"): lambda client: client.get("/products/", params={"ids": "1,2,3"}),
+    ("GET", "/products/search"): lambda client: client.get("/products/search", params={"q": "rose"}),
+    ("GET", "/revenue/statistics/daily"): lambda client: client.get("/revenue/statistics/daily"),
+    ("GET", "/revenue/statistics/monthly"): lambda client: client.get("/revenue/statistics/monthly"),
+    ("GET", "/revenue/statistics/yearly"): lambda client: client.get("/revenue/statistics/yearly"),
+    ("GET", "/revenue/analytics/top-products"): lambda client: client.get("/revenue/analytics/top-products"),
+    ("GET", "/revenue/analytics/basket-sizes"): lambda client: client.get("/revenue/analytics/basket-sizes"),
+    ("GET", "/revenue/analytics/loyalty-tiers"): lambda client: client.get("/revenue/analytics/loyalty-tiers"),
+}
+
+
+def test_every_budgeted_route_is_exercised():
+    assert set(ROUTE_CALLS) == set(ROUTE_BUDGETS)
+
+
+@pytest.mark.parametrize("route", list(ROUTE_CALLS), ids=" ".join)
+def test_route_stays_within_budget(client, enforce_route_budgets, route):
+    response = ROUTE_CALLS[route](client)
+    assert response.status_code < 400, response.text
+    if response.content and response.headers.get("content-type", "").startswith("application/json"):
+        assert response.json().get("status") != "error", response.text
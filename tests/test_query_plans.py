@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from benchmarks.query_plans import StatementLog, capture, check
+from benchmarks.seed import seed
+from config.database import Base, engine
+from services.catalog_snapshot import catalog_snapshot
+
+
+@pytest.fixture
+def seeded():
+    seed(customers=30, products=20, orders=300)
+    yield
+    Base.metadata.drop_all(engine)
+
+
+@pytest.mark.parametrize("snapshot", [False, True], ids=["database", "catalog snapshot"])
+def test_no_unexpected_full_scans(seeded, tmp_path, monkeypatch, snapshot):
+    if snapshot:
+        monkeypatch.setattr(catalog_snapshot, "path", str(tmp_path / "catalog.bin"))
+    log = StatementLog()
+    event.listen(engine, "before_cursor_execute", log.record)
+    try:
+        failures = asyncio.run(capture(log))
+    finally:
+        event.remove(engine, "before_cursor_execute", log.record)
+    plans, regressions = check(log)
+
+    assert failures == []
+    assert [(entry["scenarios"], entry["statement"]) for entry in plans if entry["unexpected_full_scans"]] == []
+    assert regressions == 0